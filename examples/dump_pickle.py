@@ -34,12 +34,14 @@ def load_newest_files(directory: Optional[str] = None) -> dict[str, str]:
     newest_files: dict[str, tuple[str, int]] = {}
 
     prefixes = ["perp", "perporacles", "spot", "spotoracles", "usermap", "userstats"]
+    # users and user stats are dumped as snapshots, markets and oracles as pickles
+    extensions = (".pkl", ".snap")
 
     for filename in os.listdir(directory):
-        if filename.endswith(".pkl") and any(
+        if filename.endswith(extensions) and any(
             filename.startswith(prefix + "_") for prefix in prefixes
         ):
-            print(f"Found pickle file: {filename}")
+            print(f"Found dump file: {filename}")
             start = filename.rindex("_") + 1  # Use rindex to find the last underscore
             prefix = filename[: start - 1]
             end = filename.index(".")
@@ -47,7 +49,8 @@ def load_newest_files(directory: Optional[str] = None) -> dict[str, str]:
             if prefix not in newest_files or slot > newest_files[prefix][1]:
                 newest_files[prefix] = (directory + "/" + filename, slot)
 
-    # mapping e.g { 'spotoracles' : 'spotoracles_272636137.pkl' }
+    # mapping e.g { 'spotoracles' : 'spotoracles_272636137.pkl',
+    #               'usermap' : 'usermap_272636137.snap' }
     prefix_to_filename = {
         prefix: filename for prefix, (filename, _) in newest_files.items()
     }
@@ -26,12 +26,8 @@ async def main():
     user = UserMap(UserMapConfig(dc, UserMapWebsocketConfig()))
     await user.subscribe()
 
-    high_leverage_users = []
-    keys = []
-    for key, user in user.user_map.items():
-        if user.is_high_leverage_mode():
-            high_leverage_users.append(user)
-            keys.append(key)
+    keys = list(user.index.get_high_leverage_users())
+    high_leverage_users = [user.get(key) for key in keys]
     return high_leverage_users, keys
 
 
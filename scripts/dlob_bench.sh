@@ -0,0 +1 @@
+python -m tests.dlob.bench "$@"
\ No newline at end of file
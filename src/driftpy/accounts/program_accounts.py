@@ -0,0 +1,138 @@
+import base64
+import codecs
+import json
+import re
+from typing import AsyncGenerator, List, Optional, Tuple
+
+import jsonrpcclient
+
+VALUE_ARRAY_START = re.compile(r'"value"\s*:\s*\[')
+SLOT = re.compile(r'"slot"\s*:\s*(\d+)')
+SEPARATORS = re.compile(r"[\s,]*")
+
+ProgramAccount = Tuple[str, bytes]
+
+
+class ProgramAccountsParser:
+    """
+    Incremental parser for a base64 encoded `getProgramAccounts` response made
+    with `withContext`.
+
+    Accounts are returned by `feed` as soon as their JSON object is complete, so
+    at most one partial account is buffered at a time instead of the whole body.
+    The RPC writes `context` ahead of `value`, if it does not, accounts are held
+    back until the slot is known.
+    """
+
+    def __init__(self):
+        self.decoder = json.JSONDecoder()
+        self.text_decoder = codecs.getincrementaldecoder("utf-8")()
+        self.buffer = ""
+        self.in_value = False
+        self.after_value = False
+        self.slot: Optional[int] = None
+        self.pending: List[ProgramAccount] = []
+
+    def feed(self, chunk: bytes) -> List[ProgramAccount]:
+        self.buffer += self.text_decoder.decode(chunk)
+
+        if not self.in_value and not self.after_value:
+            match = VALUE_ARRAY_START.search(self.buffer)
+            if match is None:
+                return []
+            self.read_slot(self.buffer[: match.start()])
+            self.buffer = self.buffer[match.end() :]
+            self.in_value = True
+
+        if not self.in_value:
+            return []
+
+        accounts = self.pending
+        self.pending = []
+        pos = 0
+        while True:
+            pos = SEPARATORS.match(self.buffer, pos).end()
+            if pos == len(self.buffer):
+                break
+            if self.buffer[pos] == "]":
+                self.in_value = False
+                self.after_value = True
+                pos += 1
+                break
+            try:
+                program_account, pos = self.decoder.raw_decode(self.buffer, pos)
+            except json.JSONDecodeError:
+                # the account is split across chunks
+                break
+            accounts.append(
+                (
+                    program_account["pubkey"],
+                    base64.b64decode(program_account["account"]["data"][0]),
+                )
+            )
+        self.buffer = self.buffer[pos:]
+
+        if self.slot is None:
+            self.pending = accounts
+            return []
+        return accounts
+
+    def finish(self) -> List[ProgramAccount]:
+        """
+        Call once the body is exhausted, returns any accounts held back and raises
+        if the response was an error or was cut short.
+        """
+        self.buffer += self.text_decoder.decode(b"", final=True)
+
+        if not self.in_value and not self.after_value:
+            parsed_resp = jsonrpcclient.parse(json.loads(self.buffer))
+            if isinstance(parsed_resp, jsonrpcclient.Error):
+                raise ValueError(
+                    f"Error fetching program accounts: {parsed_resp.message}"
+                )
+            raise ValueError(f"Error fetching program accounts - not ok: {parsed_resp}")
+
+        if self.in_value:
+            raise ValueError("getProgramAccounts response ended mid array")
+
+        if self.slot is None:
+            self.read_slot(self.buffer)
+        if self.slot is None:
+            raise ValueError("getProgramAccounts response has no context slot")
+
+        accounts = self.pending
+        self.pending = []
+        return accounts
+
+    def read_slot(self, text: str):
+        match = SLOT.search(text)
+        if match is not None:
+            self.slot = int(match.group(1))
+
+
+async def stream_program_accounts(
+    provider, rpc_request: dict, timeout: float = 120
+) -> AsyncGenerator[Tuple[int, List[ProgramAccount]], None]:
+    """
+    Posts a `getProgramAccounts` request on the provider's httpx session and
+    yields `(slot, accounts)` batches as the response body arrives.
+
+    `timeout` applies to each read rather than to the whole response, so large
+    account sets are not cut off while data is still flowing.
+    """
+    parser = ProgramAccountsParser()
+    async with provider.session.stream(
+        "POST",
+        provider.endpoint_uri,
+        json=rpc_request,
+        headers={"content-encoding": "gzip"},
+        timeout=timeout,
+    ) as resp:
+        async for chunk in resp.aiter_bytes():
+            accounts = parser.feed(chunk)
+            if accounts:
+                yield parser.slot, accounts
+
+    accounts = parser.finish()
+    if accounts:
+        yield parser.slot, accounts
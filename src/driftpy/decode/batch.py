@@ -0,0 +1,87 @@
+import asyncio
+from collections import deque
+from concurrent.futures import Executor
+from typing import (
+    Any,
+    AsyncGenerator,
+    Callable,
+    Deque,
+    Generic,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+T = TypeVar("T")
+
+DECODE_BATCH_SIZE = 256
+# batches handed to the executor before the oldest one is waited on
+MAX_BATCHES_IN_FLIGHT = 8
+
+
+class BatchDecoder(Generic[T]):
+    """
+    Decodes keyed account buffers in batches with `decode_many`, a top level
+    function from a list of buffers to a list of accounts.
+
+    With an executor (e.g. a `ProcessPoolExecutor`) batches are decoded off the
+    event loop and several run at once. Without one every `batches()` decodes what
+    has been added so far inline. Callers yield to the event loop between batches.
+    """
+
+    def __init__(
+        self,
+        decode_many: Callable[[List[bytes]], List[T]],
+        executor: Optional[Executor] = None,
+        batch_size: int = DECODE_BATCH_SIZE,
+        max_in_flight: int = MAX_BATCHES_IN_FLIGHT,
+    ):
+        self.decode_many = decode_many
+        self.executor = executor
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+        self.keys: List[str] = []
+        self.buffers: List[bytes] = []
+        self.in_flight: Deque[Tuple[List[str], List[bytes], Any]] = deque()
+
+    def add(self, key: str, buffer: bytes):
+        self.keys.append(key)
+        self.buffers.append(buffer)
+        if self.executor is not None and len(self.buffers) >= self.batch_size:
+            self.submit()
+
+    def submit(self):
+        if not self.buffers:
+            return
+        if self.executor is None:
+            decoded = self.decode_many(self.buffers)
+        else:
+            decoded = asyncio.get_running_loop().run_in_executor(
+                self.executor, self.decode_many, self.buffers
+            )
+        self.in_flight.append((self.keys, self.buffers, decoded))
+        self.keys = []
+        self.buffers = []
+
+    async def batches(
+        self, flush: bool = False
+    ) -> AsyncGenerator[List[Tuple[str, bytes, T]], None]:
+        """
+        Yields the decoded batches that are ready, in the order they were added, as
+        `(key, buffer, account)` lists. `flush` decodes and waits for everything
+        that is left.
+        """
+        if flush or self.executor is None:
+            self.submit()
+
+        while self.in_flight and (
+            flush
+            or len(self.in_flight) > self.max_in_flight
+            or self.executor is None
+            or self.in_flight[0][2].done()
+        ):
+            keys, buffers, decoded = self.in_flight.popleft()
+            if self.executor is not None:
+                decoded = await decoded
+            yield list(zip(keys, buffers, decoded))
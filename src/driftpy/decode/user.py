@@ -396,3 +396,8 @@ def decode_user(buffer: bytes) -> UserAccount:
         margin_mode,
         padding,
     )
+
+
+def decode_users(buffers: List[bytes]) -> List[UserAccount]:
+    # top level so it can be sent to a process pool
+    return [decode_user(buffer) for buffer in buffers]
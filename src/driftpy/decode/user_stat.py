@@ -1,3 +1,5 @@
+from typing import List
+
 from driftpy.decode.user import (
     read_uint8,
     read_uint16_le,
@@ -92,3 +94,8 @@ def decode_user_stat(buffer: bytes) -> UserStatsAccount:
         disable_update_perp_bid_ask_twap,
         padding,
     )
+
+
+def decode_user_stats(buffers: List[bytes]) -> List[UserStatsAccount]:
+    # top level so it can be sent to a process pool
+    return [decode_user_stat(buffer) for buffer in buffers]
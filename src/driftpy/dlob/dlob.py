@@ -1,5 +1,7 @@
-import copy
-from typing import Callable, Dict, Generator, List, Optional, Tuple, Union
+import dataclasses
+import heapq
+from concurrent.futures import Executor
+from typing import Any, Callable, Dict, Generator, List, Optional, Set, Tuple, Union
 
 from solders.pubkey import Pubkey
 
@@ -8,17 +10,23 @@ from driftpy.constants.numeric_constants import (
     PRICE_PRECISION,
     QUOTE_PRECISION,
 )
-from driftpy.dlob.dlob_helpers import get_maker_rebate, get_node_lists
+from driftpy.dlob.dlob_helpers import get_maker_rebate
 from driftpy.dlob.dlob_node import (
     DLOBNode,
     FloatingLimitOrderNode,
     MarketOrderNode,
+    OrderNode,
     RestingLimitOrderNode,
     TakingLimitOrderNode,
     TriggerOrderNode,
-    VAMMNode,
 )
-from driftpy.dlob.node_list import NodeList, get_vamm_node_generator
+from driftpy.dlob.dlob_snapshot import DLOBSnapshot, get_l2_books, get_l3_books
+from driftpy.dlob.node_list import (
+    NodeList,
+    OrderSignature,
+    get_order_signature,
+    get_vamm_node_generator,
+)
 from driftpy.dlob.orderbook_levels import (
     L2OrderBook,
     L2OrderBookGenerator,
@@ -31,7 +39,7 @@ from driftpy.dlob.orderbook_levels import (
 from driftpy.math.auction import is_fallback_available_liquidity_source
 from driftpy.math.exchange_status import amm_paused, exchange_paused, fill_paused
 from driftpy.math.orders import (
-    get_limit_price,
+    is_market_order,
     is_order_expired,
     is_resting_limit_order,
     is_taking_order,
@@ -39,18 +47,24 @@ from driftpy.math.orders import (
     must_be_triggered,
 )
 from driftpy.types import (
+    MarketIdentifier,
     MarketType,
+    MarketTypeNum,
     OraclePriceData,
     Order,
     OrderRecord,
+    OrderStatusNum,
+    OrderTriggerConditionNum,
+    OrderType,
     PerpMarketAccount,
     PositionDirection,
+    PositionDirectionNum,
     SpotMarketAccount,
     StateAccount,
     UserAccount,
-    is_one_of_variant,
     is_variant,
     market_type_to_string,
+    variant_tag,
 )
 
 
@@ -90,15 +104,30 @@ OrderBookCallback = Callable[[], None]
     Currentl used in get_resting_limit_bids and get_resting_limit_asks
 """
 DLOBFilterFcn = Callable[[DLOBNode], bool]
+"""
+    Receives a DLOBNode and returns the key it is ordered by when several
+    sorted node generators are merged, lowest key first
+"""
+DLOBSortKeyFcn = Callable[[DLOBNode], Any]
 
 
 class NodeToFill:
+    """
+    A taker node and the maker nodes it crosses. Fills simulated while finding
+    nodes to fill are tracked on the nodes, `node.order` keeps the account's
+    fill state, so read the size left with `get_base_remaining()`.
+    """
+
+    __slots__ = ("node", "maker")
+
     def __init__(self, node: DLOBNode, maker_nodes: List[DLOBNode]):
         self.node = node
         self.maker = maker_nodes
 
 
 class NodeToTrigger:
+    __slots__ = ("node",)
+
     def __init__(self, node: TriggerOrderNode):
         self.node = node
 
@@ -111,11 +140,29 @@ SUPPORTED_ORDER_TYPES = [
     "Oracle",
 ]
 
+SUPPORTED_ORDER_TYPE_TAGS = frozenset(
+    variant_tag(getattr(OrderType, order_type)) for order_type in SUPPORTED_ORDER_TYPES
+)
+
 
 class DLOB:
     def __init__(self):
-        self.open_orders: Dict[str, set] = {}
+        self.open_orders: Dict[str, Set[OrderSignature]] = {}
         self.order_lists: Dict[str, Dict[int, MarketNodeLists]] = {}
+        # which NodeList currently holds each order
+        self.order_index: Dict[OrderSignature, NodeList] = {}
+        # min-heap of (slot the auction ends, insertion count, signature) for
+        # taking limit orders, see update_resting_limit_orders
+        self.taking_limit_auction_ends: List[Tuple[int, int, OrderSignature]] = []
+        self.taking_limit_insert_count = 0
+        # (market type, market index, side) -> (slot, oracle price, best price),
+        # dropped whenever an order on that side changes
+        self.best_price_cache: Dict[
+            Tuple[str, int, str], Tuple[int, Optional[int], int]
+        ] = {}
+        # nodes carrying fills simulated by find_nodes_to_fill, which never land
+        # on chain if the fill is not sent, see reset_simulated_fills
+        self.simulated_fills: Set[OrderNode] = set()
         self.max_slot_for_resting_limit_orders = 0
         self.initialized = False
         self.init()
@@ -140,6 +187,88 @@ class DLOB:
         self.initialized = True
         return True
 
+    def update_user_orders(
+        self,
+        user_account: Pubkey,
+        previous_orders: List[Order],
+        orders: List[Order],
+        slot: int,
+    ):
+        """
+        Applies the difference between two versions of a user's `orders` to the DLOB,
+        so a long-lived DLOB can follow account updates without being rebuilt.
+        """
+        previous_open = {
+            order.order_id: order
+            for order in previous_orders
+            if variant_tag(order.status) == OrderStatusNum.OPEN
+        }
+        open_orders = {
+            order.order_id: order
+            for order in orders
+            if variant_tag(order.status) == OrderStatusNum.OPEN
+        }
+
+        for order_id, previous_order in previous_open.items():
+            if order_id not in open_orders:
+                self.delete(previous_order, user_account, slot)
+
+        for order_id, order in open_orders.items():
+            previous_order = previous_open.get(order_id)
+            if previous_order is None:
+                self.insert_order(order, user_account, slot)
+            elif (
+                previous_order == order
+                or dataclasses.replace(
+                    previous_order,
+                    base_asset_amount_filled=order.base_asset_amount_filled,
+                    quote_asset_amount_filled=order.quote_asset_amount_filled,
+                )
+                == order
+            ):
+                # even an unchanged order is refreshed, its node may hold fills
+                # simulated by find_nodes_to_fill that never landed
+                self.refresh_order(order, user_account)
+            else:
+                self.delete(previous_order, user_account, slot)
+                self.insert_order(order, user_account, slot)
+
+    def refresh_order(self, order: Order, user_account: Pubkey):
+        """
+        Swaps the account's `order` into its node and resets the node's fill state
+        to the order's.
+        """
+        signature = get_order_signature(order.order_id, user_account)
+        node_list = self.order_index.get(signature)
+        if node_list is None:
+            return
+        node = node_list.node_map.get(signature)
+        if (
+            node is None
+            or node.base_asset_amount_filled == order.base_asset_amount_filled
+            and node.order == order
+        ):
+            return
+        node_list.update(order, user_account)
+        self.simulated_fills.discard(node)
+        self._invalidate_best_price(order)
+
+    def reset_simulated_fills(self):
+        """
+        Resets every node filled by find_nodes_to_fill back to its order's fill
+        state, so makers whose simulated fills never landed on chain are back in
+        the book for the next traversal.
+        """
+        for node in self.simulated_fills:
+            node.base_asset_amount_filled = node.order.base_asset_amount_filled
+            self._invalidate_best_price(node.order)
+        self.simulated_fills.clear()
+
+    def _simulate_fill(self, node: OrderNode, base_filled: int):
+        node.base_asset_amount_filled += base_filled
+        self.simulated_fills.add(node)
+        self._invalidate_best_price(node.order)
+
     def add_order_list(self, market_type: str, market_index: int) -> None:
         if market_type not in self.order_lists:
             self.order_lists[market_type] = {}
@@ -151,7 +280,7 @@ class DLOB:
 
         if is_inactive_trigger_order:
             node_type = "trigger"
-        elif is_one_of_variant(order.order_type, ["Market", "TriggerMarket", "Oracle"]):
+        elif is_market_order(order):
             node_type = "market"
         elif order.oracle_price_offset != 0:
             node_type = "floating_limit"
@@ -160,11 +289,13 @@ class DLOB:
             node_type = "resting_limit" if is_resting else "taking_limit"
 
         if is_inactive_trigger_order:
-            sub_type = (
-                "above" if is_variant(order.trigger_condition, "Above") else "below"
+            is_above = (
+                variant_tag(order.trigger_condition) == OrderTriggerConditionNum.ABOVE
             )
+            sub_type = "above" if is_above else "below"
         else:
-            sub_type = "bid" if is_variant(order.direction, "Long") else "ask"
+            is_long = variant_tag(order.direction) == PositionDirectionNum.LONG
+            sub_type = "bid" if is_long else "ask"
 
         market_type = market_type_to_string(order.market_type)
 
@@ -187,12 +318,10 @@ class DLOB:
         slot: int,
         on_insert: Optional[OrderBookCallback] = None,
     ):
-        from driftpy.dlob.node_list import get_order_signature
-
-        if is_variant(order.status, "Init"):
+        if variant_tag(order.status) == OrderStatusNum.INIT:
             return
 
-        if not is_one_of_variant(order.order_type, SUPPORTED_ORDER_TYPES):
+        if variant_tag(order.order_type) not in SUPPORTED_ORDER_TYPE_TAGS:
             return
 
         market_type = market_type_to_string(order.market_type)
@@ -200,62 +329,113 @@ class DLOB:
         if order.market_index not in self.order_lists.get(market_type):
             self.add_order_list(market_type, order.market_index)
 
-        if is_variant(order.status, "Open"):
-            self.open_orders.get(market_type).add(
-                get_order_signature(order.order_id, user_account)
-            )
+        order_signature = get_order_signature(order.order_id, user_account)
 
-        self.get_list_for_order(order, slot).insert(order, market_type, user_account)
+        if order_signature not in self.order_index:
+            self.insert_into_list(
+                self.get_list_for_order(order, slot), order, market_type, user_account
+            )
 
         if on_insert is not None and callable(on_insert):
             on_insert()
 
-    def get_order(self, order_id: int, user_account: Pubkey) -> Optional[Order]:
-        from driftpy.dlob.node_list import get_order_signature
+    def insert_into_list(
+        self,
+        node_list: NodeList,
+        order: Order,
+        market_type: str,
+        user_account: Pubkey,
+    ):
+        if node_list.insert(order, market_type, user_account) is None:
+            return
 
-        order_signature = get_order_signature(order_id, user_account)
-        for node_list in get_node_lists(self.order_lists):
-            node = node_list.get(order_signature)
-            if node:
-                return node.order
+        self._invalidate_best_price(order)
 
-        return None
+        order_signature = get_order_signature(order.order_id, user_account)
+        self.order_index[order_signature] = node_list
+        if variant_tag(order.status) == OrderStatusNum.OPEN:
+            self.open_orders[market_type].add(order_signature)
 
-    def _update_resting_limit_orders_for_market_type(
-        self, slot: int, market_type_str: str
-    ):
-        if market_type_str not in self.order_lists:
+        if node_list.node_type == "takingLimit":
+            # first slot at which is_auction_complete holds
+            auction_end_slot = order.slot + order.auction_duration + 1
+            self.taking_limit_insert_count += 1
+            heapq.heappush(
+                self.taking_limit_auction_ends,
+                (auction_end_slot, self.taking_limit_insert_count, order_signature),
+            )
+
+    def remove_from_list(self, order: Order, user_account: Pubkey):
+        order_signature = get_order_signature(order.order_id, user_account)
+        node_list = self.order_index.pop(order_signature, None)
+        if node_list is not None:
+            market_type = market_type_to_string(order.market_type)
+            self.open_orders[market_type].discard(order_signature)
+            node_list.remove(order, user_account)
+            self._invalidate_best_price(order)
+
+    def _invalidate_best_price(self, order: Order):
+        if not self.best_price_cache:
             return
 
-        for _, node_lists in self.order_lists[market_type_str].items():
-            nodes_to_update = []
+        is_long = variant_tag(order.direction) == PositionDirectionNum.LONG
+        self.best_price_cache.pop(
+            (
+                market_type_to_string(order.market_type),
+                order.market_index,
+                "bid" if is_long else "ask",
+            ),
+            None,
+        )
 
-            for node in node_lists.taking_limit["ask"].get_generator():
-                if not is_resting_limit_order(node.order, slot):
-                    continue
-                nodes_to_update.append({"side": "ask", "node": node})
+    def get_list_holding_order(
+        self, order_id: int, user_account: Pubkey
+    ) -> Optional[NodeList]:
+        return self.order_index.get(get_order_signature(order_id, user_account))
 
-            for node in node_lists.taking_limit["bid"].get_generator():
-                if not is_resting_limit_order(node.order, slot):
-                    continue
-                nodes_to_update.append({"side": "bid", "node": node})
-
-            for node_to_update in nodes_to_update:
-                side = node_to_update["side"]
-                node = node_to_update["node"]
-                node_lists.taking_limit[side].remove(node.order, node.user_account)
-                node_lists.resting_limit[side].insert(
-                    node.order, market_type_str, node.user_account
-                )
+    def get_order(self, order_id: int, user_account: Pubkey) -> Optional[Order]:
+        order_signature = get_order_signature(order_id, user_account)
+        node_list = self.order_index.get(order_signature)
+        if node_list is None:
+            return None
+
+        return node_list.get(order_signature).order
 
     def update_resting_limit_orders(self, slot: int):
+        """
+        Moves taking limit orders whose auction has ended into the resting limit
+        lists. Only orders whose auction end slot has been reached are looked at.
+        """
         if slot <= self.max_slot_for_resting_limit_orders:
             return
 
         self.max_slot_for_resting_limit_orders = slot
 
-        self._update_resting_limit_orders_for_market_type(slot, "perp")
-        self._update_resting_limit_orders_for_market_type(slot, "spot")
+        auction_ends = self.taking_limit_auction_ends
+        while auction_ends and auction_ends[0][0] <= slot:
+            _, _, order_signature = heapq.heappop(auction_ends)
+
+            # the order may have been removed or moved since it was queued
+            node_list = self.order_index.get(order_signature)
+            if node_list is None or node_list.node_type != "takingLimit":
+                continue
+
+            node = node_list.get(order_signature)
+            if not is_resting_limit_order(node.order, slot):
+                continue
+
+            market_type_str = market_type_to_string(node.order.market_type)
+            is_long = variant_tag(node.order.direction) == PositionDirectionNum.LONG
+            side = "bid" if is_long else "ask"
+            node_lists = self.order_lists[market_type_str][node.order.market_index]
+
+            self.remove_from_list(node.order, node.user_account)
+            self.insert_into_list(
+                node_lists.resting_limit[side],
+                node.order,
+                market_type_str,
+                node.user_account,
+            )
 
     def update_order(
         self,
@@ -274,11 +454,12 @@ class DLOB:
         if order.base_asset_amount_filled == cumulative_base_asset_amount_filled:
             return
 
-        new_order = copy.deepcopy(order)
-
-        new_order.base_asset_amount_filled = cumulative_base_asset_amount_filled
-
-        self.get_list_for_order(order, slot).update(new_order, user_account)
+        node_list = self.get_list_holding_order(order.order_id, user_account)
+        if node_list is not None:
+            node_list.update_base_asset_amount_filled(
+                order, user_account, cumulative_base_asset_amount_filled
+            )
+            self._invalidate_best_price(order)
 
         if on_update is not None and callable(on_update):
             on_update()
@@ -290,12 +471,12 @@ class DLOB:
         slot: int,
         on_delete: Optional[OrderBookCallback] = None,
     ):
-        if is_variant(order.status, "Init"):
+        if variant_tag(order.status) == OrderStatusNum.INIT:
             return
 
         self.update_resting_limit_orders(slot)
 
-        self.get_list_for_order(order, slot).remove(order, user_account)
+        self.remove_from_list(order, user_account)
 
         if on_delete is not None and callable(on_delete):
             on_delete()
@@ -318,6 +499,14 @@ class DLOB:
 
         self.order_lists.clear()
 
+        self.order_index.clear()
+
+        self.taking_limit_auction_ends.clear()
+
+        self.best_price_cache.clear()
+
+        self.simulated_fills.clear()
+
         self.max_slot_for_resting_limit_orders = 0
 
         self.init()
@@ -329,7 +518,7 @@ class DLOB:
         slot: int,
         on_trigger: Optional[OrderBookCallback] = None,
     ):
-        if is_variant(order, "Init"):
+        if variant_tag(order.status) == OrderStatusNum.INIT:
             return
 
         self.update_resting_limit_orders(slot)
@@ -339,16 +528,11 @@ class DLOB:
 
         market_type = market_type_to_string(order.market_type)
 
-        trigger_list = (
-            self.order_lists.get(market_type)
-            .get(order.market_index)
-            .trigger[
-                "above" if is_variant(order.trigger_condition, "Above") else "Below"
-            ]
-        )
-        trigger_list.remove(order, user_account)
+        self.remove_from_list(order, user_account)
 
-        self.get_list_for_order(order, slot).insert(order, market_type, user_account)
+        self.insert_into_list(
+            self.get_list_for_order(order, slot), order, market_type, user_account
+        )
 
         if on_trigger is not None and callable(on_trigger):
             on_trigger()
@@ -361,43 +545,34 @@ class DLOB:
         generator_list: List[Generator[DLOBNode, None, None]],
         oracle_price_data: OraclePriceData,
         slot: int,
-        compare_fcn: Callable[[DLOBNode, DLOBNode, int, OraclePriceData], bool],
+        sort_key_fcn: DLOBSortKeyFcn,
         filter_fcn: Optional[DLOBFilterFcn] = None,
     ) -> Generator[DLOBNode, None, None]:
-        generators = [
-            {"next": next(generator, None), "generator": generator}
-            for generator in generator_list
-        ]
-
-        side_exhausted = False
-        while not side_exhausted:
-            best_generator = None
-            for current_generator in generators:
-                if current_generator["next"] is None:
-                    continue
-                if best_generator is None or compare_fcn(
-                    best_generator["next"],
-                    current_generator["next"],
-                    slot,
-                    oracle_price_data,
-                ):
-                    best_generator = current_generator
-
-            if best_generator and best_generator["next"]:
-                # Skip this node is it's already completely filled or fails filter function
-                if best_generator["next"].is_base_filled() or (
-                    filter_fcn and not filter_fcn(best_generator["next"])
-                ):
-                    best_generator["next"] = next(best_generator["generator"], None)
-                    continue
-
-                yield best_generator["next"]
-                try:
-                    best_generator["next"] = next(best_generator["generator"])
-                except StopIteration:
-                    best_generator["next"] = None
+        """
+        k-way merge of already sorted node generators, ordered by `sort_key_fcn`.
+        Ties fall back to the position of the generator in `generator_list`.
+        """
+        heap = []
+        for index, generator in enumerate(generator_list):
+            node = next(generator, None)
+            if node is not None:
+                heap.append((sort_key_fcn(node), index, node, generator))
+        heapq.heapify(heap)
+
+        while heap:
+            _, index, node, generator = heap[0]
+
+            # Skip this node is it's already completely filled or fails filter function
+            if not node.is_base_filled() and (filter_fcn is None or filter_fcn(node)):
+                yield node
+
+            next_node = next(generator, None)
+            if next_node is None:
+                heapq.heappop(heap)
             else:
-                side_exhausted = True
+                heapq.heapreplace(
+                    heap, (sort_key_fcn(next_node), index, next_node, generator)
+                )
 
     def estimate_fill_with_exact_base_amount(
         self,
@@ -440,9 +615,7 @@ class DLOB:
         for side in dlob_side:
             price = side.get_price(oracle_price_data, slot)
 
-            base_amount_remaining = (
-                side.order.base_asset_amount - side.order.base_asset_amount_filled
-            )
+            base_amount_remaining = side.get_base_remaining()
 
             if running_sum_base + base_amount_remaining > base_amount_in:
                 remaining_base = base_amount_in - running_sum_base
@@ -479,13 +652,11 @@ class DLOB:
             node_lists.floating_limit["ask"].get_generator(),
         ]
 
-        def cmp(best_node, current_node, slot, oracle_price_data):
-            return best_node.get_price(
-                oracle_price_data, slot
-            ) < current_node.get_price(oracle_price_data, slot)
+        def sort_key(node):
+            return (node.get_price(oracle_price_data, slot), node.order.slot)
 
         yield from self._get_best_node(
-            generator_list, oracle_price_data, slot, cmp, filter_fcn
+            generator_list, oracle_price_data, slot, sort_key, filter_fcn
         )
 
     def get_resting_limit_bids(
@@ -512,13 +683,11 @@ class DLOB:
             node_lists.floating_limit["bid"].get_generator(),
         ]
 
-        def cmp(best_node, current_node, slot, oracle_price_data):
-            return best_node.get_price(
-                oracle_price_data, slot
-            ) > current_node.get_price(oracle_price_data, slot)
+        def sort_key(node):
+            return (-node.get_price(oracle_price_data, slot), node.order.slot)
 
         yield from self._get_best_node(
-            generator_list, oracle_price_data, slot, cmp, filter_fcn
+            generator_list, oracle_price_data, slot, sort_key, filter_fcn
         )
 
     def get_best_ask(
@@ -528,11 +697,9 @@ class DLOB:
         market_type: MarketType,
         oracle_price_data: OraclePriceData,
     ) -> int:
-        return next(
-            self.get_resting_limit_asks(
-                market_index, slot, market_type, oracle_price_data
-            )
-        ).get_price(oracle_price_data, slot)
+        return self._get_best_price(
+            "ask", market_index, slot, market_type, oracle_price_data
+        )
 
     def get_best_bid(
         self,
@@ -541,12 +708,39 @@ class DLOB:
         market_type: MarketType,
         oracle_price_data: OraclePriceData,
     ) -> int:
-        return next(
-            self.get_resting_limit_bids(
-                market_index, slot, market_type, oracle_price_data
-            )
+        return self._get_best_price(
+            "bid", market_index, slot, market_type, oracle_price_data
+        )
+
+    def _get_best_price(
+        self,
+        side: str,
+        market_index: int,
+        slot: int,
+        market_type: MarketType,
+        oracle_price_data: OraclePriceData,
+    ) -> int:
+        # may move orders into the resting lists, which invalidates the cache
+        self.update_resting_limit_orders(slot)
+
+        key = (market_type_to_string(market_type), market_index, side)
+        oracle_price = oracle_price_data.price if oracle_price_data else None
+        cached = self.best_price_cache.get(key)
+        if cached is not None and cached[0] == slot and cached[1] == oracle_price:
+            return cached[2]
+
+        get_nodes = (
+            self.get_resting_limit_asks
+            if side == "ask"
+            else self.get_resting_limit_bids
+        )
+        price = next(
+            get_nodes(market_index, slot, market_type, oracle_price_data)
         ).get_price(oracle_price_data, slot)
 
+        self.best_price_cache[key] = (slot, oracle_price, price)
+        return price
+
     def get_taking_bids(
         self,
         market_index: int,
@@ -567,14 +761,14 @@ class DLOB:
             order_lists.taking_limit["bid"].get_generator(),
         ]
 
-        def cmp(best_node, current_node, slot, oracle_price_data):
-            return best_node.order.slot > current_node.order.slot
+        def sort_key(node):
+            return node.order.slot
 
         yield from self._get_best_node(
             generator_list,
             oracle_price_data,
             slot,
-            cmp,
+            sort_key,
         )
 
     def get_taking_asks(
@@ -597,10 +791,12 @@ class DLOB:
             order_lists.taking_limit["ask"].get_generator(),
         ]
 
-        def cmp(best_node, current_node, slot, oracle_price_data):
-            return best_node.order.slot > current_node.order.slot
+        def sort_key(node):
+            return node.order.slot
 
-        yield from self._get_best_node(generator_list, oracle_price_data, slot, cmp)
+        yield from self._get_best_node(
+            generator_list, oracle_price_data, slot, sort_key
+        )
 
     def get_asks(
         self,
@@ -624,28 +820,14 @@ class DLOB:
         if market_type_str == "perp" and fallback_ask:
             generator_list.append(get_vamm_node_generator(fallback_ask))
 
-        def cmp(best_node, current_node, slot, oracle_price_data):
-            best_node_taking = bool(best_node.order) and is_taking_order(
-                best_node.order, slot
-            )
-            current_node_taking = bool(current_node.order) and is_taking_order(
-                current_node.order, slot
-            )
-
-            if best_node_taking and current_node_taking:
-                return best_node.order.slot < current_node.order.slot
-
-            if best_node_taking:
-                return True
-
-            if current_node_taking:
-                return False
+        # taking orders first by slot, then the rest by price
+        def sort_key(node):
+            if node.order and is_taking_order(node.order, slot):
+                return (0, node.order.slot)
+            order_slot = node.order.slot if node.order else 0
+            return (1, node.get_price(oracle_price_data, slot), order_slot)
 
-            return best_node.get_price(
-                oracle_price_data, slot
-            ) < current_node.get_price(oracle_price_data, slot)
-
-        return self._get_best_node(generator_list, oracle_price_data, slot, cmp)
+        return self._get_best_node(generator_list, oracle_price_data, slot, sort_key)
 
     def get_bids(
         self,
@@ -674,20 +856,14 @@ class DLOB:
             )
         )
 
-        def cmp(best_node, current_node, slot, oracle_price_data):
-            if isinstance(best_node, RestingLimitOrderNode) or isinstance(
-                current_node, RestingLimitOrderNode
-            ):
-                return isinstance(best_node, RestingLimitOrderNode)
-
-            if isinstance(best_node, VAMMNode) or isinstance(current_node, VAMMNode):
-                return isinstance(best_node, VAMMNode)
+        # taking orders first by slot, then the rest by price
+        def sort_key(node):
+            if node.order and is_taking_order(node.order, slot):
+                return (0, node.order.slot)
+            order_slot = node.order.slot if node.order else 0
+            return (1, -node.get_price(oracle_price_data, slot), order_slot)
 
-            return best_node.get_price(
-                oracle_price_data, slot
-            ) < current_node.get_price(oracle_price_data, slot)
-
-        return self._get_best_node(generator_list, oracle_price_data, slot, cmp)
+        return self._get_best_node(generator_list, oracle_price_data, slot, sort_key)
 
     def find_nodes_crossing_fallback_liquidity(
         self,
@@ -699,18 +875,17 @@ class DLOB:
         min_auction_duration: int,
     ) -> List[NodeToFill]:
         nodes_to_fill = []
+        is_spot = variant_tag(market_type) == MarketTypeNum.SPOT
 
         for node in node_generator:
-            if is_variant(market_type, "Spot") and node.order.post_only:
+            if is_spot and node.order.post_only:
                 continue
 
-            node_price = get_limit_price(node.order, oracle_price_data, slot)
+            node_price = node.get_price(oracle_price_data, slot)
 
             crosses = does_cross(node_price)
 
-            fallback_available = is_variant(
-                market_type, "Spot"
-            ) or is_fallback_available_liquidity_source(
+            fallback_available = is_spot or is_fallback_available_liquidity_source(
                 node.order, min_auction_duration, slot
             )
 
@@ -752,35 +927,14 @@ class DLOB:
                 nodes_to_fill.append(NodeToFill(taker_node, [maker_node]))
 
                 # Update orders
-                maker_base_remaining = (
-                    maker_node.order.base_asset_amount
-                    - maker_node.order.base_asset_amount_filled
-                )
-                taker_base_remaining = (
-                    taker_node.order.base_asset_amount
-                    - taker_node.order.base_asset_amount_filled
+                base_filled = min(
+                    maker_node.get_base_remaining(), taker_node.get_base_remaining()
                 )
 
-                base_filled = min(maker_base_remaining, taker_base_remaining)
+                self._simulate_fill(maker_node, base_filled)
+                self._simulate_fill(taker_node, base_filled)
 
-                new_maker_order = copy.deepcopy(maker_node.order)
-                new_maker_order.base_asset_amount_filled += base_filled
-
-                self.get_list_for_order(new_maker_order, slot).update(
-                    new_maker_order, maker_node.user_account
-                )
-
-                new_taker_order = copy.deepcopy(taker_node.order)
-                new_taker_order.base_asset_amount_filled += base_filled
-
-                self.get_list_for_order(new_taker_order, slot).update(
-                    new_taker_order, taker_node.user_account
-                )
-
-                if (
-                    new_taker_order.base_asset_amount_filled
-                    == taker_node.order.base_asset_amount
-                ):
+                if taker_node.is_base_filled():
                     break
 
         return nodes_to_fill
@@ -953,9 +1107,6 @@ class DLOB:
                 if bid_price < ask_price:
                     break
 
-                bid_order = bid.order
-                ask_order = ask.order
-
                 # can't match from same user
                 if bid.user_account == ask.user_account:
                     break
@@ -968,26 +1119,14 @@ class DLOB:
 
                 taker, maker = maker_and_taker
 
-                bid_base_remaining = (
-                    bid_order.base_asset_amount - bid_order.base_asset_amount_filled
-                )
-                ask_base_remaining = (
-                    ask_order.base_asset_amount - ask_order.base_asset_amount_filled
-                )
-
-                base_filled = min(bid_base_remaining, ask_base_remaining)
+                base_filled = min(bid.get_base_remaining(), ask.get_base_remaining())
 
-                new_bid = copy.deepcopy(bid_order)
-                new_bid.base_asset_amount_filled += base_filled
-                self.get_list_for_order(new_bid, slot).update(new_bid, bid.user_account)
-
-                new_ask = copy.deepcopy(ask_order)
-                new_ask.base_asset_amount_filled += base_filled
-                self.get_list_for_order(new_ask, slot).update(new_ask, ask.user_account)
+                self._simulate_fill(bid, base_filled)
+                self._simulate_fill(ask, base_filled)
 
                 nodes_to_fill.append(NodeToFill(taker, [maker]))
 
-                if new_ask.base_asset_amount == new_ask.base_asset_amount_filled:
+                if ask.is_base_filled():
                     break
 
         return nodes_to_fill
@@ -1099,10 +1238,8 @@ class DLOB:
         resting_limit_order_nodes_to_fill: List[NodeToFill],
         taking_order_nodes_to_fill: List[NodeToFill],
     ) -> List[NodeToFill]:
-        from driftpy.dlob.node_list import get_order_signature
-
         nodes_to_fill: List[NodeToFill] = []
-        merged_nodes_to_fill: Dict[str, NodeToFill] = {}
+        merged_nodes_to_fill: Dict[OrderSignature, NodeToFill] = {}
 
         def merge_nodes_to_fill_helper(nodes_to_fill_list):
             for node_to_fill in nodes_to_fill_list:
@@ -1210,29 +1347,47 @@ class DLOB:
         if exchange_paused(state_account):
             return []
 
-        nodes_to_trigger = []
-        market_type_str = market_type_to_string(market_type)
-        market_node_lists = self.order_lists.get(market_type_str).get(market_index)  # type: ignore
+        return self._find_nodes_to_trigger_for_market(
+            market_type_to_string(market_type), market_index, oracle_price
+        )
 
-        trigger_above_list = market_node_lists.trigger["above"] or None  # type: ignore
+    def find_nodes_to_trigger_batch(
+        self,
+        oracle_prices: Dict[Tuple[str, int], int],
+        state_account: StateAccount,
+    ) -> Dict[Tuple[str, int], List[NodeToTrigger]]:
+        """
+        find the trigger orders crossed by a set of oracle updates
 
-        if trigger_above_list:
-            for node in trigger_above_list.get_generator():
-                if oracle_price > node.order.trigger_price:
-                    nodes_to_trigger.append(NodeToTrigger(node))
-                else:
-                    break
+        `oracle_prices` maps `(market_type_to_string(market_type), market_index)` to
+        an oracle price, the result is keyed the same way. Markets with nothing to
+        trigger are left out.
+        """
+        if exchange_paused(state_account):
+            return {}
 
-        trigger_below_list = market_node_lists.trigger["below"] or None  # type: ignore
+        results = {}
+        for (market_type_str, market_index), oracle_price in oracle_prices.items():
+            nodes_to_trigger = self._find_nodes_to_trigger_for_market(
+                market_type_str, market_index, oracle_price
+            )
+            if nodes_to_trigger:
+                results[(market_type_str, market_index)] = nodes_to_trigger
+        return results
+
+    def _find_nodes_to_trigger_for_market(
+        self, market_type_str: str, market_index: int, oracle_price: int
+    ) -> List[NodeToTrigger]:
+        market_node_lists = self.order_lists.get(market_type_str, {}).get(market_index)
+        if market_node_lists is None:
+            return []
 
-        if trigger_below_list:
-            for node in trigger_below_list.get_generator():
-                if oracle_price < node.order.trigger_price:
-                    nodes_to_trigger.append(NodeToTrigger(node))
-                else:
-                    break
+        # above orders trigger once the oracle is over their trigger price and the
+        # list is sorted by ascending trigger price, below orders mirror that
+        nodes = market_node_lists.trigger["above"].get_nodes_before(oracle_price)
+        nodes += market_node_lists.trigger["below"].get_nodes_before(oracle_price)
 
-        return nodes_to_trigger
+        return [NodeToTrigger(node) for node in nodes]
 
     def get_l2(
         self,
@@ -1262,7 +1417,7 @@ class DLOB:
 
         ask_l2_level_generator = merge_l2_level_generators(
             [maker_ask_l2_level_generator] + fallback_ask_generators,
-            lambda a, b: a.price < b.price,
+            lambda level: level.price,
         )
 
         asks = create_l2_levels(ask_l2_level_generator, depth)
@@ -1282,7 +1437,7 @@ class DLOB:
 
         bid_l2_level_generator = merge_l2_level_generators(
             [maker_bid_l2_level_generator] + fallback_bid_generators,
-            lambda a, b: a.price > b.price,
+            lambda level: -level.price,
         )
 
         bids = create_l2_levels(bid_l2_level_generator, depth)
@@ -1311,8 +1466,7 @@ class DLOB:
             asks.append(
                 L3Level(
                     price=ask.get_price(oracle_price_data, slot),
-                    size=ask.order.base_asset_amount
-                    - ask.order.base_asset_amount_filled,
+                    size=ask.get_base_remaining(),
                     maker=ask.user_account,
                     order_id=ask.order.order_id,
                 )
@@ -1326,11 +1480,123 @@ class DLOB:
             bids.append(
                 L3Level(
                     price=bid.get_price(oracle_price_data, slot),
-                    size=bid.order.base_asset_amount
-                    - bid.order.base_asset_amount_filled,
+                    size=bid.get_base_remaining(),
                     maker=bid.user_account,
                     order_id=bid.order.order_id,
                 )
             )
 
         return L3OrderBook(asks, bids, slot)
+
+    def get_l2_batch(
+        self,
+        markets: List[MarketIdentifier],
+        slot: int,
+        oracle_map: Dict[Tuple[str, int], OraclePriceData],
+        depth: int,
+        fallback_l2_generators: Optional[
+            Dict[Tuple[str, int], List[L2OrderBookGenerator]]
+        ] = None,
+        executor: Optional[Executor] = None,
+    ) -> Dict[Tuple[str, int], L2OrderBook]:
+        """
+        get l2 views of the orderbook for several markets at the same slot
+
+        `oracle_map` and `fallback_l2_generators` are keyed by
+        `(market_type_to_string(market_type), market_index)`, as is the result.
+
+        Markets are built one after the other unless an `executor` is given. The
+        work is pure Python, so only a process pool builds books in parallel: it
+        is handed a `DLOBSnapshot` of the markets, one task per market type, and
+        the fallback levels are merged in afterwards.
+        """
+        fallback_l2_generators = fallback_l2_generators or {}
+
+        if executor is None:
+            self.update_resting_limit_orders(slot)
+            books = {}
+            for market in markets:
+                key = (market_type_to_string(market.market_type), market.market_index)
+                books[key] = self.get_l2(
+                    market.market_index,
+                    market.market_type,
+                    slot,
+                    oracle_map[key],
+                    depth,
+                    fallback_l2_generators.get(key, []),
+                )
+            return books
+
+        books = self._run_batch(
+            markets, slot, oracle_map, executor, get_l2_books, depth
+        )
+        for key, generators in fallback_l2_generators.items():
+            book = books.get(key)
+            if book is None or not generators:
+                continue
+            # the snapshot books hold the best `depth` dlob levels, which is all
+            # a merged book of that depth can take from the dlob
+            asks = merge_l2_level_generators(
+                [iter(book.asks)]
+                + [generator.get_l2_asks() for generator in generators],
+                lambda level: level.price,
+            )
+            bids = merge_l2_level_generators(
+                [iter(book.bids)]
+                + [generator.get_l2_bids() for generator in generators],
+                lambda level: -level.price,
+            )
+            books[key] = L2OrderBook(
+                create_l2_levels(asks, depth), create_l2_levels(bids, depth), slot
+            )
+        return books
+
+    def get_l3_batch(
+        self,
+        markets: List[MarketIdentifier],
+        slot: int,
+        oracle_map: Dict[Tuple[str, int], OraclePriceData],
+        executor: Optional[Executor] = None,
+    ) -> Dict[Tuple[str, int], L3OrderBook]:
+        """
+        get l3 views of the orderbook for several markets at the same slot
+
+        keyed like `get_l2_batch`, and an `executor` is used the same way
+        """
+        if executor is None:
+            self.update_resting_limit_orders(slot)
+            books = {}
+            for market in markets:
+                key = (market_type_to_string(market.market_type), market.market_index)
+                books[key] = self.get_l3(
+                    market.market_index, market.market_type, slot, oracle_map[key]
+                )
+            return books
+
+        return self._run_batch(markets, slot, oracle_map, executor, get_l3_books)
+
+    def _run_batch(
+        self,
+        markets: List[MarketIdentifier],
+        slot: int,
+        oracle_map: Dict[Tuple[str, int], OraclePriceData],
+        executor: Executor,
+        fn: Callable[..., dict],
+        *args,
+    ) -> dict:
+        # the snapshot is plain bytes, so it pickles into worker processes
+        buffer = DLOBSnapshot.build_buffer(self, markets, slot, oracle_map)
+
+        markets_by_type: Dict[str, List[MarketIdentifier]] = {}
+        for market in markets:
+            market_type = market_type_to_string(market.market_type)
+            markets_by_type.setdefault(market_type, []).append(market)
+
+        results = {}
+        futures = [
+            executor.submit(fn, buffer, type_markets, *args)
+            for type_markets in markets_by_type.values()
+        ]
+        for future in futures:
+            results.update(future.result())
+        return results
@@ -40,7 +40,7 @@ def get_maker_rebate(
 
 
 def get_node_lists(order_lists):
-    from driftpy.dlob.dlob_node import MarketNodeLists
+    from driftpy.dlob.dlob import MarketNodeLists
 
     order_lists: Dict[str, Dict[int, MarketNodeLists]]
 
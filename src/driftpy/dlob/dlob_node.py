@@ -8,6 +8,9 @@ from driftpy.types import OraclePriceData, Order, is_variant
 
 
 class DLOBNode(ABC):
+    # nodes are created per order, so none of them carry a __dict__
+    __slots__ = ()
+
     @abstractmethod
     def get_price(self, oracle_price_data: OraclePriceData, slot: int) -> int:
         pass
@@ -22,6 +25,8 @@ class DLOBNode(ABC):
 
 
 class VAMMNode(DLOBNode):
+    __slots__ = ("price", "order")
+
     def __init__(self, price: int):
         self.price = price
         self.order = None
@@ -37,21 +42,46 @@ class VAMMNode(DLOBNode):
 
 
 class OrderNode(DLOBNode):
+    __slots__ = (
+        "order",
+        "user_account",
+        "sort_value",
+        "have_filled",
+        "have_trigger",
+        "base_asset_amount_filled",
+        "sort_key",
+        "next",
+        "previous",
+        "skip_next",
+        "price_cache",
+        "price_cache_key",
+        "price_cache_order",
+    )
+
     def __init__(self, order: Order, user_account: Pubkey):
         self.order = order
         self.user_account = user_account
         self.sort_value = self.get_sort_value(order)
         self.have_filled = False
         self.have_trigger = False
+        # fills applied by the DLOB are tracked here rather than on a copy of the order
+        self.base_asset_amount_filled = order.base_asset_amount_filled
+        # maintained by NodeList
+        self.sort_key = None
+        self.next = None
+        self.previous = None
+        self.skip_next = []
+        # last get_price result, valid for price_cache_key and price_cache_order
+        self.price_cache = None
+        self.price_cache_key = None
+        self.price_cache_order = None
 
     @abstractmethod
     def get_sort_value(self, order: Order):
         pass
 
     def get_label(self):
-        from driftpy.dlob.node_list import get_order_signature
-
-        msg = f"Order {get_order_signature(self.order.order_id, self.user_account)}"
+        msg = f"Order {self.user_account}-{self.order.order_id}"
         direction = "Long" if is_variant(self.order.direction, "Long") else "Short"
         msg += f" {direction} {convert_to_number(self.order.base_asset_amount, AMM_RESERVE_PRECISION):.3f}"
         if self.order.price > 0:
@@ -66,60 +96,63 @@ class OrderNode(DLOBNode):
         return msg
 
     def get_price(self, oracle_price_data: OraclePriceData, slot: int):
-        return get_limit_price(self.order, oracle_price_data, slot)
+        # auction and oracle offset prices only depend on the slot and oracle price,
+        # so repeated comparisons during a traversal reuse the same value
+        oracle_price = oracle_price_data.price if oracle_price_data else None
+        key = (slot, oracle_price)
+        if self.price_cache_key == key and self.price_cache_order is self.order:
+            return self.price_cache
+
+        price = get_limit_price(self.order, oracle_price_data, slot)
+        self.price_cache = price
+        self.price_cache_key = key
+        self.price_cache_order = self.order
+        return price
+
+    def get_base_remaining(self) -> int:
+        """
+        Base left to fill, including fills simulated by the DLOB that are not
+        reflected in `order.base_asset_amount_filled`.
+        """
+        return self.order.base_asset_amount - self.base_asset_amount_filled
 
     def is_base_filled(self) -> bool:
-        return self.order.base_asset_amount_filled == self.order.base_asset_amount
+        return self.base_asset_amount_filled == self.order.base_asset_amount
 
     def is_vamm_node(self):
         return False
 
 
 class TakingLimitOrderNode(OrderNode):
-    def __init__(self, order: Order, user_account: Pubkey):
-        super().__init__(order, user_account)
-        self.next = None
-        self.previous = None
+    __slots__ = ()
 
     def get_sort_value(self, order: Order) -> int:
         return order.slot
 
 
 class RestingLimitOrderNode(OrderNode):
-    def __init__(self, order: Order, user_account: Pubkey):
-        super().__init__(order, user_account)
-        self.next = None
-        self.previous = None
+    __slots__ = ()
 
     def get_sort_value(self, order: Order) -> int:
         return order.price
 
 
 class FloatingLimitOrderNode(OrderNode):
-    def __init__(self, order: Order, user_account: Pubkey):
-        super().__init__(order, user_account)
-        self.next = None
-        self.previous = None
+    __slots__ = ()
 
     def get_sort_value(self, order: Order) -> int:
         return order.oracle_price_offset
 
 
 class MarketOrderNode(OrderNode):
-    def __init__(self, order: Order, user_account: Pubkey):
-        super().__init__(order, user_account)
-        self.next = None
-        self.previous = None
+    __slots__ = ()
 
     def get_sort_value(self, order: Order) -> int:
         return order.slot
 
 
 class TriggerOrderNode(OrderNode):
-    def __init__(self, order: Order, user_account: Pubkey):
-        super().__init__(order, user_account)
-        self.next = None
-        self.previous = None
+    __slots__ = ()
 
     def get_sort_value(self, order: Order) -> int:
         return order.trigger_price
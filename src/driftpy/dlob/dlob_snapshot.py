@@ -0,0 +1,350 @@
+import mmap
+from multiprocessing import shared_memory
+from typing import TYPE_CHECKING, Dict, Generator, List, Optional, Tuple
+
+import numpy as np
+from solders.pubkey import Pubkey
+
+from driftpy.dlob.orderbook_levels import (
+    L2Level,
+    L2OrderBook,
+    L2OrderBookGenerator,
+    L3Level,
+    L3OrderBook,
+    create_l2_levels,
+    merge_l2_level_generators,
+)
+from driftpy.types import (
+    MarketIdentifier,
+    MarketType,
+    OraclePriceData,
+    market_type_to_string,
+    variant_tag,
+)
+
+if TYPE_CHECKING:
+    from driftpy.dlob.dlob import DLOB
+
+SNAPSHOT_MAGIC = b"DLOBSNP1"
+
+SIDE_ASK = 0
+SIDE_BID = 1
+
+FLAG_FLOATING = 1
+FLAG_POST_ONLY = 2
+
+HEADER_DTYPE = np.dtype(
+    [
+        ("magic", "S8"),
+        ("slot", "<i8"),
+        ("num_segments", "<i8"),
+        ("num_users", "<i8"),
+        ("num_orders", "<i8"),
+    ]
+)
+
+# one segment per market side, pointing at a run of rows in the order table
+SEGMENT_DTYPE = np.dtype(
+    [
+        ("market_type", "u1"),
+        ("side", "u1"),
+        ("market_index", "<u2"),
+        ("start", "<i8"),
+        ("end", "<i8"),
+    ]
+)
+
+ORDER_DTYPE = np.dtype(
+    [
+        ("price", "<i8"),
+        ("size", "<i8"),
+        ("slot", "<i8"),
+        ("user_index", "<u4"),
+        ("order_id", "<u4"),
+        ("flags", "u1"),
+    ]
+)
+
+PUBKEY_LENGTH = 32
+
+
+class DLOBSnapshot:
+    """
+    Read-only, columnar copy of the resting limit orders of a DLOB at one slot.
+
+    Every market side is a run of rows in a single structured array, sorted best
+    price first, and users are stored once in a pubkey table. The whole snapshot
+    is one flat buffer, so it can be written to a file or to shared memory and
+    opened from other processes without rebuilding any `OrderNode`s.
+    """
+
+    def __init__(self, buffer, owner=None):
+        # `owner` is whatever backs `buffer` (mmap, SharedMemory) and is kept alive
+        # for as long as the arrays below point into it
+        self._owner = owner
+
+        # copied out so that no view of the header outlives the buffer
+        header = np.frombuffer(buffer, HEADER_DTYPE, 1).copy()[0]
+        if header["magic"] != SNAPSHOT_MAGIC:
+            raise ValueError("Buffer is not a DLOB snapshot")
+        offset = HEADER_DTYPE.itemsize
+
+        self.slot = int(header["slot"])
+
+        num_segments = int(header["num_segments"])
+        self.segments = np.frombuffer(buffer, SEGMENT_DTYPE, num_segments, offset)
+        offset += SEGMENT_DTYPE.itemsize * num_segments
+
+        num_users = int(header["num_users"])
+        self.users = np.frombuffer(
+            buffer, np.uint8, num_users * PUBKEY_LENGTH, offset
+        ).reshape(num_users, PUBKEY_LENGTH)
+        offset += PUBKEY_LENGTH * num_users
+
+        self.orders = np.frombuffer(
+            buffer, ORDER_DTYPE, int(header["num_orders"]), offset
+        )
+
+        for array in (self.segments, self.users, self.orders):
+            array.flags.writeable = False
+
+        self.segment_map: Dict[Tuple[int, int, int], Tuple[int, int]] = {
+            (int(market_type), int(market_index), int(side)): (int(start), int(end))
+            for market_type, side, market_index, start, end in self.segments
+        }
+
+    @classmethod
+    def from_dlob(
+        cls,
+        dlob: "DLOB",
+        markets: List[MarketIdentifier],
+        slot: int,
+        oracle_map: Dict[Tuple[str, int], OraclePriceData],
+    ) -> "DLOBSnapshot":
+        """
+        `oracle_map` is keyed like `DLOB.get_l2_batch`. Prices are fixed at `slot`
+        and those oracle prices.
+        """
+        return cls(cls.build_buffer(dlob, markets, slot, oracle_map))
+
+    @staticmethod
+    def build_buffer(
+        dlob: "DLOB",
+        markets: List[MarketIdentifier],
+        slot: int,
+        oracle_map: Dict[Tuple[str, int], OraclePriceData],
+    ) -> bytes:
+        dlob.update_resting_limit_orders(slot)
+
+        users: Dict[Pubkey, int] = {}
+        segments = []
+        rows = []
+        for market in markets:
+            key = (market_type_to_string(market.market_type), market.market_index)
+            oracle_price_data = oracle_map[key]
+            sides = [
+                (SIDE_ASK, dlob.get_resting_limit_asks),
+                (SIDE_BID, dlob.get_resting_limit_bids),
+            ]
+            for side, get_nodes in sides:
+                start = len(rows)
+                for node in get_nodes(
+                    market.market_index, slot, market.market_type, oracle_price_data
+                ):
+                    order = node.order
+                    flags = 0
+                    if order.oracle_price_offset != 0:
+                        flags |= FLAG_FLOATING
+                    if order.post_only:
+                        flags |= FLAG_POST_ONLY
+                    rows.append(
+                        (
+                            node.get_price(oracle_price_data, slot),
+                            node.get_base_remaining(),
+                            order.slot,
+                            users.setdefault(node.user_account, len(users)),
+                            order.order_id,
+                            flags,
+                        )
+                    )
+                segments.append(
+                    (
+                        variant_tag(market.market_type),
+                        side,
+                        market.market_index,
+                        start,
+                        len(rows),
+                    )
+                )
+
+        return pack_snapshot(
+            slot,
+            np.array(segments, SEGMENT_DTYPE),
+            np.frombuffer(b"".join(bytes(user) for user in users), np.uint8).reshape(
+                len(users), PUBKEY_LENGTH
+            ),
+            np.array(rows, ORDER_DTYPE),
+        )
+
+    def to_bytes(self) -> bytes:
+        return pack_snapshot(self.slot, self.segments, self.users, self.orders)
+
+    def write(self, path: str):
+        with open(path, "wb") as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def open(cls, path: str) -> "DLOBSnapshot":
+        """
+        Maps a snapshot written with `write`, pages are shared between processes
+        that open the same file.
+        """
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(mapped, mapped)
+
+    def to_shared_memory(
+        self, name: Optional[str] = None
+    ) -> shared_memory.SharedMemory:
+        """
+        Copies the snapshot into a new shared memory block. The caller owns the
+        block and is responsible for `close()` and `unlink()`.
+        """
+        data = self.to_bytes()
+        shm = shared_memory.SharedMemory(name=name, create=True, size=len(data))
+        shm.buf[: len(data)] = data
+        return shm
+
+    @classmethod
+    def from_shared_memory(cls, name: str) -> "DLOBSnapshot":
+        shm = shared_memory.SharedMemory(name=name)
+        return cls(shm.buf, shm)
+
+    def close(self):
+        # the arrays are views into the owner's buffer and must go first
+        self.segments = self.users = self.orders = None
+        self.segment_map = {}
+        if self._owner is not None:
+            self._owner.close()
+            self._owner = None
+
+    def get_side(self, market_index: int, market_type: MarketType, side: int):
+        start, end = self.segment_map.get(
+            (variant_tag(market_type), market_index, side), (0, 0)
+        )
+        return self.orders[start:end]
+
+    def get_user(self, user_index: int) -> Pubkey:
+        return Pubkey.from_bytes(self.users[user_index].tobytes())
+
+    def get_best_ask(self, market_index: int, market_type: MarketType) -> Optional[int]:
+        asks = self.get_side(market_index, market_type, SIDE_ASK)
+        return int(asks["price"][0]) if len(asks) else None
+
+    def get_best_bid(self, market_index: int, market_type: MarketType) -> Optional[int]:
+        bids = self.get_side(market_index, market_type, SIDE_BID)
+        return int(bids["price"][0]) if len(bids) else None
+
+    def get_l2(
+        self,
+        market_index: int,
+        market_type: MarketType,
+        depth: int,
+        fallback_l2_generators: List[L2OrderBookGenerator] = [],
+    ) -> L2OrderBook:
+        """
+        get an l2 view of the orderbook for a given market at the snapshot slot
+        """
+        asks = create_l2_levels(
+            merge_l2_level_generators(
+                [self.get_l2_level_generator(market_index, market_type, SIDE_ASK)]
+                + [generator.get_l2_asks() for generator in fallback_l2_generators],
+                lambda level: level.price,
+            ),
+            depth,
+        )
+        bids = create_l2_levels(
+            merge_l2_level_generators(
+                [self.get_l2_level_generator(market_index, market_type, SIDE_BID)]
+                + [generator.get_l2_bids() for generator in fallback_l2_generators],
+                lambda level: -level.price,
+            ),
+            depth,
+        )
+        return L2OrderBook(asks, bids, self.slot)
+
+    def get_l2_level_generator(
+        self, market_index: int, market_type: MarketType, side: int
+    ) -> Generator[L2Level, None, None]:
+        orders = self.get_side(market_index, market_type, side)
+        if not len(orders):
+            return
+
+        # rows are sorted by price, so each level is a run of equal prices
+        prices = orders["price"]
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(prices)) + 1))
+        sizes = np.add.reduceat(orders["size"], starts)
+        for price, size in zip(prices[starts].tolist(), sizes.tolist()):
+            yield L2Level(price=price, size=size, sources={"dlob": size})
+
+    def get_l3(self, market_index: int, market_type: MarketType) -> L3OrderBook:
+        """
+        get an l3 view of the orderbook for a given market at the snapshot slot
+        """
+
+        def get_levels(side: int) -> List[L3Level]:
+            orders = self.get_side(market_index, market_type, side)
+            return [
+                L3Level(
+                    price=price,
+                    size=size,
+                    maker=self.get_user(user_index),
+                    order_id=order_id,
+                )
+                for price, size, user_index, order_id in zip(
+                    orders["price"].tolist(),
+                    orders["size"].tolist(),
+                    orders["user_index"].tolist(),
+                    orders["order_id"].tolist(),
+                )
+            ]
+
+        return L3OrderBook(get_levels(SIDE_ASK), get_levels(SIDE_BID), self.slot)
+
+
+def get_l2_books(
+    buffer: bytes, markets: List[MarketIdentifier], depth: int
+) -> Dict[Tuple[str, int], L2OrderBook]:
+    # top level so it can be sent to a process pool, see DLOB.get_l2_batch
+    snapshot = DLOBSnapshot(buffer)
+    return {
+        (market_type_to_string(market.market_type), market.market_index): (
+            snapshot.get_l2(market.market_index, market.market_type, depth)
+        )
+        for market in markets
+    }
+
+
+def get_l3_books(
+    buffer: bytes, markets: List[MarketIdentifier]
+) -> Dict[Tuple[str, int], L3OrderBook]:
+    # top level so it can be sent to a process pool, see DLOB.get_l3_batch
+    snapshot = DLOBSnapshot(buffer)
+    return {
+        (market_type_to_string(market.market_type), market.market_index): (
+            snapshot.get_l3(market.market_index, market.market_type)
+        )
+        for market in markets
+    }
+
+
+def pack_snapshot(
+    slot: int, segments: np.ndarray, users: np.ndarray, orders: np.ndarray
+) -> bytes:
+    header = np.array(
+        [(SNAPSHOT_MAGIC, slot, len(segments), len(users), len(orders))],
+        HEADER_DTYPE,
+    )
+    return b"".join(
+        [header.tobytes(), segments.tobytes(), users.tobytes(), orders.tobytes()]
+    )
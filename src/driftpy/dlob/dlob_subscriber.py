@@ -1,7 +1,9 @@
 import asyncio
 import json
+import logging
 import traceback
-from typing import Optional
+from concurrent.futures import Executor
+from typing import Dict, List, Optional, Tuple, Union
 import aiohttp
 from events import Events as EventEmitter
 from dataclasses import dataclass
@@ -13,14 +15,34 @@ from driftpy.dlob.orderbook_levels import (
     L3OrderBook,
     L2Level,
     L2OrderBook,
+    L2OrderBookDelta,
     L2OrderBookGenerator,
+    get_l2_delta,
     get_vamm_l2_generator,
+    group_l2,
 )
 from driftpy.types import (
+    MarketIdentifier,
     MarketType,
+    OraclePriceData,
     is_variant,
+    market_type_to_string,
 )
 
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    json_loads = json.loads
+
+logger = logging.getLogger(__name__)
+
+# longest wait between retries after subscribe_l2_deltas fails to compute deltas
+L2_DELTAS_MAX_BACKOFF_S = 30
+
+# connection pool for the DLOB server, requests to it reuse kept-alive connections
+SESSION_CONNECTION_LIMIT = 64
+SESSION_KEEPALIVE_TIMEOUT = 60
+
 
 @dataclass
 class MarketId:
@@ -41,6 +63,8 @@ class DLOBSubscriber:
         if url:
             self.url = url.rstrip("/")
         self.dlob = None
+        # L2Levels handed back through release_l2_orderbook, reused when decoding
+        self.l2_level_pool: List[L2Level] = []
         self.event_emitter = EventEmitter(("on_dlob_update"))
         self.event_emitter.on("on_dlob_update")
         if config is not None:
@@ -91,7 +115,12 @@ class DLOBSubscriber:
     @classmethod
     async def get_session(cls):
         if cls._session is None or cls._session.closed:
-            cls._session = aiohttp.ClientSession()
+            connector = aiohttp.TCPConnector(
+                limit=SESSION_CONNECTION_LIMIT,
+                limit_per_host=SESSION_CONNECTION_LIMIT,
+                keepalive_timeout=SESSION_KEEPALIVE_TIMEOUT,
+            )
+            cls._session = aiohttp.ClientSession(connector=connector)
         return cls._session
 
     @classmethod
@@ -107,24 +136,61 @@ class DLOBSubscriber:
             f"{self.url}/l2?marketType={market_type}&marketIndex={market.index}"
         ) as response:
             if response.status == 200:
-                data = await response.text()
+                data = await response.read()
                 return self.decode_l2_orderbook(data)
             else:
                 raise Exception("Failed to fetch L2 OrderBook data")
 
-    def decode_l2_orderbook(self, data: str) -> L2OrderBook:
-        data = json.loads(data)
+    async def get_l2_orderbooks(
+        self, markets: List[MarketId]
+    ) -> Dict[Tuple[str, int], L2OrderBook]:
+        """
+        Fetches the L2 books of several markets concurrently over the pooled
+        session, keyed by `("perp" | "spot", market_index)`.
+        """
+        books = await asyncio.gather(
+            *[self.get_l2_orderbook(market) for market in markets]
+        )
+        return {
+            (market_type_to_string(market.kind), market.index): book
+            for market, book in zip(markets, books)
+        }
+
+    def decode_l2_orderbook(self, data: Union[str, bytes]) -> L2OrderBook:
+        data = json_loads(data)
 
         asks = [
-            L2Level(ask["price"], ask["size"], ask["sources"]) for ask in data["asks"]
+            self.get_l2_level(ask["price"], ask["size"], ask["sources"])
+            for ask in data["asks"]
         ]
         bids = [
-            L2Level(bid["price"], bid["size"], bid["sources"]) for bid in data["bids"]
+            self.get_l2_level(bid["price"], bid["size"], bid["sources"])
+            for bid in data["bids"]
         ]
         slot = data.get("slot")
 
         return L2OrderBook(asks, bids, slot)
 
+    def get_l2_level(self, price: int, size: int, sources: Dict[str, int]) -> L2Level:
+        if not self.l2_level_pool:
+            return L2Level(price, size, sources)
+
+        level = self.l2_level_pool.pop()
+        level.price = price
+        level.size = size
+        level.sources = sources
+        return level
+
+    def release_l2_orderbook(self, l2: L2OrderBook):
+        """
+        Hands the levels of a decoded book back for reuse by later decodes.
+        The book must not be used afterwards.
+        """
+        self.l2_level_pool.extend(l2.asks)
+        self.l2_level_pool.extend(l2.bids)
+        l2.asks = []
+        l2.bids = []
+
     async def get_l3_orderbook(self, market: MarketId) -> L3OrderBook:
         session = await self.get_session()
         market_type = "perp" if is_variant(market.kind, "Perp") else "spot"
@@ -132,13 +198,28 @@ class DLOBSubscriber:
             f"{self.url}/l3?marketType={market_type}&marketIndex={market.index}"
         ) as response:
             if response.status == 200:
-                data = await response.text()
+                data = await response.read()
                 return self.decode_l3_orderbook(data)
             else:
                 raise Exception("Failed to fetch L3 OrderBook data")
 
-    def decode_l3_orderbook(self, data: str) -> L3OrderBook:
-        data = json.loads(data)
+    async def get_l3_orderbooks(
+        self, markets: List[MarketId]
+    ) -> Dict[Tuple[str, int], L3OrderBook]:
+        """
+        Fetches the L3 books of several markets concurrently, keyed like
+        `get_l2_orderbooks`.
+        """
+        books = await asyncio.gather(
+            *[self.get_l3_orderbook(market) for market in markets]
+        )
+        return {
+            (market_type_to_string(market.kind), market.index): book
+            for market, book in zip(markets, books)
+        }
+
+    def decode_l3_orderbook(self, data: Union[str, bytes]) -> L3OrderBook:
+        data = json_loads(data)
 
         asks = [
             L3Level(
@@ -209,14 +290,7 @@ class DLOBSubscriber:
                 )
 
         market_is_perp = is_variant(market_type, "Perp")
-        if market_is_perp:
-            oracle_price_data = self.drift_client.get_oracle_price_data_for_perp_market(
-                market_index
-            )
-        else:
-            oracle_price_data = self.drift_client.get_oracle_price_data_for_spot_market(
-                market_index
-            )
+        oracle_price_data = self.get_oracle_price_data(market_index, market_type)
 
         if market_is_perp and include_vamm:
             if not fallback_l2_generators:
@@ -227,11 +301,10 @@ class DLOBSubscriber:
                 )
 
             fallback_l2_generators = [
-                get_vamm_l2_generator(
-                    self.drift_client.get_perp_market_account(market_index),
+                self.get_vamm_l2_generator(
+                    market_index,
                     oracle_price_data,
                     num_vamm_orders if num_vamm_orders is not None else depth,
-                    DEFAULT_TOP_OF_BOOK_QUOTE_AMOUNTS,
                 )
             ]
 
@@ -266,16 +339,165 @@ class DLOBSubscriber:
                     "Either market_name or market_index and market_type must be provided"
                 )
 
-        market_is_perp = is_variant(market_type, "Perp")
-        if market_is_perp:
-            oracle_price_data = self.drift_client.get_oracle_price_data_for_perp_market(
-                market_index
-            )
-        else:
-            oracle_price_data = self.drift_client.get_oracle_price_data_for_spot_market(
-                market_index
-            )
+        oracle_price_data = self.get_oracle_price_data(market_index, market_type)
 
         return self.dlob.get_l3(
             market_index, market_type, self.slot_source.get_slot(), oracle_price_data
         )
+
+    def get_oracle_price_data(
+        self, market_index: int, market_type: MarketType
+    ) -> OraclePriceData:
+        if is_variant(market_type, "Perp"):
+            return self.drift_client.get_oracle_price_data_for_perp_market(market_index)
+        return self.drift_client.get_oracle_price_data_for_spot_market(market_index)
+
+    def get_vamm_l2_generator(
+        self,
+        market_index: int,
+        oracle_price_data: OraclePriceData,
+        num_orders: int,
+    ) -> L2OrderBookGenerator:
+        return get_vamm_l2_generator(
+            self.drift_client.get_perp_market_account(market_index),
+            oracle_price_data,
+            num_orders,
+            DEFAULT_TOP_OF_BOOK_QUOTE_AMOUNTS,
+        )
+
+    def get_l2_orderbooks_sync(
+        self,
+        markets: List[MarketId],
+        include_vamm: Optional[bool] = False,
+        num_vamm_orders: Optional[int] = None,
+        depth: Optional[int] = 10,
+        executor: Optional[Executor] = None,
+    ) -> Dict[Tuple[str, int], L2OrderBook]:
+        """
+        Builds the L2 books of several markets from one slot and one oracle lookup
+        per market. Books are keyed by `("perp" | "spot", market_index)`. See
+        `DLOB.get_l2_batch` for how an `executor` is used.
+        """
+        market_ids, oracle_map = self._get_batch_inputs(markets)
+
+        fallback_l2_generators = {}
+        if include_vamm:
+            for market in market_ids:
+                if not is_variant(market.market_type, "Perp"):
+                    continue
+                key = ("perp", market.market_index)
+                fallback_l2_generators[key] = [
+                    self.get_vamm_l2_generator(
+                        market.market_index,
+                        oracle_map[key],
+                        num_vamm_orders if num_vamm_orders is not None else depth,
+                    )
+                ]
+
+        return self.dlob.get_l2_batch(
+            market_ids,
+            self.slot_source.get_slot(),
+            oracle_map,
+            depth,
+            fallback_l2_generators,
+            executor,
+        )
+
+    def get_l3_orderbooks_sync(
+        self,
+        markets: List[MarketId],
+        executor: Optional[Executor] = None,
+    ) -> Dict[Tuple[str, int], L3OrderBook]:
+        """
+        Builds the L3 books of several markets, keyed like `get_l2_orderbooks_sync`.
+        """
+        market_ids, oracle_map = self._get_batch_inputs(markets)
+
+        return self.dlob.get_l3_batch(
+            market_ids, self.slot_source.get_slot(), oracle_map, executor
+        )
+
+    def get_l2_deltas_sync(
+        self,
+        previous_books: Dict[Tuple[str, int], L2OrderBook],
+        markets: List[MarketId],
+        depth: int = 10,
+        grouping: Optional[int] = None,
+        include_vamm: Optional[bool] = False,
+        num_vamm_orders: Optional[int] = None,
+    ) -> Dict[Tuple[str, int], L2OrderBookDelta]:
+        """
+        Diffs the current L2 books of `markets` against `previous_books`, which is
+        updated in place, keyed like `get_l2_orderbooks_sync`. Markets whose book
+        did not change are left out. Use a separate `previous_books` per stream.
+        """
+        books = self.get_l2_orderbooks_sync(
+            markets, include_vamm, num_vamm_orders, depth
+        )
+
+        if grouping is not None:
+            books = {
+                key: group_l2(book, grouping, depth) for key, book in books.items()
+            }
+
+        deltas = {}
+        for key, book in books.items():
+            delta = get_l2_delta(previous_books.get(key), book)
+            if delta.deltas:
+                deltas[key] = delta
+        previous_books.update(books)
+        return deltas
+
+    async def subscribe_l2_deltas(
+        self,
+        markets: List[MarketId],
+        depth: int = 10,
+        grouping: Optional[int] = None,
+        include_vamm: Optional[bool] = False,
+        num_vamm_orders: Optional[int] = None,
+        interval_s: int = 1,
+    ):
+        """
+        Yields the L2 changes of `markets` every `interval_s`, see
+        `get_l2_deltas_sync`. The first update adds every level.
+        This needs a `DLOBClientConfig`, like `subscribe`.
+        """
+        previous_books: Dict[Tuple[str, int], L2OrderBook] = {}
+        backoff_s = interval_s
+        while True:
+            try:
+                deltas = self.get_l2_deltas_sync(
+                    previous_books,
+                    markets,
+                    depth,
+                    grouping,
+                    include_vamm,
+                    num_vamm_orders,
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # the books are left as they were, so the next update catches up
+                logger.exception(
+                    f"Error computing L2 OrderBook deltas, retrying in {backoff_s}s"
+                )
+                await asyncio.sleep(backoff_s)
+                backoff_s = min(max(backoff_s * 2, 1), L2_DELTAS_MAX_BACKOFF_S)
+                continue
+
+            backoff_s = interval_s
+            if deltas:
+                yield deltas
+            await asyncio.sleep(interval_s)
+
+    def _get_batch_inputs(
+        self, markets: List[MarketId]
+    ) -> Tuple[List[MarketIdentifier], Dict[Tuple[str, int], OraclePriceData]]:
+        market_ids = []
+        oracle_map = {}
+        for market in markets:
+            market_ids.append(MarketIdentifier(market.kind, market.index))
+            key = (market_type_to_string(market.kind), market.index)
+            if key not in oracle_map:
+                oracle_map[key] = self.get_oracle_price_data(market.index, market.kind)
+        return market_ids, oracle_map
@@ -1,4 +1,5 @@
-from typing import Generator, Generic, TypeVar
+import random
+from typing import Dict, Generator, Generic, List, Optional, Tuple, TypeVar
 from solders.pubkey import Pubkey
 from driftpy.dlob.dlob_node import (
     DLOBNode,
@@ -8,83 +9,165 @@ from driftpy.dlob.dlob_node import (
     create_node,
 )
 
-from driftpy.types import Order, is_variant
+from driftpy.types import Order, OrderStatusNum, variant_tag
 
 T = TypeVar("T", bound=DLOBNode)
 
+SKIP_LIST_MAX_LEVEL = 32
+SKIP_LIST_P = 0.25
 
-def get_order_signature(order_id: int, user_account: Pubkey) -> str:
-    return f"{str(user_account)}-{str(order_id)}"
+
+OrderSignature = Tuple[Pubkey, int]
+
+
+def get_order_signature(order_id: int, user_account: Pubkey) -> OrderSignature:
+    # Pubkey hashes its raw bytes, so this avoids base58 encoding the user on every
+    # lookup
+    return (user_account, order_id)
 
 
 class NodeList(Generic[T]):
+    """
+    Sorted list of DLOB nodes.
+
+    Nodes are chained in a doubly linked list (`head`, `node.next`, `node.previous`)
+    which is iterated by `get_generator`. The linked list is indexed by a skip list
+    keyed on `(sort_value, slot, insertion order)`, so inserts and removes take
+    O(log n) instead of walking from `head`.
+    """
+
     def __init__(self, node_type: NodeType, sort_direction: SortDirection):
         self.head = None
         self.length = 0
-        self.node_map = {}
+        self.node_map: Dict[OrderSignature, T] = {}
         self.node_type: NodeType = node_type
         self.sort_direction = sort_direction
+        self.level = 1
+        # skip_heads[i] is the first node on level i + 1, level 0 starts at `head`
+        self.skip_heads: List[Optional[T]] = [None] * (SKIP_LIST_MAX_LEVEL - 1)
+        self.insert_count = 0
 
     def clear(self):
         self.head = None
         self.length = 0
         self.node_map.clear()
+        self.level = 1
+        self.skip_heads = [None] * (SKIP_LIST_MAX_LEVEL - 1)
+        self.insert_count = 0
 
-    def insert(self, order: Order, market_type, user_account: Pubkey):
-        if is_variant(order.status, "Init"):
-            return
-
-        new_node = create_node(self.node_type, order, user_account)
+    def insert(self, order: Order, market_type, user_account: Pubkey) -> Optional[T]:
+        """
+        Returns the new node, or None if the order was not inserted
+        """
+        if variant_tag(order.status) == OrderStatusNum.INIT:
+            return None
 
         order_signature = get_order_signature(order.order_id, user_account)
         if order_signature in self.node_map:
-            return
+            return None
+
+        new_node = create_node(self.node_type, order, user_account)
 
         self.node_map[order_signature] = new_node
         self.length += 1
 
-        if self.head is None:
-            self.head = new_node
-            return
+        new_node.sort_key = self.get_sort_key(new_node)
+        predecessors = self.find_predecessors(new_node.sort_key)
 
-        if self.prepend_node(self.head, new_node):
-            self.head.previous = new_node
-            new_node.next = self.head
-            self.head = new_node
-            return
+        level = self.random_level()
+        if level > self.level:
+            predecessors.extend([None] * (level - self.level))
+            self.level = level
 
-        current_node = self.head
-        while current_node.next is not None and not self.prepend_node(
-            current_node.next, new_node
-        ):
-            current_node = current_node.next
+        new_node.skip_next = [None] * (level - 1)
+        for i in range(level):
+            self.set_next_at(new_node, i, self.get_next_at(predecessors[i], i))
+            self.set_next_at(predecessors[i], i, new_node)
 
-        new_node.next = current_node.next
-        if current_node.next is not None:
+        new_node.previous = predecessors[0]
+        if new_node.next is not None:
             new_node.next.previous = new_node
-        current_node.next = new_node
-        new_node.previous = current_node
 
-    def prepend_node(self, current_node: T, new_node: T) -> bool:
-        current_order = current_node.order
-        new_order = new_node.order
-
-        current_order_sort_price = current_node.sort_value
-        new_order_sort_price = new_node.sort_value
-
-        if new_order_sort_price == current_order_sort_price:
-            return new_order.slot < current_order.slot
-
-        if self.sort_direction == "asc":
-            return new_order_sort_price < current_order_sort_price
+        return new_node
+
+    def get_sort_key(self, node: T) -> Tuple[int, int, int]:
+        # ties on (sort_value, slot) keep insertion order, like the old list walk
+        self.insert_count += 1
+        sort_value = (
+            node.sort_value if self.sort_direction == "asc" else -node.sort_value
+        )
+        return (sort_value, node.order.slot, self.insert_count)
+
+    def random_level(self) -> int:
+        level = 1
+        while level < SKIP_LIST_MAX_LEVEL and random.random() < SKIP_LIST_P:
+            level += 1
+        return level
+
+    def get_next_at(self, node: Optional[T], level: int) -> Optional[T]:
+        if node is None:
+            return self.head if level == 0 else self.skip_heads[level - 1]
+        return node.next if level == 0 else node.skip_next[level - 1]
+
+    def set_next_at(self, node: Optional[T], level: int, next_node: Optional[T]):
+        if node is None:
+            if level == 0:
+                self.head = next_node
+            else:
+                self.skip_heads[level - 1] = next_node
+        elif level == 0:
+            node.next = next_node
         else:
-            return new_order_sort_price > current_order_sort_price
+            node.skip_next[level - 1] = next_node
+
+    def find_predecessors(self, sort_key: Tuple[int, ...]) -> List[Optional[T]]:
+        """
+        Returns, for every level, the last node whose key is smaller than `sort_key`
+        (None meaning the head of that level).
+        """
+        predecessors: List[Optional[T]] = [None] * self.level
+        node = None
+        for level in range(self.level - 1, -1, -1):
+            next_node = self.get_next_at(node, level)
+            while next_node is not None and next_node.sort_key < sort_key:
+                node = next_node
+                next_node = self.get_next_at(node, level)
+            predecessors[level] = node
+        return predecessors
+
+    def get_nodes_before(self, sort_value: int) -> List[T]:
+        """
+        Returns the nodes from the head of the list up to, but not including, the
+        first node whose sort value is not before `sort_value` in list order.
+        """
+        key_value = sort_value if self.sort_direction == "asc" else -sort_value
+        # (key_value,) sorts before every full key starting with key_value
+        last = self.find_predecessors((key_value,))[0]
+
+        nodes = []
+        node = self.head if last is not None else None
+        while node is not None:
+            nodes.append(node)
+            if node is last:
+                break
+            node = node.next
+        return nodes
 
     def update(self, order: Order, user_account: Pubkey):
         order_id = get_order_signature(order.order_id, user_account)
         if order_id in self.node_map:
             node = self.node_map[order_id]
             node.order = order
+            node.base_asset_amount_filled = order.base_asset_amount_filled
+            node.have_filled = False
+
+    def update_base_asset_amount_filled(
+        self, order: Order, user_account: Pubkey, base_asset_amount_filled: int
+    ):
+        order_id = get_order_signature(order.order_id, user_account)
+        if order_id in self.node_map:
+            node = self.node_map[order_id]
+            node.base_asset_amount_filled = base_asset_amount_filled
             node.have_filled = False
 
     def remove(self, order: Order, user_account: Pubkey):
@@ -92,13 +175,16 @@ class NodeList(Generic[T]):
         if order_id in self.node_map:
             node = self.node_map.pop(order_id)
 
+            predecessors = self.find_predecessors(node.sort_key)
+            for i in range(len(node.skip_next) + 1):
+                self.set_next_at(predecessors[i], i, self.get_next_at(node, i))
+
+            # node.next is left untouched so in-flight generators can keep going
             if node.next:
                 node.next.previous = node.previous
-            if node.previous:
-                node.previous.next = node.next
 
-            if self.head and self.head.order.order_id == order.order_id:
-                self.head = node.next
+            while self.level > 1 and self.skip_heads[self.level - 2] is None:
+                self.level -= 1
 
             self.length -= 1
 
@@ -111,7 +197,7 @@ class NodeList(Generic[T]):
     def has(self, order: Order, user_account: Pubkey):
         return get_order_signature(order.order_id, user_account) in self.node_map
 
-    def get(self, order_signature):
+    def get(self, order_signature: OrderSignature):
         return self.node_map.get(order_signature)
 
     def print_list(self):
@@ -1,21 +1,24 @@
 from abc import ABC, abstractmethod
-import copy
+import heapq
 from datetime import datetime
-from typing import Dict, Generator, List, Optional
+from typing import Any, Callable, Dict, Generator, List, Literal, Optional, Tuple
 from solders.pubkey import Pubkey
 
-from driftpy.constants.numeric_constants import BASE_PRECISION, QUOTE_PRECISION
+from driftpy.constants.numeric_constants import (
+    AMM_TIMES_PEG_TO_QUOTE_PRECISION_RATIO,
+    BASE_PRECISION,
+    QUOTE_PRECISION,
+)
 from driftpy.dlob.dlob_node import DLOBNode
 from driftpy.math.amm import (
-    calculate_amm_reserves_after_swap,
     calculate_market_open_bid_ask,
     calculate_quote_asset_amount_swapped,
     calculate_spread_reserves,
+    calculate_swap_output,
     calculate_updated_amm,
 )
 from driftpy.math.orders import standardize_price
 from driftpy.types import (
-    AssetType,
     OraclePriceData,
     PerpMarketAccount,
     PositionDirection,
@@ -27,6 +30,8 @@ LiquiditySource = ["serum", "vamm", "dlob", "phoenix"]
 
 
 class L2Level:
+    __slots__ = ("price", "size", "sources")
+
     def __init__(self, price: int, size: int, sources: Dict[str, int]):
         self.price = price
         self.size = size
@@ -34,6 +39,8 @@ class L2Level:
 
 
 class L2OrderBook:
+    __slots__ = ("asks", "bids", "slot")
+
     def __init__(
         self, asks: List[L2Level], bids: List[L2Level], slot: Optional[int] = None
     ):
@@ -43,6 +50,8 @@ class L2OrderBook:
 
 
 class L3Level:
+    __slots__ = ("price", "size", "maker", "order_id")
+
     def __init__(self, price: int, size: int, maker: Pubkey, order_id: int):
         self.price = price
         self.size = size
@@ -51,6 +60,8 @@ class L3Level:
 
 
 class L3OrderBook:
+    __slots__ = ("asks", "bids", "slot")
+
     def __init__(
         self, asks: List[L3Level], bids: List[L3Level], slot: Optional[int] = None
     ):
@@ -59,6 +70,33 @@ class L3OrderBook:
         self.slot = slot
 
 
+class L2LevelDelta:
+    __slots__ = ("side", "action", "price", "size", "sources")
+
+    def __init__(
+        self,
+        side: Literal["ask", "bid"],
+        action: Literal["add", "change", "remove"],
+        price: int,
+        size: int,
+        sources: Dict[str, int],
+    ):
+        self.side = side
+        self.action = action
+        self.price = price
+        # 0 and no sources for removed levels
+        self.size = size
+        self.sources = sources
+
+
+class L2OrderBookDelta:
+    __slots__ = ("deltas", "slot")
+
+    def __init__(self, deltas: List[L2LevelDelta], slot: Optional[int] = None):
+        self.deltas = deltas
+        self.slot = slot
+
+
 class L2OrderBookGenerator(ABC):
     @abstractmethod
     def get_l2_asks(self) -> Generator[L2Level, None, None]:
@@ -83,9 +121,7 @@ def get_l2_generator_from_dlob_nodes(
     slot: int,
 ) -> Generator[L2Level, None, None]:
     for dlob_node in dlob_nodes:
-        size = (
-            dlob_node.order.base_asset_amount - dlob_node.order.base_asset_amount_filled
-        )
+        size = dlob_node.get_base_remaining()
         yield L2Level(
             size=size,
             price=dlob_node.get_price(oracle_price_data, slot),
@@ -94,25 +130,29 @@ def get_l2_generator_from_dlob_nodes(
 
 
 def merge_l2_level_generators(
-    l2_level_generators: List[Generator[L2Level, None, None]], compare: callable
+    l2_level_generators: List[Generator[L2Level, None, None]],
+    key: Callable[[L2Level], Any],
 ) -> Generator[L2Level, None, None]:
-    generators = [
-        {"generator": gen, "next": next(gen, None)} for gen in l2_level_generators
-    ]
-
-    while True:
-        next_gen = None
-        for gen in generators:
-            if gen["next"] is None:
-                continue
-            if next_gen is None or compare(gen["next"], next_gen["next"]):
-                next_gen = gen
-
-        if next_gen is None:
-            break
-
-        yield next_gen["next"]
-        next_gen["next"] = next(next_gen["generator"], None)
+    """
+    k-way merge of sorted L2 level generators, lowest `key` first.
+    Ties are yielded in the order of `l2_level_generators`.
+    """
+    heap = []
+    for index, generator in enumerate(l2_level_generators):
+        level = next(generator, None)
+        if level is not None:
+            heap.append((key(level), index, level, generator))
+    heapq.heapify(heap)
+
+    while heap:
+        _, index, level, generator = heap[0]
+        yield level
+
+        next_level = next(generator, None)
+        if next_level is None:
+            heapq.heappop(heap)
+        else:
+            heapq.heapreplace(heap, (key(next_level), index, next_level, generator))
 
 
 def create_l2_levels(
@@ -138,6 +178,88 @@ def create_l2_levels(
     return levels
 
 
+def get_vamm_l2_levels(
+    base_asset_reserve: int,
+    quote_asset_reserve: int,
+    sqrt_k: int,
+    peg_multiplier: int,
+    open_liquidity: int,
+    num_orders: int,
+    num_base_orders: int,
+    top_of_book_quote_amounts: Optional[List[int]],
+    is_bid: bool,
+) -> Generator[Tuple[int, int], None, None]:
+    """
+    Yields the (price, size) ladder for one side of the vAMM, at most `num_orders`
+    levels, each computed as it is consumed.
+
+    Equivalent to swapping each level against a copy of the amm with
+    `calculate_amm_reserves_after_swap`, but only the reserves are carried between
+    levels, so the amm does not need to be copied.
+    """
+    invariant = sqrt_k * sqrt_k
+    if is_bid:
+        quote_direction, base_direction = SwapDirection.Remove(), SwapDirection.Add()
+    else:
+        quote_direction, base_direction = SwapDirection.Add(), SwapDirection.Remove()
+
+    num_top_of_book = len(top_of_book_quote_amounts or [])
+    top_of_book_size = 0
+    size = open_liquidity // num_base_orders
+
+    num_levels = 0
+    while num_levels < num_orders and size > 0:
+        if num_levels < num_top_of_book:
+            remaining_base_liquidity = open_liquidity - top_of_book_size
+            quote_swapped = top_of_book_quote_amounts[num_levels]
+            (
+                after_swap_quote_reserves,
+                after_swap_base_reserves,
+            ) = calculate_swap_output(
+                quote_asset_reserve,
+                (quote_swapped * AMM_TIMES_PEG_TO_QUOTE_PRECISION_RATIO)
+                // peg_multiplier,
+                quote_direction,
+                invariant,
+            )
+            base_swapped = abs(base_asset_reserve - after_swap_base_reserves)
+
+            if remaining_base_liquidity < base_swapped:
+                base_swapped = remaining_base_liquidity
+                (
+                    after_swap_base_reserves,
+                    after_swap_quote_reserves,
+                ) = calculate_swap_output(
+                    base_asset_reserve, base_swapped, base_direction, invariant
+                )
+                quote_swapped = calculate_quote_asset_amount_swapped(
+                    abs(quote_asset_reserve - after_swap_quote_reserves),
+                    peg_multiplier,
+                    base_direction,
+                )
+
+            top_of_book_size += base_swapped
+            size = (open_liquidity - top_of_book_size) // num_base_orders
+        else:
+            base_swapped = size
+            (
+                after_swap_base_reserves,
+                after_swap_quote_reserves,
+            ) = calculate_swap_output(
+                base_asset_reserve, base_swapped, base_direction, invariant
+            )
+            quote_swapped = calculate_quote_asset_amount_swapped(
+                abs(quote_asset_reserve - after_swap_quote_reserves),
+                peg_multiplier,
+                base_direction,
+            )
+
+        yield (quote_swapped * BASE_PRECISION) // base_swapped, base_swapped
+        num_levels += 1
+        base_asset_reserve = after_swap_base_reserves
+        quote_asset_reserve = after_swap_quote_reserves
+
+
 def get_vamm_l2_generator(
     market_account: PerpMarketAccount,
     oracle_price_data: OraclePriceData,
@@ -174,139 +296,34 @@ def get_vamm_l2_generator(
         is_variant(market_account.contract_type, "Prediction"),
     )
 
-    num_bids = 0
-    top_of_book_bid_size = 0
-    bid_size = open_bids // num_base_orders
-
-    bid_amm = copy.deepcopy(updated_amm)
-    bid_amm.base_asset_reserve = bid_reserves[0]
-    bid_amm.quote_asset_reserve = bid_reserves[1]
-
+    # each side is only computed as far as it is consumed
     def get_l2_bids():
-        nonlocal num_bids, top_of_book_bid_size, bid_size, bid_amm
-        while num_bids < num_orders and bid_size > 0:
-            quote_swapped = 0
-            base_swapped = 0
-
-            if top_of_book_quote_amounts and num_bids < len(top_of_book_quote_amounts):
-                remaining_base_liquidity = open_bids - top_of_book_bid_size
-                quote_swapped = top_of_book_quote_amounts[num_bids]
-                (
-                    after_swap_quote_reserves,
-                    after_swap_base_reserves,
-                ) = calculate_amm_reserves_after_swap(
-                    bid_amm, AssetType.QUOTE(), quote_swapped, SwapDirection.Remove()
-                )
-                base_swapped = abs(
-                    bid_amm.base_asset_reserve - after_swap_base_reserves
-                )
-
-                if remaining_base_liquidity < base_swapped:
-                    base_swapped = remaining_base_liquidity
-                    (
-                        after_swap_quote_reserves,
-                        after_swap_base_reserves,
-                    ) = calculate_amm_reserves_after_swap(
-                        bid_amm, AssetType.BASE(), base_swapped, SwapDirection.Add()
-                    )
-                    quote_swapped = calculate_quote_asset_amount_swapped(
-                        abs(bid_amm.quote_asset_reserve - after_swap_quote_reserves),
-                        bid_amm.peg_multiplier,
-                        SwapDirection.Add(),
-                    )
-
-                top_of_book_bid_size += base_swapped
-                bid_size = (open_bids - top_of_book_bid_size) // num_base_orders
-
-            else:
-                base_swapped = bid_size
-                (
-                    after_swap_quote_reserves,
-                    after_swap_base_reserves,
-                ) = calculate_amm_reserves_after_swap(
-                    bid_amm, AssetType.BASE(), base_swapped, SwapDirection.Add()
-                )
-                quote_swapped = calculate_quote_asset_amount_swapped(
-                    abs(bid_amm.quote_asset_reserve - after_swap_quote_reserves),
-                    bid_amm.peg_multiplier,
-                    SwapDirection.Add(),
-                )
-
-            price = (quote_swapped * BASE_PRECISION) // base_swapped
-            bid_amm.base_asset_reserve = after_swap_base_reserves
-            bid_amm.quote_asset_reserve = after_swap_quote_reserves
-
-            yield L2Level(
-                price=price, size=base_swapped, sources={"vamm": base_swapped}
-            )
-            num_bids += 1
-
-    num_asks = 0
-    top_of_book_ask_size = 0
-    ask_size = abs(open_asks) // num_base_orders
-
-    ask_amm = copy.deepcopy(updated_amm)
-    ask_amm.base_asset_reserve = ask_reserves[0]
-    ask_amm.quote_asset_reserve = ask_reserves[1]
+        for price, size in get_vamm_l2_levels(
+            bid_reserves[0],
+            bid_reserves[1],
+            updated_amm.sqrt_k,
+            updated_amm.peg_multiplier,
+            open_bids,
+            num_orders,
+            num_base_orders,
+            top_of_book_quote_amounts,
+            True,
+        ):
+            yield L2Level(price=price, size=size, sources={"vamm": size})
 
     def get_l2_asks():
-        nonlocal num_asks, top_of_book_ask_size, ask_size, ask_amm
-        while num_asks < num_orders and ask_size > 0:
-            quote_swapped = 0
-            base_swapped = 0
-
-            if top_of_book_quote_amounts and num_asks < len(top_of_book_quote_amounts):
-                remaining_base_liquidity = abs(open_asks) - top_of_book_ask_size
-                quote_swapped = top_of_book_quote_amounts[num_asks]
-                (
-                    after_swap_quote_reserves,
-                    after_swap_base_reserves,
-                ) = calculate_amm_reserves_after_swap(
-                    ask_amm, AssetType.QUOTE(), quote_swapped, SwapDirection.Add()
-                )
-                base_swapped = abs(
-                    ask_amm.base_asset_reserve - after_swap_base_reserves
-                )
-
-                if remaining_base_liquidity < base_swapped:
-                    base_swapped = remaining_base_liquidity
-                    (
-                        after_swap_quote_reserves,
-                        after_swap_base_reserves,
-                    ) = calculate_amm_reserves_after_swap(
-                        ask_amm, AssetType.BASE(), base_swapped, SwapDirection.Remove()
-                    )
-                    quote_swapped = calculate_quote_asset_amount_swapped(
-                        abs(ask_amm.quote_asset_reserve - after_swap_quote_reserves),
-                        ask_amm.peg_multiplier,
-                        SwapDirection.Remove(),
-                    )
-
-                top_of_book_ask_size += base_swapped
-                ask_size = (abs(open_asks) - top_of_book_ask_size) // num_base_orders
-
-            else:
-                base_swapped = ask_size
-                (
-                    after_swap_quote_reserves,
-                    after_swap_base_reserves,
-                ) = calculate_amm_reserves_after_swap(
-                    ask_amm, AssetType.BASE(), base_swapped, SwapDirection.Remove()
-                )
-                quote_swapped = calculate_quote_asset_amount_swapped(
-                    abs(ask_amm.quote_asset_reserve - after_swap_quote_reserves),
-                    ask_amm.peg_multiplier,
-                    SwapDirection.Remove(),
-                )
-
-            price = (quote_swapped * BASE_PRECISION) // base_swapped
-            ask_amm.base_asset_reserve = after_swap_base_reserves
-            ask_amm.quote_asset_reserve = after_swap_quote_reserves
-
-            yield L2Level(
-                price=price, size=base_swapped, sources={"vamm": base_swapped}
-            )
-            num_asks += 1
+        for price, size in get_vamm_l2_levels(
+            ask_reserves[0],
+            ask_reserves[1],
+            updated_amm.sqrt_k,
+            updated_amm.peg_multiplier,
+            abs(open_asks),
+            num_orders,
+            num_base_orders,
+            top_of_book_quote_amounts,
+            False,
+        ):
+            yield L2Level(price=price, size=size, sources={"vamm": size})
 
     return get_l2_bids, get_l2_asks
 
@@ -327,19 +344,64 @@ def group_l2_levels(
                 current_level.sources[source] = (
                     current_level.sources.get(source, 0) + additional_size
                 )
+        elif len(grouped_levels) == depth:
+            break
         else:
-            grouped_level = L2Level(price=price, size=size, sources=level.soures.copy())
+            grouped_level = L2Level(
+                price=price, size=size, sources=level.sources.copy()
+            )
             grouped_levels.append(grouped_level)
 
-        if len(grouped_levels) == depth:
-            break
-
     return grouped_levels
 
 
 def group_l2(l2: L2OrderBook, grouping: int, depth: int) -> L2OrderBook:
     return L2OrderBook(
-        bids=group_l2_levels(l2.bids, grouping, PositionDirection.Long, depth),
-        asks=group_l2_levels(l2.asks, grouping, PositionDirection.Short, depth),
+        bids=group_l2_levels(l2.bids, grouping, PositionDirection.Long(), depth),
+        asks=group_l2_levels(l2.asks, grouping, PositionDirection.Short(), depth),
         slot=l2.slot,
     )
+
+
+def get_l2_levels_delta(
+    side: Literal["ask", "bid"],
+    previous_levels: List[L2Level],
+    levels: List[L2Level],
+) -> List[L2LevelDelta]:
+    previous_by_price = {level.price: level for level in previous_levels}
+
+    deltas = []
+    for level in levels:
+        previous_level = previous_by_price.pop(level.price, None)
+        if previous_level is None:
+            action = "add"
+        elif (
+            previous_level.size != level.size or previous_level.sources != level.sources
+        ):
+            action = "change"
+        else:
+            continue
+        deltas.append(
+            L2LevelDelta(side, action, level.price, level.size, dict(level.sources))
+        )
+
+    for price in previous_by_price:
+        deltas.append(L2LevelDelta(side, "remove", price, 0, {}))
+
+    return deltas
+
+
+def get_l2_delta(
+    previous_l2: Optional[L2OrderBook], l2: L2OrderBook
+) -> L2OrderBookDelta:
+    """
+    Returns the levels of `l2` that were added or changed since `previous_l2`, and
+    the levels that were removed. With no previous book every level is added.
+    """
+    previous_asks = previous_l2.asks if previous_l2 is not None else []
+    previous_bids = previous_l2.bids if previous_l2 is not None else []
+    return L2OrderBookDelta(
+        get_l2_levels_delta("ask", previous_asks, l2.asks)
+        + get_l2_levels_delta("bid", previous_bids, l2.bids),
+        l2.slot,
+    )
@@ -58,11 +58,15 @@ from driftpy.math.spot_position import (
 )
 from driftpy.oracles.strict_oracle_price import StrictOraclePrice
 from driftpy.types import (
+    ContractTypeNum,
+    MarketStatusNum,
     Order,
     PerpPosition,
+    SpotBalanceTypeNum,
     SpotPosition,
     UserStatus,
     is_variant,
+    variant_tag,
 )
 
 
@@ -278,7 +282,7 @@ class DriftUser:
             market.market_index
         ).price
 
-        if is_variant(market.status, "Settlement"):
+        if variant_tag(market.status) == MarketStatusNum.SETTLEMENT:
             valuation_price = market.expiry_price
 
         base_asset_amount = (
@@ -300,7 +304,7 @@ class DriftUser:
             if liquidation_buffer is not None:
                 margin_ratio += liquidation_buffer
 
-            if is_variant(market.status, "Settlement"):
+            if variant_tag(market.status) == MarketStatusNum.SETTLEMENT:
                 margin_ratio = 0
 
             quote_spot_market = self.drift_client.get_spot_market_account(
@@ -860,7 +864,7 @@ class DriftUser:
                     ),
                     spot_position.balance_type,
                 )
-                if is_variant(spot_position.balance_type, "Borrow"):
+                if variant_tag(spot_position.balance_type) == SpotBalanceTypeNum.BORROW:
                     weighted_token_value = abs(
                         self.get_spot_liability_value(
                             token_amount,
@@ -882,7 +886,7 @@ class DriftUser:
                 continue
 
             if not include_open_orders and count_for_base:
-                if is_variant(spot_position.balance_type, "Borrow"):
+                if variant_tag(spot_position.balance_type) == SpotBalanceTypeNum.BORROW:
                     token_amount = get_signed_token_amount(
                         get_token_amount(
                             spot_position.scaled_balance,
@@ -1226,7 +1230,7 @@ class DriftUser:
 
         free_collateral_delta = 0
 
-        if is_variant(market.contract_type, "Prediction"):
+        if variant_tag(market.contract_type) == ContractTypeNum.PREDICTION:
             # for prediction market, increase in pnl and margin requirement will net out for position
             # open order margin requirement will change with price though
             if order_base_asset_amount > 0:
@@ -1812,7 +1816,7 @@ class DriftUser:
             )
 
         valuation_price = valuation_price_data.price
-        if is_variant(market.status, "Settlement"):
+        if variant_tag(market.status) == MarketStatusNum.SETTLEMENT:
             valuation_price = market.expiry_price
 
         if include_open_orders:
@@ -1826,7 +1830,7 @@ class DriftUser:
             liability_value = calculate_perp_liability_value(
                 base_asset_amount,
                 valuation_price,
-                is_variant(market.contract_type, "Prediction"),
+                variant_tag(market.contract_type) == ContractTypeNum.PREDICTION,
             )
 
         if margin_category:
@@ -1840,7 +1844,7 @@ class DriftUser:
             if liquidation_buffer is not None:
                 margin_ratio += liquidation_buffer
 
-            if is_variant(market.status, "Settlement"):
+            if variant_tag(market.status) == MarketStatusNum.SETTLEMENT:
                 margin_ratio = 0
 
             quote_spot_market = self.drift_client.get_spot_market_account(
@@ -1906,7 +1910,7 @@ class DriftUser:
             return calculate_perp_liability_value(
                 user_position.base_asset_amount,
                 oracle_price_data.price,
-                is_variant(market.contract_type, "Prediction"),
+                variant_tag(market.contract_type) == ContractTypeNum.PREDICTION,
             )
 
     def get_total_liability_value(
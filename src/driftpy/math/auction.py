@@ -1,5 +1,21 @@
 from typing import Tuple
-from driftpy.types import Order, PositionDirection, is_one_of_variant, is_variant
+from driftpy.types import (
+    Order,
+    OrderTypeNum,
+    PositionDirection,
+    PositionDirectionNum,
+    is_variant,
+    variant_tag,
+)
+
+FIXED_AUCTION_ORDER_TYPES = frozenset(
+    (
+        OrderTypeNum.MARKET,
+        OrderTypeNum.TRIGGER_MARKET,
+        OrderTypeNum.LIMIT,
+        OrderTypeNum.TRIGGER_LIMIT,
+    )
+)
 
 
 def is_auction_complete(order: Order, slot: int) -> bool:
@@ -10,11 +26,10 @@ def is_auction_complete(order: Order, slot: int) -> bool:
 
 
 def get_auction_price(order: Order, slot: int, oracle_price: int) -> int:
-    if is_one_of_variant(
-        order.order_type, ["Market", "TriggerMarket", "Limit", "TriggerLimit"]
-    ):
+    order_type = variant_tag(order.order_type)
+    if order_type in FIXED_AUCTION_ORDER_TYPES:
         return get_auction_price_for_fixed_auction(order, slot)
-    elif is_variant(order.order_type, "Oracle"):
+    elif order_type == OrderTypeNum.ORACLE:
         return get_auction_price_for_oracle_offset_auction(order, slot, oracle_price)
     else:
         raise ValueError("Can't get auction price for order type")
@@ -29,7 +44,9 @@ def get_auction_price_for_fixed_auction(order: Order, slot: int) -> int:
     if delta_denominator == 0:
         return order.auction_end_price
 
-    if is_variant(order.direction, "Long"):
+    is_long = variant_tag(order.direction) == PositionDirectionNum.LONG
+
+    if is_long:
         price_delta = (
             order.auction_end_price
             - order.auction_start_price * delta_numerator // delta_denominator
@@ -40,7 +57,7 @@ def get_auction_price_for_fixed_auction(order: Order, slot: int) -> int:
             - order.auction_end_price * delta_numerator // delta_denominator
         )
 
-    if is_variant(order.direction, "Long"):
+    if is_long:
         price = order.auction_start_price + price_delta
     else:
         price = order.auction_start_price - price_delta
@@ -59,7 +76,9 @@ def get_auction_price_for_oracle_offset_auction(
     if delta_denominator == 0:
         return oracle_price + order.auction_end_price
 
-    if is_variant(order.direction, "Long"):
+    is_long = variant_tag(order.direction) == PositionDirectionNum.LONG
+
+    if is_long:
         price_offset_delta = (
             order.auction_end_price
             - order.auction_start_price * delta_numerator // delta_denominator
@@ -70,7 +89,7 @@ def get_auction_price_for_oracle_offset_auction(
             - order.auction_end_price * delta_numerator // delta_denominator
         )
 
-    if is_variant(order.direction, "Long"):
+    if is_long:
         price_offset = order.auction_start_price + price_offset_delta
     else:
         price_offset = order.auction_start_price - price_offset_delta
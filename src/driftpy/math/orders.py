@@ -12,10 +12,28 @@ from driftpy.types import (
     AMM,
     OraclePriceData,
     Order,
+    OrderStatusNum,
+    OrderTriggerConditionNum,
+    OrderTypeNum,
     PerpMarketAccount,
     PositionDirection,
-    is_one_of_variant,
+    PositionDirectionNum,
     is_variant,
+    variant_tag,
+)
+
+MARKET_ORDER_TYPES = frozenset(
+    (OrderTypeNum.MARKET, OrderTypeNum.TRIGGER_MARKET, OrderTypeNum.ORACLE)
+)
+LIMIT_ORDER_TYPES = frozenset((OrderTypeNum.LIMIT, OrderTypeNum.TRIGGER_LIMIT))
+TRIGGER_ORDER_TYPES = frozenset(
+    (OrderTypeNum.TRIGGER_MARKET, OrderTypeNum.TRIGGER_LIMIT)
+)
+TRIGGERED_CONDITIONS = frozenset(
+    (
+        OrderTriggerConditionNum.TRIGGERED_ABOVE,
+        OrderTriggerConditionNum.TRIGGERED_BELOW,
+    )
 )
 
 
@@ -64,31 +82,34 @@ def standardize_base_asset_amount(base_asset_amount: int, step_size: int) -> int
 
 
 def is_market_order(order: Order) -> bool:
-    return is_one_of_variant(order.order_type, ["Market", "TriggerMarket", "Oracle"])
+    return variant_tag(order.order_type) in MARKET_ORDER_TYPES
 
 
 def is_limit_order(order: Order) -> bool:
-    return is_one_of_variant(order.order_type, ["Limit", "TriggerLimit"])
+    return variant_tag(order.order_type) in LIMIT_ORDER_TYPES
 
 
 def must_be_triggered(order: Order) -> bool:
-    return is_one_of_variant(order.order_type, ["TriggerMarket", "TriggerLimit"])
+    return variant_tag(order.order_type) in TRIGGER_ORDER_TYPES
 
 
 def is_triggered(order: Order) -> bool:
-    return is_one_of_variant(
-        order.trigger_condition, ["TriggeredAbove", "TriggeredBelow"]
-    )
+    return variant_tag(order.trigger_condition) in TRIGGERED_CONDITIONS
 
 
 def is_resting_limit_order(order: Order, slot: int) -> bool:
-    if not is_limit_order(order):
+    order_type = variant_tag(order.order_type)
+    if order_type not in LIMIT_ORDER_TYPES:
         return False
 
-    if is_variant(order.order_type, "TriggerLimit"):
-        if is_variant(order.direction, "Long") and order.trigger_price < order.price:
+    if order_type == OrderTypeNum.TRIGGER_LIMIT:
+        direction = variant_tag(order.direction)
+        if direction == PositionDirectionNum.LONG and order.trigger_price < order.price:
             return False
-        elif is_variant(order.direction, "Short") and order.trigger_price > order.price:
+        elif (
+            direction == PositionDirectionNum.SHORT
+            and order.trigger_price > order.price
+        ):
             return False
 
         return is_auction_complete(order, slot)
@@ -99,7 +120,7 @@ def is_resting_limit_order(order: Order, slot: int) -> bool:
 def is_order_expired(order: Order, ts: int, enforce_buffer: bool = False) -> bool:
     if (
         must_be_triggered(order)
-        or not is_variant(order.status, "Open")
+        or variant_tag(order.status) != OrderStatusNum.OPEN
         or order.max_ts == 0
     ):
         return False
@@ -205,6 +226,4 @@ def calculate_max_base_asset_amount_fillable(
 
 
 def same_direction(lhs: PositionDirection, rhs: PositionDirection) -> bool:
-    return (is_variant(lhs, "Long") and is_variant(rhs, "Long")) or (
-        is_variant(lhs, "Short") and is_variant(rhs, "Short")
-    )
+    return variant_tag(lhs) == variant_tag(rhs)
@@ -155,15 +155,15 @@ class Vat:
         oracle_slot = self.last_oracle_slot
 
         if prefix:
-            filenames["users"] = f"{prefix}usermap_{usermap_slot}.pkl"
-            filenames["userstats"] = f"{prefix}userstats_{userstats_slot}.pkl"
+            filenames["users"] = f"{prefix}usermap_{usermap_slot}.snap"
+            filenames["userstats"] = f"{prefix}userstats_{userstats_slot}.snap"
             filenames["spot_markets"] = f"{prefix}spot_{spot_markets_slot}.pkl"
             filenames["perp_markets"] = f"{prefix}perp_{perp_markets_slot}.pkl"
             filenames["spot_oracles"] = f"{prefix}spotoracles_{oracle_slot}.pkl"
             filenames["perp_oracles"] = f"{prefix}perporacles_{oracle_slot}.pkl"
         else:
-            filenames["users"] = f"usermap_{usermap_slot}.pkl"
-            filenames["userstats"] = f"userstats_{userstats_slot}.pkl"
+            filenames["users"] = f"usermap_{usermap_slot}.snap"
+            filenames["userstats"] = f"userstats_{userstats_slot}.snap"
             filenames["spot_markets"] = f"spot_{spot_markets_slot}.pkl"
             filenames["perp_markets"] = f"perp_{perp_markets_slot}.pkl"
             filenames["spot_oracles"] = f"spotoracles_{oracle_slot}.pkl"
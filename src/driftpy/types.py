@@ -1,3 +1,4 @@
+import copyreg
 import inspect
 import zlib
 from dataclasses import dataclass, field
@@ -16,7 +17,15 @@ def is_variant(enum, type: str) -> bool:
 
 
 def is_one_of_variant(enum, types):
-    return any(type in str(enum) for type in types)
+    return enum.__class__.__name__ in types
+
+
+def variant_tag(enum) -> int:
+    """
+    Integer tag of a sumtype variant (its borsh index), for either a constructor
+    such as `OrderType.Limit` or an instance such as `OrderType.Limit()`.
+    """
+    return enum.index
 
 
 def get_ws_url(url: str) -> str:
@@ -404,11 +413,58 @@ class MarketType:
     Perp = constructor()
 
 
+# Integer tags of the variants checked on hot paths, compare against
+# variant_tag(value) instead of matching variant names
+class OrderTypeNum:
+    MARKET = variant_tag(OrderType.Market)
+    LIMIT = variant_tag(OrderType.Limit)
+    TRIGGER_MARKET = variant_tag(OrderType.TriggerMarket)
+    TRIGGER_LIMIT = variant_tag(OrderType.TriggerLimit)
+    ORACLE = variant_tag(OrderType.Oracle)
+
+
+class OrderStatusNum:
+    INIT = variant_tag(OrderStatus.Init)
+    OPEN = variant_tag(OrderStatus.Open)
+    FILLED = variant_tag(OrderStatus.Filled)
+    CANCELED = variant_tag(OrderStatus.Canceled)
+
+
+class OrderTriggerConditionNum:
+    ABOVE = variant_tag(OrderTriggerCondition.Above)
+    BELOW = variant_tag(OrderTriggerCondition.Below)
+    TRIGGERED_ABOVE = variant_tag(OrderTriggerCondition.TriggeredAbove)
+    TRIGGERED_BELOW = variant_tag(OrderTriggerCondition.TriggeredBelow)
+
+
+class PositionDirectionNum:
+    LONG = variant_tag(PositionDirection.Long)
+    SHORT = variant_tag(PositionDirection.Short)
+
+
+class MarketTypeNum:
+    SPOT = variant_tag(MarketType.Spot)
+    PERP = variant_tag(MarketType.Perp)
+
+
+class MarketStatusNum:
+    SETTLEMENT = variant_tag(MarketStatus.Settlement)
+
+
+class ContractTypeNum:
+    PREDICTION = variant_tag(ContractType.Prediction)
+
+
+class SpotBalanceTypeNum:
+    DEPOSIT = variant_tag(SpotBalanceType.Deposit)
+    BORROW = variant_tag(SpotBalanceType.Borrow)
+
+
 def market_type_to_string(market_type: MarketType):
-    type_str = str(type(market_type))
-    if "Perp" in type_str:
+    tag = variant_tag(market_type)
+    if tag == MarketTypeNum.PERP:
         return "perp"
-    elif "Spot" in type_str:
+    elif tag == MarketTypeNum.SPOT:
         return "spot"
     else:
         raise ValueError("Unknown market type, not Spot or Perp")
@@ -1479,3 +1535,26 @@ class SignedMsgOrderParamsMessage:
     uuid: bytes
     take_profit_order_params: SignedMsgTriggerOrderParams | None
     stop_loss_order_params: SignedMsgTriggerOrderParams | None
+
+
+def _make_enum_variant(enum_name: str, variant_name: str, fields: tuple):
+    return getattr(globals()[enum_name], variant_name)(*fields)
+
+
+def _reduce_enum_variant(variant):
+    return (
+        _make_enum_variant,
+        (
+            type(variant).__bases__[0].__name__,
+            type(variant).__name__,
+            tuple(getattr(variant, attrib[0]) for attrib in variant._sumtype_attribs),
+        ),
+    )
+
+
+# sumtype variants are generated classes that pickle can't look up by name,
+# registering them lets decoded accounts cross process boundaries
+for _enum in list(globals().values()):
+    if isinstance(_enum, type) and "_sumtype_constructor_names" in vars(_enum):
+        for _variant_name in _enum._sumtype_constructor_names:
+            copyreg.pickle(getattr(_enum, _variant_name), _reduce_enum_variant)
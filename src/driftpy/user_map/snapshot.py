@@ -0,0 +1,215 @@
+import mmap
+import os
+import struct
+import zlib
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from solders.pubkey import Pubkey
+
+SNAPSHOT_MAGIC = b"DRIFTSNP"
+SNAPSHOT_VERSION = 1
+
+# magic, version, compression, key size, record size, slot, count, records per block
+HEADER = struct.Struct("<8sHBBIQQI")
+BLOCK_SIZE = struct.Struct("<Q")
+KEY_SIZE = 32
+
+# records compressed together, ~4.5MB of user accounts
+DEFAULT_BLOCK_RECORDS = 1024
+
+COMPRESSION_NONE = 0
+COMPRESSION_ZLIB = 1
+COMPRESSION_ZSTD = 2
+COMPRESSION_LZ4 = 3
+
+# zstandard is a dependency, so dumps are compressed unless asked not to be
+DEFAULT_COMPRESSION = "zstd"
+
+COMPRESSION_BY_NAME = {
+    None: COMPRESSION_NONE,
+    "zlib": COMPRESSION_ZLIB,
+    "zstd": COMPRESSION_ZSTD,
+    "lz4": COMPRESSION_LZ4,
+}
+
+Codec = Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]
+
+
+def get_codec(compression: int) -> Codec:
+    """
+    `(compress, decompress)` for a block compression. zstd and lz4 are only
+    imported when a snapshot uses them.
+    """
+    if compression == COMPRESSION_ZLIB:
+        return (lambda data: zlib.compress(data, level=1)), zlib.decompress
+    if compression == COMPRESSION_ZSTD:
+        import zstandard
+
+        return (
+            zstandard.ZstdCompressor(level=3).compress,
+            zstandard.ZstdDecompressor().decompress,
+        )
+    if compression == COMPRESSION_LZ4:
+        try:
+            import lz4.frame
+        except ImportError:
+            raise ValueError("lz4 snapshot compression needs the lz4 package")
+
+        return lz4.frame.compress, lz4.frame.decompress
+    raise ValueError(f"Unknown snapshot compression {compression}")
+
+
+def write_snapshot(
+    path: str,
+    slot: int,
+    accounts: Dict[str, bytes],
+    compression: Optional[str] = None,
+    block_records: int = DEFAULT_BLOCK_RECORDS,
+):
+    """
+    Writes `accounts` (pubkey to raw account bytes, all the same size) as a
+    snapshot taken at `slot`.
+
+    Each record is the 32 byte pubkey followed by the account, so records have a
+    fixed stride. Uncompressed records follow the header directly. Compressed
+    snapshots group `block_records` records into blocks, preceded by a table of
+    the compressed block sizes. The file is written next to `path` and moved into
+    place, so readers never see a partial snapshot.
+    """
+    if compression not in COMPRESSION_BY_NAME:
+        raise ValueError(f"Unknown snapshot compression {compression}")
+    if block_records < 1:
+        raise ValueError("block_records must be at least 1")
+    compression_id = COMPRESSION_BY_NAME[compression]
+
+    record_size = len(next(iter(accounts.values()), b""))
+    records: List[bytes] = []
+    for key, data in accounts.items():
+        if len(data) != record_size:
+            raise ValueError(
+                f"Account {key} is {len(data)} bytes, expected {record_size}"
+            )
+        records.append(bytes(Pubkey.from_string(key)))
+        records.append(data)
+
+    header = HEADER.pack(
+        SNAPSHOT_MAGIC,
+        SNAPSHOT_VERSION,
+        compression_id,
+        KEY_SIZE,
+        record_size,
+        slot,
+        len(accounts),
+        block_records,
+    )
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        if compression_id == COMPRESSION_NONE:
+            f.write(b"".join(records))
+        else:
+            compress, _ = get_codec(compression_id)
+            step = 2 * block_records
+            blocks = [
+                compress(b"".join(records[i : i + step]))
+                for i in range(0, len(records), step)
+            ]
+            f.write(b"".join(BLOCK_SIZE.pack(len(block)) for block in blocks))
+            f.write(b"".join(blocks))
+    os.replace(tmp_path, path)
+
+
+def is_snapshot(path: str) -> bool:
+    with open(path, "rb") as f:
+        return f.read(len(SNAPSHOT_MAGIC)) == SNAPSHOT_MAGIC
+
+
+class Snapshot:
+    """
+    Memory mapped snapshot written by `write_snapshot`. Records are sliced out of
+    the mapping (or out of one decompressed block at a time) as they are
+    iterated, nothing is decoded.
+
+        with Snapshot(path) as snapshot:
+            for records in snapshot.batches():
+                for key, data in records:
+                    ...
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self.data) < HEADER.size:
+            self.close()
+            raise ValueError(f"{path} is too short to be a snapshot")
+        (
+            magic,
+            version,
+            self.compression,
+            key_size,
+            self.record_size,
+            self.slot,
+            self.count,
+            self.block_records,
+        ) = HEADER.unpack_from(self.data)
+        if magic != SNAPSHOT_MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a snapshot")
+        if version != SNAPSHOT_VERSION or key_size != KEY_SIZE:
+            self.close()
+            raise ValueError(f"Unsupported snapshot version {version} in {path}")
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __iter__(self) -> Iterator[Tuple[str, bytes]]:
+        for records in self.batches():
+            yield from records
+
+    def batches(self) -> Iterator[List[Tuple[str, bytes]]]:
+        """
+        Yields the `(pubkey, account bytes)` records one block at a time.
+        """
+        stride = KEY_SIZE + self.record_size
+        for block in self.blocks():
+            yield [
+                (
+                    str(Pubkey.from_bytes(block[offset : offset + KEY_SIZE])),
+                    block[offset + KEY_SIZE : offset + stride],
+                )
+                for offset in range(0, len(block), stride)
+            ]
+
+    def blocks(self) -> Iterator[bytes]:
+        stride = KEY_SIZE + self.record_size
+        if self.compression == COMPRESSION_NONE:
+            end = HEADER.size + self.count * stride
+            if len(self.data) < end:
+                raise ValueError(f"Snapshot {self.path} is truncated")
+            # hand out one block's worth at a time rather than copying the file
+            step = self.block_records * stride
+            for offset in range(HEADER.size, end, step):
+                yield self.data[offset : min(offset + step, end)]
+            return
+
+        _, decompress = get_codec(self.compression)
+        num_blocks = -(-self.count // self.block_records)
+        offset = HEADER.size + num_blocks * BLOCK_SIZE.size
+        for i in range(num_blocks):
+            (size,) = BLOCK_SIZE.unpack_from(
+                self.data, HEADER.size + i * BLOCK_SIZE.size
+            )
+            yield decompress(self.data[offset : offset + size])
+            offset += size
+
+    def close(self):
+        self.data.close()
+
+    def __enter__(self) -> "Snapshot":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
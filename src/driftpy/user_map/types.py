@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from dataclasses import dataclass
 from driftpy.drift_user import DriftUser
 from solders.pubkey import Pubkey
 from typing import Optional
@@ -39,6 +40,18 @@ class UserMapInterface(ABC):
         pass
 
 
+@dataclass
+class SyncStats:
+    # accounts seen for the first time
+    new: int = 0
+    # accounts whose bytes differ from the previous sync, and were decoded
+    changed: int = 0
+    # accounts whose bytes did not change, and were skipped
+    unchanged: int = 0
+    # accounts missing from the sync, and removed from the map
+    removed: int = 0
+
+
 class Subscription(ABC):
     pass
 
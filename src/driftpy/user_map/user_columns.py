@@ -0,0 +1,260 @@
+from typing import Dict, List
+
+import numpy as np
+from solders.pubkey import Pubkey
+
+USER_ACCOUNT_SIZE = 4376
+
+# where the position, order and flag fields start in a user account
+SPOT_POSITIONS_OFFSET = 104
+PERP_POSITIONS_OFFSET = 424
+ORDERS_OFFSET = 1192
+ORDERS_END = ORDERS_OFFSET + 32 * 96
+STATUS_OFFSET = 4348
+MARGIN_MODE_OFFSET = 4355
+
+# field offsets follow driftpy.decode.user.decode_user
+
+SPOT_POSITION_DTYPE = np.dtype(
+    {
+        "names": [
+            "scaled_balance",
+            "open_bids",
+            "open_asks",
+            "cumulative_deposits",
+            "market_index",
+            "balance_type",
+            "open_orders",
+        ],
+        "formats": ["<u8", "<i8", "<i8", "<i8", "<u2", "u1", "u1"],
+        "offsets": [0, 8, 16, 24, 32, 34, 35],
+        "itemsize": 40,
+    }
+)
+
+PERP_POSITION_DTYPE = np.dtype(
+    {
+        "names": [
+            "last_cumulative_funding_rate",
+            "base_asset_amount",
+            "quote_asset_amount",
+            "quote_break_even_amount",
+            "quote_entry_amount",
+            "open_bids",
+            "open_asks",
+            "settled_pnl",
+            "lp_shares",
+            "remainder_base_asset_amount",
+            "market_index",
+            "open_orders",
+        ],
+        "formats": [
+            "<i8",
+            "<i8",
+            "<i8",
+            "<i8",
+            "<i8",
+            "<i8",
+            "<i8",
+            "<i8",
+            "<u8",
+            "<i4",
+            "<u2",
+            "u1",
+        ],
+        "offsets": [0, 8, 16, 24, 32, 40, 48, 56, 64, 88, 92, 94],
+        "itemsize": 96,
+    }
+)
+
+USER_ORDER_DTYPE = np.dtype(
+    {
+        "names": [
+            "slot",
+            "price",
+            "base_asset_amount",
+            "base_asset_amount_filled",
+            "quote_asset_amount_filled",
+            "trigger_price",
+            "auction_start_price",
+            "auction_end_price",
+            "max_ts",
+            "oracle_price_offset",
+            "order_id",
+            "market_index",
+            "status",
+            "order_type",
+            "market_type",
+            "direction",
+            "reduce_only",
+            "post_only",
+            "trigger_condition",
+            "auction_duration",
+        ],
+        "formats": [
+            "<u8",
+            "<u8",
+            "<u8",
+            "<u8",
+            "<u8",
+            "<u8",
+            "<i8",
+            "<i8",
+            "<i8",
+            "<i4",
+            "<u4",
+            "<u2",
+            "u1",
+            "u1",
+            "u1",
+            "u1",
+            "u1",
+            "u1",
+            "u1",
+            "u1",
+        ],
+        "offsets": [
+            0,
+            8,
+            16,
+            24,
+            32,
+            40,
+            48,
+            56,
+            64,
+            72,
+            76,
+            80,
+            82,
+            83,
+            84,
+            87,
+            88,
+            89,
+            91,
+            92,
+        ],
+        "itemsize": 96,
+    }
+)
+
+USER_ACCOUNT_DTYPE = np.dtype(
+    {
+        "names": [
+            "authority",
+            "delegate",
+            "spot_positions",
+            "perp_positions",
+            "orders",
+            "total_deposits",
+            "total_withdraws",
+            "settled_perp_pnl",
+            "last_active_slot",
+            "next_order_id",
+            "sub_account_id",
+            "status",
+            "is_margin_trading_enabled",
+            "idle",
+            "open_orders",
+            "has_open_order",
+            "open_auctions",
+            "has_open_auction",
+            "margin_mode",
+        ],
+        "formats": [
+            ("u1", 32),
+            ("u1", 32),
+            (SPOT_POSITION_DTYPE, 8),
+            (PERP_POSITION_DTYPE, 8),
+            (USER_ORDER_DTYPE, 32),
+            "<u8",
+            "<u8",
+            "<i8",
+            "<u8",
+            "<u4",
+            "<u2",
+            "u1",
+            "u1",
+            "u1",
+            "u1",
+            "u1",
+            "u1",
+            "u1",
+            "u1",
+        ],
+        "offsets": [
+            8,
+            40,
+            SPOT_POSITIONS_OFFSET,
+            PERP_POSITIONS_OFFSET,
+            ORDERS_OFFSET,
+            4272,
+            4280,
+            4296,
+            4328,
+            4336,
+            4346,
+            STATUS_OFFSET,
+            4349,
+            4350,
+            4351,
+            4352,
+            4353,
+            4354,
+            MARGIN_MODE_OFFSET,
+        ],
+        "itemsize": USER_ACCOUNT_SIZE,
+    }
+)
+
+
+class UserColumns:
+    """
+    Columnar view over raw user account bytes, one row per account.
+
+    Fields are read straight out of the account layout, so a scan such as
+    `columns["perp_positions"]["base_asset_amount"]` (shape `(n, 8)`) or
+    `columns["orders"]["status"]` (shape `(n, 32)`) never decodes a `UserAccount`.
+    """
+
+    def __init__(self, keys: List[str], accounts: np.ndarray):
+        self.keys = keys
+        self.accounts = accounts
+        self.index: Dict[str, int] = {key: i for i, key in enumerate(keys)}
+
+    @classmethod
+    def from_raw(cls, raw: Dict[str, bytes]) -> "UserColumns":
+        for key, data in raw.items():
+            if len(data) != USER_ACCOUNT_SIZE:
+                raise ValueError(
+                    f"User account {key} is {len(data)} bytes, expected {USER_ACCOUNT_SIZE}"
+                )
+        # writable, so rows can be refreshed in place by set_row()
+        accounts = np.frombuffer(bytearray(b"".join(raw.values())), USER_ACCOUNT_DTYPE)
+        return cls(list(raw.keys()), accounts)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __getitem__(self, field: str) -> np.ndarray:
+        return self.accounts[field]
+
+    def get_row(self, key: str) -> np.void:
+        return self.accounts[self.index[key]]
+
+    def set_row(self, key: str, data: bytes):
+        if len(data) != USER_ACCOUNT_SIZE:
+            raise ValueError(
+                f"User account {key} is {len(data)} bytes, expected {USER_ACCOUNT_SIZE}"
+            )
+        self.accounts[self.index[key]] = np.frombuffer(data, USER_ACCOUNT_DTYPE)[0]
+
+    def get_keys(self, mask: np.ndarray) -> List[str]:
+        """
+        Keys of the rows selected by a boolean mask over accounts.
+        """
+        return [self.keys[i] for i in np.flatnonzero(mask)]
+
+    def get_authority(self, key: str) -> Pubkey:
+        return Pubkey.from_bytes(self.accounts["authority"][self.index[key]].tobytes())
@@ -0,0 +1,209 @@
+import struct
+from typing import AbstractSet, Dict, FrozenSet, Hashable, NamedTuple, Optional, Tuple
+
+from solders.pubkey import Pubkey
+
+from driftpy.math.perp_position import is_available
+from driftpy.math.spot_position import is_spot_position_available
+from driftpy.types import (
+    MarginMode,
+    MarketType,
+    MarketTypeNum,
+    OrderStatusNum,
+    UserAccount,
+    UserStatus,
+    is_variant,
+    market_type_to_string,
+    variant_tag,
+)
+from driftpy.user_map.user_columns import (
+    MARGIN_MODE_OFFSET,
+    ORDERS_END,
+    ORDERS_OFFSET,
+    PERP_POSITIONS_OFFSET,
+    SPOT_POSITIONS_OFFSET,
+    STATUS_OFFSET,
+)
+
+EMPTY: FrozenSet[str] = frozenset()
+
+# the fields the index reads, see SPOT_POSITION_DTYPE, PERP_POSITION_DTYPE and
+# USER_ORDER_DTYPE
+# scaled_balance, market_index, open_orders
+SPOT_POSITION = struct.Struct("<Q24xHxB4x")
+# base_asset_amount, quote_asset_amount, lp_shares, market_index, open_orders
+PERP_POSITION = struct.Struct("<8xqq40xQ20xHBx")
+# market_index, status, market_type
+ORDER = struct.Struct("<80xHBxB11x")
+
+HIGH_LEVERAGE = variant_tag(MarginMode.HighLeverage)
+LIQUIDATION_STATUS = UserStatus.BEING_LIQUIDATED | UserStatus.BANKRUPT
+
+
+class UserIndexEntry(NamedTuple):
+    authority: Pubkey
+    perp_markets: FrozenSet[int]
+    spot_markets: FrozenSet[int]
+    # (market type, market index) of every open order
+    order_markets: FrozenSet[Tuple[str, int]]
+    being_liquidated: bool
+    high_leverage: bool
+
+    @staticmethod
+    def from_user_account(user_account: UserAccount) -> "UserIndexEntry":
+        return UserIndexEntry(
+            user_account.authority,
+            frozenset(
+                position.market_index
+                for position in user_account.perp_positions
+                if not is_available(position)
+            ),
+            frozenset(
+                position.market_index
+                for position in user_account.spot_positions
+                if not is_spot_position_available(position)
+            ),
+            frozenset(
+                (market_type_to_string(order.market_type), order.market_index)
+                for order in user_account.orders
+                if is_variant(order.status, "Open")
+            ),
+            (user_account.status & LIQUIDATION_STATUS) > 0,
+            is_variant(user_account.margin_mode, "HighLeverage"),
+        )
+
+    @staticmethod
+    def from_raw(buffer: bytes) -> "UserIndexEntry":
+        """
+        Same entry as `from_user_account(decode_user(buffer))`, read straight from
+        the account bytes.
+        """
+        view = memoryview(buffer)
+        perp_positions = PERP_POSITION.iter_unpack(
+            view[PERP_POSITIONS_OFFSET:ORDERS_OFFSET]
+        )
+        spot_positions = SPOT_POSITION.iter_unpack(
+            view[SPOT_POSITIONS_OFFSET:PERP_POSITIONS_OFFSET]
+        )
+        orders = ORDER.iter_unpack(view[ORDERS_OFFSET:ORDERS_END])
+        return UserIndexEntry(
+            Pubkey.from_bytes(buffer[8:40]),
+            frozenset(
+                market_index
+                for base, quote, lp_shares, market_index, open_orders in perp_positions
+                if base != 0 or quote != 0 or lp_shares != 0 or open_orders != 0
+            ),
+            frozenset(
+                market_index
+                for balance, market_index, open_orders in spot_positions
+                if balance != 0 or open_orders != 0
+            ),
+            frozenset(
+                ("spot" if market_type == MarketTypeNum.SPOT else "perp", market_index)
+                for market_index, status, market_type in orders
+                # decode_user treats every status but Init as open
+                if status != OrderStatusNum.INIT
+            ),
+            (buffer[STATUS_OFFSET] & LIQUIDATION_STATUS) > 0,
+            buffer[MARGIN_MODE_OFFSET] == HIGH_LEVERAGE,
+        )
+
+
+class UserIndex:
+    """
+    Secondary indexes from user account fields to user account pubkeys, kept
+    current by the UserMap as accounts are added, updated and removed.
+
+    The getters return live sets, which must not be modified by the caller.
+    """
+
+    def __init__(self):
+        self.entries: Dict[str, UserIndexEntry] = {}
+        self.by_authority: Dict[Pubkey, set] = {}
+        self.by_perp_market: Dict[int, set] = {}
+        self.by_spot_market: Dict[int, set] = {}
+        self.by_order_market: Dict[Tuple[str, int], set] = {}
+        self.being_liquidated: set = set()
+        self.high_leverage: set = set()
+
+    def update(self, key: str, user_account: Optional[UserAccount]):
+        if user_account is None:
+            self.remove(key)
+            return
+
+        self.set_entry(key, UserIndexEntry.from_user_account(user_account))
+
+    def update_from_raw(self, key: str, buffer: bytes):
+        self.set_entry(key, UserIndexEntry.from_raw(buffer))
+
+    def set_entry(self, key: str, entry: UserIndexEntry):
+        previous = self.entries.get(key)
+        if entry == previous:
+            return
+        if previous is not None:
+            self._unindex(key, previous)
+        self.entries[key] = entry
+        self._index(key, entry)
+
+    def remove(self, key: str):
+        previous = self.entries.pop(key, None)
+        if previous is not None:
+            self._unindex(key, previous)
+
+    def clear(self):
+        self.__init__()
+
+    def _index(self, key: str, entry: UserIndexEntry):
+        self.by_authority.setdefault(entry.authority, set()).add(key)
+        for market_index in entry.perp_markets:
+            self.by_perp_market.setdefault(market_index, set()).add(key)
+        for market_index in entry.spot_markets:
+            self.by_spot_market.setdefault(market_index, set()).add(key)
+        for market in entry.order_markets:
+            self.by_order_market.setdefault(market, set()).add(key)
+        if entry.being_liquidated:
+            self.being_liquidated.add(key)
+        if entry.high_leverage:
+            self.high_leverage.add(key)
+
+    def _unindex(self, key: str, entry: UserIndexEntry):
+        discard(self.by_authority, entry.authority, key)
+        for market_index in entry.perp_markets:
+            discard(self.by_perp_market, market_index, key)
+        for market_index in entry.spot_markets:
+            discard(self.by_spot_market, market_index, key)
+        for market in entry.order_markets:
+            discard(self.by_order_market, market, key)
+        self.being_liquidated.discard(key)
+        self.high_leverage.discard(key)
+
+    def get_sub_accounts(self, authority: Pubkey) -> AbstractSet[str]:
+        return self.by_authority.get(authority, EMPTY)
+
+    def get_users_with_perp_position(self, market_index: int) -> AbstractSet[str]:
+        return self.by_perp_market.get(market_index, EMPTY)
+
+    def get_users_with_spot_position(self, market_index: int) -> AbstractSet[str]:
+        return self.by_spot_market.get(market_index, EMPTY)
+
+    def get_users_with_open_orders(
+        self, market_index: int, market_type: MarketType
+    ) -> AbstractSet[str]:
+        return self.by_order_market.get(
+            (market_type_to_string(market_type), market_index), EMPTY
+        )
+
+    def get_users_being_liquidated(self) -> AbstractSet[str]:
+        return self.being_liquidated
+
+    def get_high_leverage_users(self) -> AbstractSet[str]:
+        return self.high_leverage
+
+
+def discard(index: Dict[Hashable, set], index_key: Hashable, key: str):
+    keys = index.get(index_key)
+    if keys is None:
+        return
+    keys.discard(key)
+    if not keys:
+        del index[index_key]
@@ -1,25 +1,37 @@
 import asyncio
-import base64
 import os
 import pickle
-from typing import Any, Container, Dict, Optional
+from typing import TYPE_CHECKING, Container, Dict, List, Optional, Set, Tuple
 
 import jsonrpcclient
 from solana.rpc.commitment import Confirmed
 from solders.pubkey import Pubkey
 
 from driftpy.account_subscription_config import AccountSubscriptionConfig
+from driftpy.accounts.program_accounts import stream_program_accounts
 from driftpy.accounts.types import DataAndSlot
-from driftpy.decode.user import decode_user
+from driftpy.decode.batch import BatchDecoder
+from driftpy.decode.user import decode_user, decode_users
 from driftpy.dlob.client_types import DLOBSource
 from driftpy.drift_client import DriftClient
 from driftpy.drift_user import DriftUser
-from driftpy.types import OrderRecord, PickledData, UserAccount, compress, decompress
+from driftpy.types import OrderRecord, PickledData, UserAccount, decompress
 from driftpy.user_map.polling_sub import PollingSubscription
-from driftpy.user_map.types import UserMapInterface
+from driftpy.user_map.snapshot import (
+    DEFAULT_COMPRESSION,
+    Snapshot,
+    is_snapshot,
+    write_snapshot,
+)
+from driftpy.user_map.types import SyncStats, UserMapInterface
+from driftpy.user_map.user_columns import ORDERS_END, ORDERS_OFFSET, UserColumns
+from driftpy.user_map.user_index import UserIndex
 from driftpy.user_map.user_map_config import PollingConfig, UserMapConfig
 from driftpy.user_map.websocket_sub import WebsocketSubscription
 
+if TYPE_CHECKING:
+    from driftpy.dlob.dlob import DLOB
+
 
 class UserMap(UserMapInterface, DLOBSource):
     def __init__(self, config: UserMapConfig):
@@ -37,18 +49,32 @@ class UserMap(UserMapInterface, DLOBSource):
             self.connection = self.drift_client.connection
         self.commitment = config.subscription_config.commitment or Confirmed
         self.include_idle = config.include_idle or False
+        self.incremental_dlob = config.incremental_dlob or False
+        # raw account bytes are the source of truth, `user_map` only holds the
+        # users that have been materialized
+        self.lazy_users = config.lazy_users or False
+        # keys updated outside of sync(), whose raw bytes are out of date
+        self.updated_keys: Set[str] = set()
+        self.last_sync_stats: Optional[SyncStats] = None
+        self.decode_executor = config.decode_executor
+        self.index = UserIndex()
+        # built on the first get_user_columns(), rows are refreshed in place and
+        # it is rebuilt once users are added or removed
+        self.user_columns: Optional[UserColumns] = None
+        self.dlob: Optional["DLOB"] = None
         if isinstance(config.subscription_config, PollingConfig):
             self.subscription = PollingSubscription(
                 self, config.subscription_config.frequency, config.skip_initial_load
             )
         else:
+            # lazy users are updated from the raw bytes, like sync() does
             self.subscription = WebsocketSubscription(
                 self,
                 self.commitment,
-                self.update_user_account,
+                self.update_user_raw if self.lazy_users else self.update_user_account,
                 config.skip_initial_load,
                 config.subscription_config.resub_timeout_ms,
-                decode=decode_user,
+                decode=bytes if self.lazy_users else decode_user,
             )
 
     async def subscribe(self):
@@ -72,6 +98,12 @@ class UserMap(UserMapInterface, DLOBSource):
             user.unsubscribe()
             del self.user_map[key]
 
+        self.dlob = None
+        self.index.clear()
+        if self.lazy_users:
+            self.raw = {}
+            self.user_columns = None
+
         if self.last_number_of_sub_accounts:
             # again, no event emitter
             self.last_number_of_sub_accounts = None
@@ -79,26 +111,95 @@ class UserMap(UserMapInterface, DLOBSource):
         self.is_subscribed = False
 
     def has(self, key: str) -> bool:
-        return key in self.user_map
+        return key in self.user_map or (self.lazy_users and key in self.raw)
 
     def get(self, key: str) -> Optional[DriftUser]:
-        return self.user_map.get(key)
+        user = self.user_map.get(key)
+        if user is None and self.lazy_users and key in self.raw:
+            user = self.create_user_from_raw(key)
+            self.user_map[key] = user
+        return user
 
     def size(self) -> int:
-        return len(self.user_map)
+        if not self.lazy_users:
+            return len(self.user_map)
+        return len(self.raw) + sum(1 for key in self.user_map if key not in self.raw)
+
+    def keys(self):
+        if not self.lazy_users:
+            return iter(self.user_map.keys())
+        return self._lazy_keys()
+
+    def _lazy_keys(self):
+        raw = self.raw
+        yield from raw
+        yield from [key for key in self.user_map if key not in raw]
 
     def values(self):
-        return iter(self.user_map.values())
+        if not self.lazy_users:
+            return iter(self.user_map.values())
+        return self._lazy_values()
+
+    def _lazy_values(self):
+        # users that were never requested are decoded for this pass only
+        raw = self.raw
+        for key in raw:
+            user = self.user_map.get(key)
+            yield user if user is not None else self.create_user_from_raw(key)
+        yield from [user for key, user in self.user_map.items() if key not in raw]
 
     def clear(self):
         self.user_map.clear()
+        self.raw = {}
+        self.user_columns = None
+        self.updated_keys.clear()
+        self.index.clear()
+        self.dlob = None
 
     def get_user_authority(self, user_account_public_key: str) -> Optional[Pubkey]:
         user = self.user_map.get(user_account_public_key)
         if not user:
+            if self.lazy_users and user_account_public_key in self.raw:
+                # authority sits right after the account discriminator
+                return Pubkey.from_bytes(self.raw[user_account_public_key][8:40])
             return None
         return user.get_user_account().authority
 
+    def get_user_columns(self) -> UserColumns:
+        """
+        Columnar view of `raw`, for scans over a few fields of every user. The
+        same view is returned until users are added or removed, changed accounts
+        are written into their rows as they arrive.
+        """
+        if self.user_columns is None:
+            self.user_columns = UserColumns.from_raw(self.raw)
+        return self.user_columns
+
+    def set_raw(self, key: str, raw_bytes: bytes):
+        self.raw[key] = raw_bytes
+        if self.user_columns is None:
+            return
+        if key in self.user_columns.index:
+            self.user_columns.set_row(key, raw_bytes)
+        else:
+            self.user_columns = None
+
+    def create_user(self, user_account_public_key: Pubkey) -> DriftUser:
+        return DriftUser(
+            self.drift_client,
+            user_public_key=user_account_public_key,
+            account_subscription=AccountSubscriptionConfig(
+                "cached", commitment=self.commitment
+            ),
+        )
+
+    def create_user_from_raw(self, key: str) -> DriftUser:
+        user = self.create_user(Pubkey.from_string(key))
+        user.account_subscriber.update_data(
+            DataAndSlot(self.latest_slot, decode_user(self.raw[key]))
+        )
+        return user
+
     async def must_get(self, key: str) -> DriftUser:
         if not self.has(key):
             pubkey = Pubkey.from_string(key)
@@ -110,25 +211,22 @@ class UserMap(UserMapInterface, DLOBSource):
         user_account_public_key: Pubkey,
         data: Optional[DataAndSlot[UserAccount]] = None,
     ) -> None:
-        user = DriftUser(
-            self.drift_client,
-            user_public_key=user_account_public_key,
-            account_subscription=AccountSubscriptionConfig(
-                "cached", commitment=self.commitment
-            ),
-        )
+        user = self.create_user(user_account_public_key)
 
         if data is not None:
             user.account_subscriber.update_data(data)
         else:
             await user.subscribe()
 
-        self.user_map[str(user_account_public_key)] = user
+        key = str(user_account_public_key)
+        self.user_map[key] = user
+        self.index.update(key, self.get_user_account_if_loaded(key))
+        self.update_dlob(user, None)
 
     async def update_with_order_record(self, record: OrderRecord):
         self.must_get(str(record.user))
 
-    async def sync(self) -> None:
+    async def sync(self) -> Optional[SyncStats]:
         async with self.sync_lock:
             try:
                 filters = [{"memcmp": {"offset": 0, "bytes": "TfwwBiNJtao"}}]
@@ -143,81 +241,189 @@ class UserMap(UserMapInterface, DLOBSource):
                     ),
                 )
 
-                post = self.drift_client.connection._provider.session.post(
-                    self.drift_client.connection._provider.endpoint_uri,
-                    json=rpc_request,
-                    headers={"content-encoding": "gzip"},
-                )
-
-                resp = await asyncio.wait_for(post, timeout=120)
-
-                parsed_resp = jsonrpcclient.parse(resp.json())
-
-                if isinstance(parsed_resp, jsonrpcclient.Error):
-                    raise ValueError(f"Error fetching user map: {parsed_resp.message}")
-
-                if not isinstance(parsed_resp, jsonrpcclient.Ok):
-                    raise ValueError(f"Error fetching user map - not ok: {parsed_resp}")
-
-                slot = int(parsed_resp.result["context"]["slot"])
-
-                self.latest_slot = slot
-
-                rpc_response_values = parsed_resp.result["value"]
-
-                program_account_buffer_map: Dict[str, Container[Any]] = {}
-                raw: Dict[str, bytes] = {}
-
-                # parse the gPA data before inserting
-                for program_account in rpc_response_values:
-                    pubkey = program_account["pubkey"]
-                    raw_bytes = base64.b64decode(program_account["account"]["data"][0])
-                    data = decode_user(raw_bytes)
-                    program_account_buffer_map[str(pubkey)] = data
-                    raw[str(pubkey)] = raw_bytes
-
-                self.raw = raw
-
-                # "idempotent" insert into usermap
-                for pubkey in program_account_buffer_map.keys():
-                    data = program_account_buffer_map.get(pubkey)
-                    user_account: UserAccount = data
-                    if pubkey not in self.user_map:
-                        await self.add_pubkey(
-                            Pubkey.from_string(pubkey), DataAndSlot(slot, user_account)
-                        )
-                        self.user_map.get(pubkey).account_subscriber.update_data(
-                            DataAndSlot(slot, user_account)
-                        )
-                    else:
-                        self.user_map.get(pubkey).account_subscriber.update_data(
-                            DataAndSlot(slot, user_account)
-                        )
+                # new and changed accounts are applied batch by batch as the
+                # response streams in. The slot and the removal of accounts that
+                # are gone wait for the full response, so a truncated one drops
+                # nothing
+                seen = set()
+                stats = SyncStats()
+                slot = self.latest_slot
+                decoder = BatchDecoder(decode_users, self.decode_executor)
+                async for slot, accounts in stream_program_accounts(
+                    self.drift_client.connection._provider, rpc_request
+                ):
+                    for pubkey, raw_bytes in accounts:
+                        seen.add(pubkey)
+                        if not self.has(pubkey):
+                            stats.new += 1
+                        elif self.is_unchanged(pubkey, raw_bytes):
+                            stats.unchanged += 1
+                            continue
+                        else:
+                            stats.changed += 1
+
+                        if self.lazy_users:
+                            self.upsert_raw(pubkey, raw_bytes, slot)
+                        else:
+                            decoder.add(pubkey, raw_bytes)
+
+                    async for batch in decoder.batches():
+                        await self.upsert_users(batch, slot)
                     # let the loop breathe
                     await asyncio.sleep(0)
 
-                # remove any stale data from the usermap or update the data to the latest gPA data
-                keys_to_delete = []
-                for key in list(self.user_map.keys()):
-                    if key not in program_account_buffer_map:
-                        self.user_map[key].unsubscribe()
-                        keys_to_delete.append(key)
-                    await asyncio.sleep(0)
+                async for batch in decoder.batches(flush=True):
+                    await self.upsert_users(batch, slot)
 
-                for key in keys_to_delete:
-                    del self.user_map[key]
+                self.latest_slot = slot
+                stats.removed = await self.remove_stale(seen)
+                self.last_sync_stats = stats
+                return stats
 
             except Exception as e:
                 print(f"Error in UserMap.sync(): {e}")
+                return None
+
+    def is_unchanged(self, key: str, raw_bytes: bytes) -> bool:
+        # users updated over the websocket since the last sync no longer match
+        # their raw bytes, so they are always refreshed
+        return key not in self.updated_keys and self.raw.get(key) == raw_bytes
+
+    async def upsert_users(
+        self, batch: List[Tuple[str, bytes, UserAccount]], slot: int
+    ):
+        for key, raw_bytes, user_account in batch:
+            self.set_raw(key, raw_bytes)
+            self.updated_keys.discard(key)
+
+            user = self.user_map.get(key)
+            if user is None:
+                await self.add_pubkey(
+                    Pubkey.from_string(key), DataAndSlot(slot, user_account)
+                )
+            else:
+                previous = self.get_user_account_if_loaded(key)
+                user.account_subscriber.update_data(DataAndSlot(slot, user_account))
+                self.index.update(key, user_account)
+                self.update_dlob(user, previous)
+        # let the loop breathe
+        await asyncio.sleep(0)
+
+    def upsert_raw(self, key: str, raw_bytes: bytes, slot: int):
+        """
+        Lazy counterpart of upsert_users(). The index is read from the raw bytes,
+        the account is only decoded for a materialized user, or for the long-lived
+        DLOB when its orders changed.
+        """
+        previous_bytes = self.raw.get(key)
+        self.set_raw(key, raw_bytes)
+        self.updated_keys.discard(key)
+        self.index.update_from_raw(key, raw_bytes)
+
+        user = self.user_map.get(key)
+        if user is not None:
+            previous = self.get_user_account_if_loaded(key)
+            user.account_subscriber.update_data(
+                DataAndSlot(slot, decode_user(raw_bytes))
+            )
+            self.update_dlob(user, previous)
+        elif self.dlob is not None and (
+            previous_bytes is None
+            or previous_bytes[ORDERS_OFFSET:ORDERS_END]
+            != raw_bytes[ORDERS_OFFSET:ORDERS_END]
+        ):
+            self.dlob.update_user_orders(
+                Pubkey.from_string(key),
+                (
+                    decode_user(previous_bytes).orders
+                    if previous_bytes is not None
+                    else []
+                ),
+                decode_user(raw_bytes).orders,
+                slot,
+            )
+
+    async def remove_stale(self, keys_to_keep: Container[str]) -> int:
+        stale = [key for key in self.keys() if key not in keys_to_keep]
+        for key in stale:
+            self.remove_from_dlob(key)
+            user = self.user_map.pop(key, None)
+            if user is not None:
+                user.unsubscribe()
+            if self.raw.pop(key, None) is not None:
+                self.user_columns = None
+            self.updated_keys.discard(key)
+            self.index.remove(key)
+            await asyncio.sleep(0)
+        return len(stale)
 
     # this is used as a callback for ws subscriptions to update data as its streamed
     async def update_user_account(self, key: str, data: DataAndSlot[UserAccount]):
         user: DriftUser = await self.must_get(key)
+        previous = self.get_user_account_if_loaded(key)
         user.account_subscriber.update_data(data)
+        self.index.update(key, data.data)
+        self.update_dlob(user, previous)
+        self.updated_keys.add(key)
+
+    # websocket callback for lazy users, the bytes are applied as in sync()
+    async def update_user_raw(self, key: str, data: DataAndSlot[bytes]):
+        self.upsert_raw(key, data.data, data.slot)
+
+    def get_user_account_if_loaded(self, key: str) -> Optional[UserAccount]:
+        user = self.user_map.get(key)
+        if user is None:
+            if self.lazy_users and key in self.raw:
+                return decode_user(self.raw[key])
+            return None
+        data_and_slot = user.account_subscriber.get_user_account_and_slot()
+        return data_and_slot.data if data_and_slot is not None else None
+
+    def update_dlob(self, user: DriftUser, previous: Optional[UserAccount]):
+        """
+        Applies the order changes between `previous` and the user's current account
+        to the long-lived DLOB, if one is being maintained.
+        """
+        if self.dlob is None:
+            return
+
+        data_and_slot = user.account_subscriber.get_user_account_and_slot()
+        current = data_and_slot.data if data_and_slot is not None else None
+        if current is previous:
+            return
+
+        self.dlob.update_user_orders(
+            user.user_public_key,
+            previous.orders if previous is not None else [],
+            current.orders if current is not None else [],
+            max(self.latest_slot, data_and_slot.slot if data_and_slot else 0),
+        )
+
+    def remove_from_dlob(self, key: str):
+        if self.dlob is None:
+            return
+
+        previous = self.get_user_account_if_loaded(key)
+        if previous is not None:
+            self.dlob.update_user_orders(
+                Pubkey.from_string(key),
+                previous.orders,
+                [],
+                self.latest_slot,
+            )
 
     async def get_DLOB(self, slot: int):
         from driftpy.dlob.dlob import DLOB
 
+        if self.incremental_dlob:
+            if self.dlob is None:
+                self.dlob = DLOB()
+                self.dlob.init_from_usermap(self, slot)
+            else:
+                self.dlob.reset_simulated_fills()
+                self.dlob.update_resting_limit_orders(slot)
+            return self.dlob
+
         dlob = DLOB()
         dlob.init_from_usermap(self, slot)
         return dlob
@@ -226,28 +432,72 @@ class UserMap(UserMapInterface, DLOBSource):
         return self.latest_slot
 
     def get_last_dump_filepath(self) -> str:
-        return f"usermap_{self.last_dumped_slot}.pkl"
+        return f"usermap_{self.last_dumped_slot}.snap"
 
     async def load(self, filename: Optional[str] = None):
+        """
+        Loads a snapshot written by dump(). Pickled dumps from older versions are
+        still read, their slot comes from the filename.
+        """
         if not filename:
             filename = self.get_last_dump_filepath()
         if not os.path.exists(filename):
             raise FileNotFoundError(f"File {filename} not found")
-        start = filename.index("_") + 1
-        end = filename.index(".")
-        slot = int(filename[start:end])
+        if not is_snapshot(filename):
+            await self.load_pickle(filename)
+            return
+
+        decoder = BatchDecoder(decode_users, self.decode_executor)
+        with Snapshot(filename) as snapshot:
+            slot = snapshot.slot
+            for records in snapshot.batches():
+                await self.load_accounts(records, decoder, slot)
+        async for batch in decoder.batches(flush=True):
+            await self.upsert_users(batch, slot)
+        self.latest_slot = max(self.latest_slot, slot)
+
+    async def load_pickle(self, filename: str):
+        name = os.path.basename(filename)
+        slot = int(name[name.index("_") + 1 : name.index(".")])
         with open(filename, "rb") as f:
             users: list[PickledData] = pickle.load(f)
-            for user in users:
-                decompressed_data = decompress(user.data)
-                data = decode_user(decompressed_data)
-                await self.add_pubkey(user.pubkey, DataAndSlot(slot, data))
-
-    def dump(self, filename: Optional[str] = None):
-        users = []
-        for pubkey, user in self.raw.items():
-            users.append(PickledData(pubkey=pubkey, data=compress(user)))
+        decoder = BatchDecoder(decode_users, self.decode_executor)
+        await self.load_accounts(
+            [(str(user.pubkey), decompress(user.data)) for user in users],
+            decoder,
+            slot,
+        )
+        async for batch in decoder.batches(flush=True):
+            await self.upsert_users(batch, slot)
+        self.latest_slot = max(self.latest_slot, slot)
+
+    async def load_accounts(
+        self,
+        accounts: List[Tuple[str, bytes]],
+        decoder: BatchDecoder[UserAccount],
+        slot: int,
+    ):
+        if self.lazy_users:
+            # nothing is decoded, users are materialized on get() as after sync()
+            for key, raw_bytes in accounts:
+                self.set_raw(key, raw_bytes)
+                self.index.update_from_raw(key, raw_bytes)
+        else:
+            for key, raw_bytes in accounts:
+                decoder.add(key, raw_bytes)
+            async for batch in decoder.batches():
+                await self.upsert_users(batch, slot)
+        await asyncio.sleep(0)
+
+    def dump(
+        self,
+        filename: Optional[str] = None,
+        compression: Optional[str] = DEFAULT_COMPRESSION,
+    ):
+        """
+        Writes the raw accounts from the last sync() as a snapshot, block
+        compressed with "zstd" by default, or "zlib", "lz4" or None.
+        """
         self.last_dumped_slot = self.get_slot()
-        path = filename or f"usermap_{self.last_dumped_slot}.pkl"
-        with open(path, "wb") as f:
-            pickle.dump(users, f, pickle.HIGHEST_PROTOCOL)
+        path = filename or self.get_last_dump_filepath()
+        write_snapshot(path, self.last_dumped_slot, self.raw, compression)
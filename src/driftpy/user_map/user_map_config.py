@@ -1,3 +1,4 @@
+from concurrent.futures import Executor
 from dataclasses import dataclass
 from typing import Optional, Union
 
@@ -37,9 +38,23 @@ class UserMapConfig:
     # True to include idle users when loading.
     # Defaults to false to decrease # of accounts subscribed to
     include_idle: Optional[bool] = None
+    # True to keep one long-lived DLOB in get_DLOB() that is updated from account
+    # diffs instead of being rebuilt from every user on each call.
+    # Fills simulated by DLOB.find_nodes_to_fill on that DLOB are reset by the
+    # next get_DLOB() call or by an account update for the user.
+    incremental_dlob: Optional[bool] = False
+    # True to keep only the raw account bytes from sync(). A `DriftUser` is
+    # created when a user is first requested with get() or must_get(), and
+    # values() decodes the remaining users on the fly without keeping them.
+    lazy_users: Optional[bool] = False
+    # Executor, e.g. a ProcessPoolExecutor, used to decode accounts in batches
+    # during sync() and load(). None decodes on the event loop.
+    decode_executor: Optional[Executor] = None
 
 
 @dataclass
 class UserStatsMapConfig:
     drift_client: DriftClient
     connection: Optional[AsyncClient] = None
+    # Executor used to decode accounts in batches during sync(), see UserMapConfig
+    decode_executor: Optional[Executor] = None
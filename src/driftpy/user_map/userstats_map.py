@@ -1,16 +1,17 @@
 import asyncio
-import base64
 import os
 import pickle
 import traceback
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Tuple
 
 import jsonrpcclient
 from solders.pubkey import Pubkey
 
+from driftpy.accounts.program_accounts import stream_program_accounts
 from driftpy.accounts.types import DataAndSlot
 from driftpy.addresses import get_user_stats_account_public_key
-from driftpy.decode.user_stat import decode_user_stat
+from driftpy.decode.batch import BatchDecoder
+from driftpy.decode.user_stat import decode_user_stats
 from driftpy.drift_user_stats import DriftUserStats, UserStatsSubscriptionConfig
 from driftpy.events.types import WrappedEvent
 from driftpy.memcmp import get_user_stats_filter
@@ -26,9 +27,14 @@ from driftpy.types import (
     PickledData,
     SettlePnlRecord,
     UserStatsAccount,
-    compress,
     decompress,
 )
+from driftpy.user_map.snapshot import (
+    DEFAULT_COMPRESSION,
+    Snapshot,
+    is_snapshot,
+    write_snapshot,
+)
 from driftpy.user_map.user_map import UserMap
 from driftpy.user_map.user_map_config import UserStatsMapConfig
 
@@ -43,6 +49,7 @@ class UserStatsMap:
         self.latest_slot: int = 0
         self.last_dumped_slot: int = 0
         self.connection = config.connection or config.drift_client.connection
+        self.decode_executor = config.decode_executor
 
     async def subscribe(self):
         if self.size() > 0:
@@ -72,67 +79,57 @@ class UserStatsMap:
                     ),
                 )
 
-                post = self.connection._provider.session.post(
-                    self.connection._provider.endpoint_uri,
-                    json=rpc_request,
-                    headers={"content-encoding": "gzip"},
-                )
-
-                resp = await asyncio.wait_for(post, timeout=120)
-
-                parsed_resp = jsonrpcclient.parse(resp.json())
-                if isinstance(parsed_resp, jsonrpcclient.Error):
-                    raise ValueError(
-                        f"Error fetching user stats: {parsed_resp.message}"
-                    )
+                # accounts are applied batch by batch as the response streams in,
+                # the slot and the removal of accounts that are gone wait for the
+                # full response, so a truncated one drops nothing
+                seen = set()
+                slot = self.latest_slot
+                decoder = BatchDecoder(decode_user_stats, self.decode_executor)
+                async for slot, accounts in stream_program_accounts(
+                    self.connection._provider, rpc_request
+                ):
+                    for pubkey, buffer in accounts:
+                        seen.add(pubkey)
+                        decoder.add(pubkey, buffer)
+
+                    async for batch in decoder.batches():
+                        await self.upsert_user_stats(batch, slot)
 
-                if not isinstance(parsed_resp, jsonrpcclient.Ok):
-                    raise ValueError(
-                        f"Error fetching user stats - not ok: {parsed_resp}"
-                    )
+                    await asyncio.sleep(0)
 
-                slot = int(parsed_resp.result["context"]["slot"])
+                async for batch in decoder.batches(flush=True):
+                    await self.upsert_user_stats(batch, slot)
 
                 self.latest_slot = slot
-
-                rpc_response_values = parsed_resp.result["value"]
-
-                program_account_buffer_map: Dict[str, UserStatsAccount] = {}
-                raw: Dict[str, bytes] = {}
-
-                for program_account in rpc_response_values:
-                    pubkey = program_account["pubkey"]
-                    buffer = base64.b64decode(program_account["account"]["data"][0])
-                    data = decode_user_stat(buffer)
-                    program_account_buffer_map[str(pubkey)] = data
-                    raw[str(pubkey)] = buffer
-
-                self.raw = raw
-
-                for pubkey in program_account_buffer_map.keys():
-                    data = program_account_buffer_map.get(pubkey)
-                    if not self.has(pubkey):
-                        await self.add_user_stat(
-                            Pubkey.from_string(pubkey), DataAndSlot(slot, data)
-                        )
-                    else:
-                        await self.update_user_stat(pubkey, DataAndSlot(slot, data))
-
-                    await asyncio.sleep(0)
-
-                keys_to_delete = []
                 for key in list(self.user_stats_map.keys()):
-                    if key not in program_account_buffer_map:
-                        keys_to_delete.append(key)
-                    await asyncio.sleep(0)
-
-                for key in keys_to_delete:
-                    del self.user_stats_map[key]
+                    if key not in seen:
+                        del self.user_stats_map[key]
+                for key in list(self.raw.keys()):
+                    if key not in seen:
+                        del self.raw[key]
 
             except Exception as e:
                 print(f"Error in UserStatsMap.sync(): {e}")
                 traceback.print_exc()
 
+    async def upsert_user_stats(
+        self, batch: List[Tuple[str, bytes, UserStatsAccount]], slot: int
+    ):
+        for pubkey, buffer, data in batch:
+            await self.upsert_user_stat(pubkey, buffer, data, slot)
+        await asyncio.sleep(0)
+
+    async def upsert_user_stat(
+        self, pubkey: str, buffer: bytes, data: UserStatsAccount, slot: int
+    ):
+        self.raw[pubkey] = buffer
+        if not self.has(pubkey):
+            await self.add_user_stat(
+                Pubkey.from_string(pubkey), DataAndSlot(slot, data)
+            )
+        else:
+            await self.update_user_stat(pubkey, DataAndSlot(slot, data))
+
     def unsubscribe(self):
         keys = list(self.user_stats_map.keys())
         for key in keys:
@@ -253,35 +250,69 @@ class UserStatsMap:
         return self.get(pubkey)
 
     def get_last_dump_filepath(self) -> str:
-        return f"userstats_{self.last_dumped_slot}.pkl"
+        return f"userstats_{self.last_dumped_slot}.snap"
 
     def clear(self):
         self.user_stats_map.clear()
 
     async def load(self, filename: Optional[str] = None):
+        """
+        Loads a snapshot written by dump(). Pickled dumps from older versions are
+        still read, their slot comes from the filename.
+        """
         if not filename:
             filename = self.get_last_dump_filepath()
         if not os.path.exists(filename):
             raise FileNotFoundError(f"File {filename} not found")
-        start = filename.index("_") + 1
-        end = filename.index(".")
-        slot = int(filename[start:end])
+        if not is_snapshot(filename):
+            await self.load_pickle(filename)
+            return
+
+        decoder = BatchDecoder(decode_user_stats, self.decode_executor)
+        with Snapshot(filename) as snapshot:
+            slot = snapshot.slot
+            for records in snapshot.batches():
+                for pubkey, buffer in records:
+                    decoder.add(pubkey, buffer)
+                async for batch in decoder.batches():
+                    await self.load_user_stats(batch, slot)
+        async for batch in decoder.batches(flush=True):
+            await self.load_user_stats(batch, slot)
+        self.latest_slot = max(self.latest_slot, slot)
+
+    async def load_pickle(self, filename: str):
+        name = os.path.basename(filename)
+        slot = int(name[name.index("_") + 1 : name.index(".")])
         with open(filename, "rb") as f:
             user_stats: list[PickledData] = pickle.load(f)
-            for user_stat in user_stats:
-                decompressed_data = decompress(user_stat.data)
-                data = decode_user_stat(decompressed_data)
-                await self.add_user_stat(
-                    Pubkey.from_string(str(user_stat.pubkey)), DataAndSlot(slot, data)
-                )
+        decoder = BatchDecoder(decode_user_stats, self.decode_executor)
+        for user_stat in user_stats:
+            # pickled dumps are keyed by authority
+            pubkey = get_user_stats_account_public_key(
+                self.drift_client.program_id, Pubkey.from_string(str(user_stat.pubkey))
+            )
+            decoder.add(str(pubkey), decompress(user_stat.data))
+        async for batch in decoder.batches(flush=True):
+            await self.load_user_stats(batch, slot)
+        self.latest_slot = max(self.latest_slot, slot)
+
+    async def load_user_stats(
+        self, batch: List[Tuple[str, bytes, UserStatsAccount]], slot: int
+    ):
+        for pubkey, buffer, data in batch:
+            self.raw[pubkey] = buffer
+            await self.add_user_stat(data.authority, DataAndSlot(slot, data))
+        await asyncio.sleep(0)
 
-    def dump(self, filename: Optional[str] = None):
-        user_stats = []
-        for _pubkey, user_stat in self.raw.items():
-            decoded: UserStatsAccount = decode_user_stat(user_stat)
-            auth = decoded.authority
-            user_stats.append(PickledData(pubkey=auth, data=compress(user_stat)))
+    def dump(
+        self,
+        filename: Optional[str] = None,
+        compression: Optional[str] = DEFAULT_COMPRESSION,
+    ):
+        """
+        Writes the raw user stats accounts as a snapshot, block compressed with
+        "zstd" by default, or "zlib", "lz4" or None.
+        """
         self.last_dumped_slot = self.latest_slot
-        path = filename or f"userstats_{self.last_dumped_slot}.pkl"
-        with open(path, "wb") as f:
-            pickle.dump(user_stats, f, pickle.HIGHEST_PROTOCOL)
+        path = filename or self.get_last_dump_filepath()
+        write_snapshot(path, self.last_dumped_slot, self.raw, compression)
@@ -1,21 +1,71 @@
 import time
+import dataclasses
 import base64
+import gzip
+import json
+import pickle
 
+from concurrent.futures import Executor, ProcessPoolExecutor
 from pathlib import Path
-from pytest import fixture, mark
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+from pytest import fixture, mark, raises
 from sys import getsizeof
 
+import httpx
+from aiohttp import web
+
 from anchorpy import Idl, Program
 
+from solders.keypair import Keypair
 from solders.pubkey import Pubkey
 
 import driftpy
+import driftpy.user_map.user_map
+from driftpy.accounts.program_accounts import ProgramAccountsParser
+from driftpy.accounts.types import DataAndSlot
+from driftpy.addresses import get_user_stats_account_public_key
 from driftpy.decode.user import decode_user
+from driftpy.decode.user_stat import decode_user_stat
 from driftpy.math.perp_position import is_available
 from driftpy.math.spot_position import is_spot_position_available
-from driftpy.types import Order, PerpPosition, SpotPosition, UserAccount, is_variant
+from driftpy.types import (
+    MarginMode,
+    MarketType,
+    Order,
+    OrderStatus,
+    PerpPosition,
+    PickledData,
+    SpotPosition,
+    UserAccount,
+    UserStatus,
+    compress,
+    is_variant,
+    market_type_to_string,
+)
+from driftpy.user_map.user_columns import (
+    MARGIN_MODE_OFFSET,
+    ORDERS_OFFSET,
+    UserColumns,
+)
+from driftpy.user_map.user_index import HIGH_LEVERAGE, UserIndexEntry
+from driftpy.user_map.snapshot import (
+    COMPRESSION_ZSTD,
+    Snapshot,
+    is_snapshot,
+    write_snapshot,
+)
+from driftpy.user_map.user_map import UserMap
+from driftpy.user_map.types import SyncStats
+from driftpy.user_map.user_map_config import (
+    PollingConfig,
+    UserMapConfig,
+    UserStatsMapConfig,
+)
+from driftpy.user_map.userstats_map import UserStatsMap
 
 from tests.decode.decode_strings import user_account_buffer_strings
+from tests.decode.stat_decode_strings import stats
 
 
 @fixture(scope="session")
@@ -53,6 +103,665 @@ async def test_user_decode(program: Program):
     print("Total custom time:", total_custom_time)
 
 
+def test_user_columns_match_decode_user():
+    raw = {
+        str(index): base64.b64decode(buffer_string)
+        for index, buffer_string in enumerate(user_account_buffer_strings)
+    }
+    columns = UserColumns.from_raw(raw)
+    assert len(columns) == len(raw)
+
+    for key, data in raw.items():
+        user_account = decode_user(data)
+        row = columns.get_row(key)
+        assert columns.get_authority(key) == user_account.authority
+        assert row["sub_account_id"] == user_account.sub_account_id
+        assert row["status"] == user_account.status
+        assert bool(row["idle"]) == user_account.idle
+        assert row["open_orders"] == user_account.open_orders
+
+        open_orders = row["orders"][row["orders"]["status"] != 0]
+        assert open_orders["order_id"].tolist() == [
+            order.order_id for order in user_account.orders
+        ]
+        assert open_orders["price"].tolist() == [
+            order.price for order in user_account.orders
+        ]
+
+        positions = row["perp_positions"][
+            row["perp_positions"]["base_asset_amount"] != 0
+        ]
+        assert dict(
+            zip(
+                positions["market_index"].tolist(),
+                positions["base_asset_amount"].tolist(),
+            )
+        ) == {
+            position.market_index: position.base_asset_amount
+            for position in user_account.perp_positions
+            if position.base_asset_amount != 0
+        }
+
+    has_orders = columns["open_orders"] > 0
+    assert set(columns.get_keys(has_orders)) == {
+        key for key, data in raw.items() if decode_user(data).orders
+    }
+
+
+def make_gpa_response(raw: Dict[str, bytes], slot: int) -> bytes:
+    return json.dumps(
+        {
+            "jsonrpc": "2.0",
+            "result": {
+                "context": {"apiVersion": "2.0.0", "slot": slot},
+                "value": [
+                    {
+                        "account": {
+                            "data": [base64.b64encode(data).decode(), "base64"],
+                            "executable": False,
+                            "lamports": 1,
+                            "owner": "dRiftyHA39MWEi3m9aunc5MzRF1JYuBsbn6VPcn33UH",
+                            "rentEpoch": 0,
+                            "space": len(data),
+                        },
+                        "pubkey": pubkey,
+                    }
+                    for pubkey, data in raw.items()
+                ],
+            },
+            "id": 1,
+        }
+    ).encode()
+
+
+async def start_gpa_server(responses: List[bytes]):
+    async def handle(request: web.Request) -> web.StreamResponse:
+        response = web.StreamResponse(headers={"Content-Encoding": "gzip"})
+        await response.prepare(request)
+        body = gzip.compress(responses.pop(0))
+        for start in range(0, len(body), 4096):
+            await response.write(body[start : start + 4096])
+        await response.write_eof()
+        return response
+
+    app = web.Application()
+    app.router.add_post("/", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}/"
+
+
+def make_user_map(
+    endpoint: str, lazy_users: bool, decode_executor: Optional[Executor] = None
+) -> UserMap:
+    provider = SimpleNamespace(session=httpx.AsyncClient(), endpoint_uri=endpoint)
+    drift_client = SimpleNamespace(
+        program_id=Pubkey.from_string("dRiftyHA39MWEi3m9aunc5MzRF1JYuBsbn6VPcn33UH"),
+        program=SimpleNamespace(provider=SimpleNamespace(connection=None)),
+        connection=SimpleNamespace(_provider=provider),
+    )
+    return UserMap(
+        UserMapConfig(
+            drift_client,
+            PollingConfig(frequency=0),
+            lazy_users=lazy_users,
+            decode_executor=decode_executor,
+        )
+    )
+
+
+def test_program_accounts_parser_handles_any_chunking():
+    raw = {
+        str(Keypair().pubkey()): base64.b64decode(buffer_string)
+        for buffer_string in user_account_buffer_strings[:5]
+    }
+    body = make_gpa_response(raw, 7)
+
+    for chunk_size in [1, 7, 4096, len(body)]:
+        parser = ProgramAccountsParser()
+        accounts = []
+        for start in range(0, len(body), chunk_size):
+            accounts += parser.feed(body[start : start + chunk_size])
+        accounts += parser.finish()
+        assert parser.slot == 7
+        assert dict(accounts) == raw
+
+    error = b'{"jsonrpc": "2.0", "error": {"code": -1, "message": "boom"}, "id": 1}'
+    parser = ProgramAccountsParser()
+    assert parser.feed(error) == []
+    with raises(ValueError, match="boom"):
+        parser.finish()
+
+
+@mark.asyncio
+async def test_user_map_sync_streams_program_accounts():
+    raw = {
+        str(Keypair().pubkey()): base64.b64decode(buffer_string)
+        for buffer_string in user_account_buffer_strings[:10]
+    }
+    remaining = dict(list(raw.items())[5:])
+    responses = [
+        make_gpa_response(raw, 1),
+        b'{"jsonrpc": "2.0", "error": {"code": -1, "message": "boom"}, "id": 1}',
+        make_gpa_response(remaining, 3),
+    ]
+    runner, endpoint = await start_gpa_server(responses)
+    try:
+        user_map = make_user_map(endpoint, lazy_users=False)
+        await user_map.sync()
+        assert user_map.size() == len(raw)
+        assert user_map.get_slot() == 1
+        for key, data in raw.items():
+            authority = user_map.get(key).get_user_account().authority
+            assert authority == decode_user(data).authority
+        assert user_map.raw == raw
+
+        # a failed sync leaves the map as it was
+        await user_map.sync()
+        assert user_map.size() == len(raw)
+
+        await user_map.sync()
+        assert user_map.size() == len(remaining)
+        assert user_map.get_slot() == 3
+        assert user_map.raw == remaining
+    finally:
+        await runner.cleanup()
+
+
+@mark.asyncio
+async def test_user_map_sync_skips_unchanged_accounts():
+    raw = {
+        str(Keypair().pubkey()): base64.b64decode(buffer_string)
+        for buffer_string in user_account_buffer_strings[:6]
+    }
+    keys = list(raw)
+    changed = dict(raw)
+    # rename one user, drop another and add a new one
+    changed[keys[0]] = raw[keys[0]][:72] + b"x" + raw[keys[0]][73:]
+    del changed[keys[1]]
+    changed[str(Keypair().pubkey())] = base64.b64decode(user_account_buffer_strings[6])
+
+    responses = [
+        make_gpa_response(raw, 1),
+        make_gpa_response(raw, 2),
+        make_gpa_response(changed, 3),
+    ]
+    runner, endpoint = await start_gpa_server(responses)
+    try:
+        user_map = make_user_map(endpoint, lazy_users=False)
+        assert await user_map.sync() == SyncStats(new=6)
+
+        accounts = {key: user_map.get(key).get_user_account() for key in keys}
+        assert await user_map.sync() == SyncStats(unchanged=6)
+        for key in keys:
+            assert user_map.get(key).get_user_account() is accounts[key]
+
+        stats = await user_map.sync()
+        assert stats == SyncStats(new=1, changed=1, unchanged=4, removed=1)
+        assert user_map.last_sync_stats == stats
+        assert user_map.get(keys[0]).get_user_account().name[0] == ord("x")
+        assert user_map.get(keys[2]).get_user_account() is accounts[keys[2]]
+    finally:
+        await runner.cleanup()
+
+
+@mark.asyncio
+@mark.parametrize("lazy_users", [False, True])
+async def test_user_map_sync_keeps_accounts_on_truncated_response(lazy_users: bool):
+    raw = {
+        str(Keypair().pubkey()): base64.b64decode(buffer_string)
+        for buffer_string in user_account_buffer_strings[:10]
+    }
+    keys = list(raw)
+    # the first three accounts are gone, the others changed
+    changed = {key: raw[key][:72] + b"x" + raw[key][73:] for key in keys[3:]}
+    changed[str(Keypair().pubkey())] = base64.b64decode(user_account_buffer_strings[10])
+    body = make_gpa_response(changed, 2)
+
+    runner, endpoint = await start_gpa_server(
+        [
+            make_gpa_response(raw, 1),
+            body[: len(body) * 2 // 3],
+            make_gpa_response(changed, 3),
+        ]
+    )
+    try:
+        user_map = make_user_map(endpoint, lazy_users=lazy_users)
+        await user_map.sync()
+
+        # accounts read before the cut are applied, but nothing is removed and
+        # the slot stays, since the response never said what is gone
+        assert await user_map.sync() is None
+        assert user_map.latest_slot == 1
+        assert set(keys) <= set(user_map.keys())
+        for key in keys[:3]:
+            assert user_map.raw[key] == raw[key]
+        assert any(user_map.raw[key] == changed[key] for key in keys[3:])
+        for key, data in user_map.raw.items():
+            assert data in (raw.get(key), changed.get(key))
+            assert user_map.get(key).get_user_account() == decode_user(data)
+        assert_user_index_matches(
+            user_map, {key: decode_user(data) for key, data in user_map.raw.items()}
+        )
+
+        await user_map.sync()
+        assert user_map.latest_slot == 3
+        assert user_map.raw == changed
+        assert_user_index_matches(
+            user_map, {key: decode_user(data) for key, data in changed.items()}
+        )
+    finally:
+        await runner.cleanup()
+
+
+@mark.asyncio
+async def test_user_map_sync_decodes_in_process_pool():
+    raw = {
+        str(Keypair().pubkey()): base64.b64decode(buffer_string)
+        for buffer_string in user_account_buffer_strings
+    }
+    runner, endpoint = await start_gpa_server([make_gpa_response(raw, 1)])
+    try:
+        with ProcessPoolExecutor(2) as executor:
+            user_map = make_user_map(
+                endpoint, lazy_users=False, decode_executor=executor
+            )
+            assert await user_map.sync() == SyncStats(new=len(raw))
+
+        for key, data in raw.items():
+            assert user_map.get(key).get_user_account() == decode_user(data)
+    finally:
+        await runner.cleanup()
+
+
+def assert_user_index_matches(user_map: UserMap, accounts: Dict[str, UserAccount]):
+    by_authority, by_perp_market, by_spot_market, by_order_market = {}, {}, {}, {}
+    for key, account in accounts.items():
+        by_authority.setdefault(account.authority, set()).add(key)
+        for position in account.perp_positions:
+            if not is_available(position):
+                by_perp_market.setdefault(position.market_index, set()).add(key)
+        for position in account.spot_positions:
+            if not is_spot_position_available(position):
+                by_spot_market.setdefault(position.market_index, set()).add(key)
+        for order in account.orders:
+            if is_variant(order.status, "Open"):
+                market = (market_type_to_string(order.market_type), order.market_index)
+                by_order_market.setdefault(market, set()).add(key)
+
+    index = user_map.index
+    assert index.by_authority == by_authority
+    assert index.by_perp_market == by_perp_market
+    assert index.by_spot_market == by_spot_market
+    assert index.by_order_market == by_order_market
+    assert index.get_users_being_liquidated() == {
+        key
+        for key, account in accounts.items()
+        if account.status & (UserStatus.BEING_LIQUIDATED | UserStatus.BANKRUPT)
+    }
+    assert index.get_high_leverage_users() == {
+        key
+        for key, account in accounts.items()
+        if is_variant(account.margin_mode, "HighLeverage")
+    }
+
+
+@mark.asyncio
+@mark.parametrize("lazy_users", [False, True])
+async def test_user_map_indexes_follow_sync_and_updates(lazy_users: bool):
+    raw = {
+        str(Keypair().pubkey()): base64.b64decode(buffer_string)
+        for buffer_string in user_account_buffer_strings[:20]
+    }
+    remaining = dict(list(raw.items())[5:])
+    responses = [make_gpa_response(raw, 1), make_gpa_response(remaining, 2)]
+    runner, endpoint = await start_gpa_server(responses)
+    try:
+        user_map = make_user_map(endpoint, lazy_users=lazy_users)
+        await user_map.sync()
+        accounts = {key: decode_user(data) for key, data in raw.items()}
+        assert_user_index_matches(user_map, accounts)
+        assert any(user_map.index.by_order_market.values())
+
+        await user_map.sync()
+        accounts = {key: decode_user(data) for key, data in remaining.items()}
+        assert_user_index_matches(user_map, accounts)
+
+        # a websocket update flips a user into high leverage mode and closes
+        # all of its orders
+        key, account = next(iter(accounts.items()))
+        updated = dataclasses.replace(
+            account,
+            margin_mode=MarginMode.HighLeverage(),
+            orders=[
+                dataclasses.replace(order, status=OrderStatus.Init())
+                for order in account.orders
+            ],
+        )
+        await user_map.update_user_account(key, DataAndSlot(3, updated))
+        accounts[key] = updated
+        assert_user_index_matches(user_map, accounts)
+        assert key in user_map.index.get_high_leverage_users()
+        for market_type in [MarketType.Perp(), MarketType.Spot()]:
+            for market_index in range(100):
+                assert key not in user_map.index.get_users_with_open_orders(
+                    market_index, market_type
+                )
+
+        user_map.clear()
+        assert not user_map.index.entries
+        assert not user_map.index.by_authority
+    finally:
+        await runner.cleanup()
+
+
+def test_user_index_entry_from_raw_matches_decode():
+    for buffer_string in user_account_buffer_strings:
+        data = base64.b64decode(buffer_string)
+        assert UserIndexEntry.from_raw(data) == UserIndexEntry.from_user_account(
+            decode_user(data)
+        )
+
+
+@mark.asyncio
+async def test_lazy_user_map_sync_indexes_without_decoding(monkeypatch):
+    raw = {
+        str(Keypair().pubkey()): base64.b64decode(buffer_string)
+        for buffer_string in user_account_buffer_strings[:20]
+    }
+    decoded = []
+
+    def counting_decode_user(buffer: bytes) -> UserAccount:
+        decoded.append(buffer)
+        return decode_user(buffer)
+
+    monkeypatch.setattr(driftpy.user_map.user_map, "decode_user", counting_decode_user)
+    runner, endpoint = await start_gpa_server([make_gpa_response(raw, 1)])
+    try:
+        user_map = make_user_map(endpoint, lazy_users=True)
+        await user_map.sync()
+        assert decoded == []
+        assert_user_index_matches(
+            user_map, {key: decode_user(data) for key, data in raw.items()}
+        )
+    finally:
+        await runner.cleanup()
+
+
+@mark.asyncio
+async def test_lazy_user_map_applies_websocket_updates_without_decoding(
+    monkeypatch,
+):
+    raw = {
+        str(Keypair().pubkey()): base64.b64decode(buffer_string)
+        for buffer_string in user_account_buffer_strings[:20]
+    }
+    decoded = []
+
+    def counting_decode_user(buffer: bytes) -> UserAccount:
+        decoded.append(buffer)
+        return decode_user(buffer)
+
+    monkeypatch.setattr(driftpy.user_map.user_map, "decode_user", counting_decode_user)
+    runner, endpoint = await start_gpa_server([make_gpa_response(raw, 1)])
+    try:
+        user_map = make_user_map(endpoint, lazy_users=True)
+        await user_map.sync()
+        columns = user_map.get_user_columns()
+        assert user_map.get_user_columns() is columns
+
+        # the update flips a user into high leverage mode and closes all of its
+        # orders, straight in the account bytes
+        key, data = next(
+            (key, data) for key, data in raw.items() if decode_user(data).orders
+        )
+        updated = bytearray(data)
+        updated[MARGIN_MODE_OFFSET] = HIGH_LEVERAGE
+        for i in range(32):
+            updated[ORDERS_OFFSET + i * 96 + 82] = 0
+        updated = bytes(updated)
+        await user_map.update_user_raw(key, DataAndSlot(2, updated))
+
+        assert decoded == []
+        assert user_map.raw[key] == updated
+        assert user_map.index.entries[key] == UserIndexEntry.from_raw(updated)
+        assert key in user_map.index.get_high_leverage_users()
+        raw[key] = updated
+        assert_user_index_matches(
+            user_map, {key: decode_user(data) for key, data in raw.items()}
+        )
+
+        # changed rows are written in place, a new user rebuilds the view
+        assert user_map.get_user_columns() is columns
+        assert columns.get_row(key).tobytes() == updated
+        new_key = str(Keypair().pubkey())
+        await user_map.update_user_raw(new_key, DataAndSlot(3, data))
+        assert decoded == []
+        columns = user_map.get_user_columns()
+        assert columns.keys == list(user_map.raw)
+        assert columns.get_row(new_key).tobytes() == data
+    finally:
+        await runner.cleanup()
+
+
+@mark.parametrize("compression", [None, "zlib", "zstd"])
+def test_snapshot_round_trip(tmp_path, compression: Optional[str]):
+    raw = {
+        str(Keypair().pubkey()): base64.b64decode(buffer_string)
+        for buffer_string in user_account_buffer_strings[:10]
+    }
+    path = str(tmp_path / "users.snap")
+    write_snapshot(path, 42, raw, compression, block_records=3)
+
+    assert is_snapshot(path)
+    with Snapshot(path) as snapshot:
+        assert snapshot.slot == 42
+        assert len(snapshot) == len(raw)
+        assert [len(records) for records in snapshot.batches()] == [3, 3, 3, 1]
+        assert list(snapshot) == list(raw.items())
+
+    with raises(ValueError):
+        write_snapshot(path, 42, {**raw, str(Keypair().pubkey()): b"short"})
+
+
+@mark.asyncio
+@mark.parametrize("lazy_users", [False, True])
+async def test_user_map_restarts_from_snapshot(tmp_path, lazy_users: bool):
+    raw = {
+        str(Keypair().pubkey()): base64.b64decode(buffer_string)
+        for buffer_string in user_account_buffer_strings[:20]
+    }
+    responses = [make_gpa_response(raw, 5), make_gpa_response(raw, 6)]
+    runner, endpoint = await start_gpa_server(responses)
+    try:
+        user_map = make_user_map(endpoint, lazy_users=False)
+        await user_map.sync()
+        path = str(tmp_path / "usermap.snap")
+        user_map.dump(path, "zstd")
+
+        restored = make_user_map(endpoint, lazy_users=lazy_users)
+        await restored.load(path)
+        assert restored.get_slot() == 5
+        assert set(restored.keys()) == set(raw)
+        assert restored.raw == raw
+        assert restored.index.entries == user_map.index.entries
+        for key, data in raw.items():
+            assert restored.get(key).get_user_account() == decode_user(data)
+
+        # nothing changed since the snapshot, so nothing is decoded again
+        assert await restored.sync() == SyncStats(unchanged=len(raw))
+    finally:
+        await runner.cleanup()
+
+
+@mark.asyncio
+async def test_user_map_loads_pickled_dump(tmp_path):
+    raw = {
+        str(Keypair().pubkey()): base64.b64decode(buffer_string)
+        for buffer_string in user_account_buffer_strings[:5]
+    }
+    path = str(tmp_path / "usermap_7.pkl")
+    with open(path, "wb") as f:
+        pickle.dump(
+            [PickledData(pubkey=key, data=compress(data)) for key, data in raw.items()],
+            f,
+        )
+
+    user_map = make_user_map("http://localhost", lazy_users=False)
+    await user_map.load(path)
+    assert user_map.get_slot() == 7
+    for key, data in raw.items():
+        assert user_map.get(key).get_user_account() == decode_user(data)
+
+
+@mark.asyncio
+async def test_lazy_user_map_loads_snapshot_without_decoding(tmp_path, monkeypatch):
+    raw = {
+        str(Keypair().pubkey()): base64.b64decode(buffer_string)
+        for buffer_string in user_account_buffer_strings[:20]
+    }
+    path = str(tmp_path / "usermap.snap")
+    write_snapshot(path, 9, raw, "zlib", block_records=3)
+    decoded = []
+
+    def counting_decode_user(buffer: bytes) -> UserAccount:
+        decoded.append(buffer)
+        return decode_user(buffer)
+
+    def counting_decode_users(buffers: List[bytes]) -> List[UserAccount]:
+        return [counting_decode_user(buffer) for buffer in buffers]
+
+    monkeypatch.setattr(driftpy.user_map.user_map, "decode_user", counting_decode_user)
+    monkeypatch.setattr(
+        driftpy.user_map.user_map, "decode_users", counting_decode_users
+    )
+    user_map = make_user_map("http://localhost", lazy_users=True)
+    await user_map.load(path)
+    assert decoded == []
+    assert user_map.get_slot() == 9
+    assert user_map.raw == raw
+    assert_user_index_matches(
+        user_map, {key: decode_user(data) for key, data in raw.items()}
+    )
+
+
+@mark.asyncio
+@mark.parametrize("compression", [None, "zstd"])
+async def test_user_stats_map_snapshot_round_trip(tmp_path, compression: Optional[str]):
+    drift_client = make_user_map("http://localhost", lazy_users=False).drift_client
+    # DriftUserStats builds its subscriber from the program's account coder
+    drift_client.program.coder = SimpleNamespace(
+        accounts=SimpleNamespace(decode=decode_user_stat)
+    )
+    raw = {}
+    for buffer_string in stats:
+        data = base64.b64decode(buffer_string)
+        authority = Pubkey.from_bytes(data[8:40])
+        key = get_user_stats_account_public_key(drift_client.program_id, authority)
+        raw[str(key)] = data
+    user_stats_map = UserStatsMap(UserStatsMapConfig(drift_client))
+    user_stats_map.raw = dict(raw)
+    user_stats_map.latest_slot = 11
+    first = str(tmp_path / "first.snap")
+    user_stats_map.dump(first, compression)
+
+    # a restarted process loads the snapshot and dumps it again
+    restored = UserStatsMap(UserStatsMapConfig(drift_client))
+    await restored.load(first)
+    assert restored.latest_slot == 11
+    assert restored.raw == raw
+    for data in raw.values():
+        authority = str(Pubkey.from_bytes(data[8:40]))
+        account = restored.get(authority).get_account()
+        assert account == decode_user_stat(data)
+
+    second = str(tmp_path / "second.snap")
+    restored.dump(second, compression)
+    with Snapshot(first) as expected, Snapshot(second) as actual:
+        assert actual.slot == expected.slot == 11
+        assert dict(actual) == dict(expected) == raw
+
+
+@mark.asyncio
+async def test_dumps_default_to_zstd(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    drift_client = make_user_map("http://localhost", lazy_users=False).drift_client
+    drift_client.program.coder = SimpleNamespace(
+        accounts=SimpleNamespace(decode=decode_user_stat)
+    )
+    users = {
+        str(Keypair().pubkey()): base64.b64decode(buffer_string)
+        for buffer_string in user_account_buffer_strings[:10]
+    }
+    user_stats = {
+        str(Keypair().pubkey()): base64.b64decode(buffer_string)
+        for buffer_string in stats
+    }
+
+    user_map = make_user_map("http://localhost", lazy_users=True)
+    user_map.raw = dict(users)
+    user_map.latest_slot = 5
+    user_map.dump()
+    user_stats_map = UserStatsMap(UserStatsMapConfig(drift_client))
+    user_stats_map.raw = dict(user_stats)
+    user_stats_map.latest_slot = 6
+    user_stats_map.dump()
+
+    for path, raw in [("usermap_5.snap", users), ("userstats_6.snap", user_stats)]:
+        with Snapshot(path) as snapshot:
+            assert snapshot.compression == COMPRESSION_ZSTD
+            assert dict(snapshot) == raw
+
+    restored_users = make_user_map("http://localhost", lazy_users=True)
+    await restored_users.load("usermap_5.snap")
+    assert restored_users.get_slot() == 5
+    assert restored_users.raw == users
+    restored_user_stats = UserStatsMap(UserStatsMapConfig(drift_client))
+    await restored_user_stats.load("userstats_6.snap")
+    assert restored_user_stats.latest_slot == 6
+    assert restored_user_stats.raw == user_stats
+
+
+@mark.asyncio
+async def test_lazy_user_map_materializes_on_get():
+    raw = {
+        str(Keypair().pubkey()): base64.b64decode(buffer_string)
+        for buffer_string in user_account_buffer_strings[:10]
+    }
+    remaining = dict(list(raw.items())[5:])
+    responses = [make_gpa_response(raw, 1), make_gpa_response(remaining, 2)]
+    runner, endpoint = await start_gpa_server(responses)
+    try:
+        user_map = make_user_map(endpoint, lazy_users=True)
+        await user_map.sync()
+
+        key = next(iter(raw))
+        assert user_map.size() == len(raw)
+        assert user_map.has(key)
+        assert user_map.user_map == {}
+        assert user_map.get_user_authority(key) == decode_user(raw[key]).authority
+
+        # iterating decodes users without keeping them around
+        assert len(list(user_map.values())) == len(raw)
+        assert user_map.user_map == {}
+
+        user = user_map.get(key)
+        assert user is user_map.get(key)
+        assert user.get_user_account().authority == decode_user(raw[key]).authority
+        assert list(user_map.user_map) == [key]
+
+        # accounts that disappear from the next sync are dropped, materialized or not
+        await user_map.sync()
+        assert user_map.size() == len(remaining)
+        assert not user_map.has(key)
+        assert user_map.user_map == {}
+    finally:
+        await runner.cleanup()
+
+
 def user_account_decode(program: Program, user_account_buffer: bytes, index: int):
     print("Benchmarking user account decode: ", index)
 
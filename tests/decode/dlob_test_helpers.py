@@ -56,7 +56,8 @@ def insert_order_to_dlob(
         False,
         OrderTriggerCondition.Above(),
         auction_duration,
-        [0, 0, 0],
+        0,
+        0,
     )
     dlob.insert_order(order, user_account, slot)
 
@@ -104,6 +105,7 @@ def insert_trigger_order_to_dlob(
         True,
         trigger_condition,
         max_ts,
-        [0, 0, 0],
+        0,
+        0,
     )
     dlob.insert_order(order, user_account, slot)
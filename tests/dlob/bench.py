@@ -0,0 +1,315 @@
+"""
+DLOB microbenchmarks on synthetic books.
+
+    python -m tests.dlob.bench --sizes 1000 10000 100000
+
+Each run appends one JSON line per (operation, book size) to `--output`, with
+the git revision and a timestamp, so results can be compared over time. Results
+go to the gitignored `.bench/` directory unless another path is given.
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import time
+import tracemalloc
+from dataclasses import dataclass
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional
+
+from solders.keypair import Keypair
+from solders.pubkey import Pubkey
+
+from driftpy.constants.numeric_constants import BASE_PRECISION, PRICE_PRECISION
+from driftpy.dlob.dlob import DLOB
+from driftpy.types import (
+    ExchangeStatus,
+    MarketType,
+    OraclePriceData,
+    Order,
+    OrderStatus,
+    OrderTriggerCondition,
+    OrderType,
+    PositionDirection,
+)
+from tests.dlob_test_constants import mock_perp_markets
+
+NUM_MARKETS = 4
+ORDERS_PER_USER = 32
+START_SLOT = 100
+ORACLE_PRICE = 100 * PRICE_PRECISION
+L2_DEPTH = 20
+DEFAULT_OUTPUT = os.path.join(".bench", "dlob_bench.jsonl")
+
+
+@dataclass
+class SyntheticBook:
+    orders: List[tuple]  # (order, user_account)
+    usermap: Dict[Pubkey, SimpleNamespace]
+
+
+def make_order(
+    rng: random.Random, order_id: int, market_index: int, slot: int
+) -> Order:
+    is_long = rng.random() < 0.5
+    direction = PositionDirection.Long() if is_long else PositionDirection.Short()
+    # bids below the oracle, asks above it, with some overlap so fills exist
+    offset = rng.randint(-50, 500) * PRICE_PRECISION // 100
+    price = ORACLE_PRICE - offset if is_long else ORACLE_PRICE + offset
+
+    kind = rng.random()
+    order_type = OrderType.Limit()
+    trigger_price = 0
+    trigger_condition = OrderTriggerCondition.Above()
+    oracle_price_offset = 0
+    post_only = False
+    auction_duration = 0
+    if kind < 0.55:
+        post_only = True
+    elif kind < 0.7:
+        oracle_price_offset = price - ORACLE_PRICE
+        post_only = True
+    elif kind < 0.85:
+        auction_duration = rng.randint(5, 30)
+    elif kind < 0.92:
+        order_type = OrderType.Market()
+        price = 0
+        auction_duration = 10
+    else:
+        order_type = OrderType.TriggerMarket()
+        price = 0
+        trigger_price = ORACLE_PRICE + rng.randint(-1000, 1000) * PRICE_PRECISION // 100
+        trigger_condition = (
+            OrderTriggerCondition.Above()
+            if trigger_price > ORACLE_PRICE
+            else OrderTriggerCondition.Below()
+        )
+
+    return Order(
+        slot=slot - rng.randint(0, 20),
+        price=price,
+        base_asset_amount=rng.randint(1, 100) * BASE_PRECISION // 10,
+        base_asset_amount_filled=0,
+        quote_asset_amount_filled=0,
+        trigger_price=trigger_price,
+        auction_start_price=price,
+        auction_end_price=price,
+        max_ts=0,
+        oracle_price_offset=oracle_price_offset,
+        order_id=order_id,
+        market_index=market_index,
+        status=OrderStatus.Open(),
+        order_type=order_type,
+        market_type=MarketType.Perp(),
+        user_order_id=0,
+        existing_position_direction=PositionDirection.Long(),
+        direction=direction,
+        reduce_only=False,
+        post_only=post_only,
+        immediate_or_cancel=False,
+        trigger_condition=trigger_condition,
+        auction_duration=auction_duration,
+        posted_slot_tail=0,
+        bit_flags=0,
+    )
+
+
+def make_synthetic_book(num_orders: int, seed: int = 0) -> SyntheticBook:
+    rng = random.Random(seed)
+    users = [Keypair().pubkey() for _ in range(max(1, num_orders // ORDERS_PER_USER))]
+    orders = []
+    orders_by_user: Dict[Pubkey, List[Order]] = {user: [] for user in users}
+    for order_id in range(1, num_orders + 1):
+        user = users[order_id % len(users)]
+        order = make_order(rng, order_id, order_id % NUM_MARKETS, START_SLOT)
+        orders.append((order, user))
+        orders_by_user[user].append(order)
+
+    usermap = {
+        user: SimpleNamespace(
+            user_public_key=user,
+            get_user_account=lambda orders=user_orders: SimpleNamespace(orders=orders),
+        )
+        for user, user_orders in orders_by_user.items()
+    }
+    return SyntheticBook(orders, usermap)
+
+
+def build_dlob(book: SyntheticBook) -> DLOB:
+    dlob = DLOB()
+    for order, user in book.orders:
+        dlob.insert_order(order, user, START_SLOT)
+    return dlob
+
+
+def make_state_account():
+    fee_tier = SimpleNamespace(maker_rebate_numerator=1, maker_rebate_denominator=10)
+    return SimpleNamespace(
+        exchange_status=0,
+        min_perp_auction_duration=10,
+        perp_fee_structure=SimpleNamespace(fee_tiers=[fee_tier]),
+    )
+
+
+def get_benchmarks(
+    book: SyntheticBook,
+) -> Dict[str, Callable[[], Callable[[], object]]]:
+    """
+    Each benchmark is a setup function returning the callable to time, so state
+    mutated by one run (fills, auction moves) never leaks into the next.
+    """
+    oracle_price_data = OraclePriceData(ORACLE_PRICE, START_SLOT, 1, 1, 1, True)
+    state_account = make_state_account()
+    markets = range(NUM_MARKETS)
+
+    def insert_order():
+        dlob = DLOB()
+        return lambda: [
+            dlob.insert_order(order, user, START_SLOT) for order, user in book.orders
+        ]
+
+    def init_from_usermap():
+        dlob = DLOB()
+        return lambda: dlob.init_from_usermap(book.usermap, START_SLOT)
+
+    def get_l2():
+        dlob = build_dlob(book)
+        return lambda: [
+            dlob.get_l2(
+                market, MarketType.Perp(), START_SLOT, oracle_price_data, L2_DEPTH
+            )
+            for market in markets
+        ]
+
+    def get_l3():
+        dlob = build_dlob(book)
+        return lambda: [
+            dlob.get_l3(market, MarketType.Perp(), START_SLOT, oracle_price_data)
+            for market in markets
+        ]
+
+    def find_nodes_to_fill():
+        dlob = build_dlob(book)
+        return lambda: [
+            dlob.find_nodes_to_fill(
+                market,
+                START_SLOT,
+                int(time.time()),
+                MarketType.Perp(),
+                oracle_price_data,
+                state_account,
+                mock_perp_markets[0],
+            )
+            for market in markets
+        ]
+
+    def find_nodes_to_trigger():
+        dlob = build_dlob(book)
+        moved_price = ORACLE_PRICE + 5 * PRICE_PRECISION
+        state = SimpleNamespace(exchange_status=ExchangeStatus.Active())
+        return lambda: [
+            dlob.find_nodes_to_trigger(market, moved_price, MarketType.Perp(), state)
+            for market in markets
+        ]
+
+    def node_attribute_access():
+        nodes = [
+            node
+            for node_lists in build_dlob(book).order_lists["perp"].values()
+            for side_lists in vars(node_lists).values()
+            for node_list in side_lists.values()
+            for node in node_list.get_generator()
+        ]
+        return lambda: sum(
+            node.sort_value + node.get_base_remaining()
+            for node in nodes
+            if not node.have_filled
+        )
+
+    def update_resting_limit_orders():
+        dlob = build_dlob(book)
+        return lambda: dlob.update_resting_limit_orders(START_SLOT + 40)
+
+    return {
+        "insert_order": insert_order,
+        "init_from_usermap": init_from_usermap,
+        "get_l2": get_l2,
+        "get_l3": get_l3,
+        "find_nodes_to_fill": find_nodes_to_fill,
+        "find_nodes_to_trigger": find_nodes_to_trigger,
+        "node_attribute_access": node_attribute_access,
+        "update_resting_limit_orders": update_resting_limit_orders,
+    }
+
+
+def run_benchmark(setup: Callable[[], Callable[[], object]], repeat: int) -> dict:
+    timings = []
+    for _ in range(repeat):
+        fn = setup()
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+
+    # traced separately, tracemalloc slows the timed runs down
+    fn = setup()
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "best_s": min(timings),
+        "mean_s": sum(timings) / len(timings),
+        "peak_bytes": peak,
+    }
+
+
+def get_git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", nargs="+", help="benchmark names to run")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    args = parser.parse_args()
+
+    output_dir = os.path.dirname(args.output)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    revision = get_git_revision()
+    with open(args.output, "a") as output:
+        for size in args.sizes:
+            book = make_synthetic_book(size)
+            for name, setup in get_benchmarks(book).items():
+                if args.only and name not in args.only:
+                    continue
+                result = run_benchmark(setup, args.repeat)
+                record = {
+                    "benchmark": name,
+                    "orders": size,
+                    "orders_per_s": size / result["best_s"],
+                    **result,
+                    "revision": revision,
+                    "timestamp": int(time.time()),
+                }
+                output.write(json.dumps(record) + "\n")
+                print(
+                    f"{name:<28} {size:>7} orders  {result['best_s'] * 1e3:9.2f} ms"
+                    f"  {record['orders_per_s']:12,.0f} orders/s"
+                    f"  peak {result['peak_bytes'] / 2**20:8.1f} MiB"
+                )
+
+
+if __name__ == "__main__":
+    main()
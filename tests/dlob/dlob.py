@@ -1,19 +1,49 @@
-from dataclasses import dataclass
+import asyncio
+import copy
+import random
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, replace
+from types import SimpleNamespace
 from typing import Optional
 
+from aiohttp import web
+from pytest import mark, raises
 from solders.keypair import Keypair
 
 from driftpy.constants.numeric_constants import BASE_PRECISION, QUOTE_PRECISION
+from driftpy.dlob import orderbook_levels
 from driftpy.dlob.dlob import DLOB
+from driftpy.dlob.dlob_snapshot import DLOBSnapshot
+from driftpy.dlob.dlob_subscriber import DLOBSubscriber, MarketId
+from driftpy.dlob.orderbook_levels import (
+    DEFAULT_TOP_OF_BOOK_QUOTE_AMOUNTS,
+    L2Level,
+    L2OrderBookGenerator,
+    get_vamm_l2_generator,
+)
+from driftpy.math.amm import (
+    calculate_amm_reserves_after_swap,
+    calculate_market_open_bid_ask,
+    calculate_quote_asset_amount_swapped,
+    calculate_spread_reserves,
+    calculate_swap_output,
+    calculate_updated_amm,
+)
 from driftpy.math.auction import is_auction_complete
 from driftpy.math.conversion import convert_to_number
 from driftpy.math.orders import is_resting_limit_order
 from driftpy.types import (
+    AssetType,
+    ExchangeStatus,
+    MarketIdentifier,
     MarketType,
     OraclePriceData,
+    OrderStatus,
     OrderTriggerCondition,
     OrderType,
     PositionDirection,
+    SwapDirection,
+    is_variant,
 )
 from tests.decode.dlob_test_helpers import (
     insert_order_to_dlob,
@@ -417,6 +447,1099 @@ def test_update_resting_limit_order_asks():
     assert resting_asks[2].order.order_id == 1
 
 
+def test_resting_limit_orders_stay_sorted():
+    dlob = DLOB()
+    market_index = 0
+    slot = 100
+    oracle_price_data = OraclePriceData(50, slot, 1, 1, 1, True)
+
+    rng = random.Random(0)
+    users = [Keypair().pubkey() for _ in range(5)]
+    orders = []
+    for order_id in range(300):
+        user = users[order_id % len(users)]
+        price = rng.randint(1, 40)
+        direction = (
+            PositionDirection.Long() if order_id % 2 else PositionDirection.Short()
+        )
+        insert_order_to_dlob(
+            dlob,
+            user,
+            OrderType.Limit(),
+            MarketType.Perp(),
+            order_id,
+            market_index,
+            price if order_id % 2 else price + 50,
+            BASE_PRECISION,
+            direction,
+            0,
+            0,
+            rng.randint(1, 20),
+            post_only=True,
+        )
+        orders.append((order_id, user))
+
+    def assert_sorted():
+        bids = list(
+            dlob.get_resting_limit_bids(
+                market_index, slot, MarketType.Perp(), oracle_price_data
+            )
+        )
+        asks = list(
+            dlob.get_resting_limit_asks(
+                market_index, slot, MarketType.Perp(), oracle_price_data
+            )
+        )
+        bid_keys = [(-bid.order.price, bid.order.slot) for bid in bids]
+        ask_keys = [(ask.order.price, ask.order.slot) for ask in asks]
+        assert bid_keys == sorted(bid_keys)
+        assert ask_keys == sorted(ask_keys)
+        return len(bids) + len(asks)
+
+    assert assert_sorted() == len(orders)
+
+    rng.shuffle(orders)
+    for order_id, user in orders[:150]:
+        order = dlob.get_order(order_id, user)
+        assert order is not None
+        dlob.delete(order, user, slot)
+        assert dlob.get_order(order_id, user) is None
+
+    assert assert_sorted() == len(orders) - 150
+
+
+def test_update_user_orders_applies_diff():
+    dlob = DLOB()
+    market_index = 0
+    slot = 12
+    oracle_price_data = OraclePriceData(10, slot, 1, 1, 1, True)
+    user = Keypair().pubkey()
+
+    for order_id, price in [(1, 10), (2, 11)]:
+        insert_order_to_dlob(
+            dlob,
+            user,
+            OrderType.Limit(),
+            MarketType.Perp(),
+            order_id,
+            market_index,
+            price,
+            BASE_PRECISION,
+            PositionDirection.Long(),
+            0,
+            0,
+            1,
+            post_only=True,
+        )
+
+    previous_orders = [dlob.get_order(1, user), dlob.get_order(2, user)]
+    filled = replace(previous_orders[0], base_asset_amount_filled=BASE_PRECISION // 2)
+    repriced = replace(previous_orders[1], price=9)
+    placed = replace(previous_orders[0], order_id=3, price=12)
+    orders = [filled, repriced, placed]
+
+    dlob.update_user_orders(user, previous_orders, orders, slot)
+
+    bids = list(
+        dlob.get_resting_limit_bids(
+            market_index, slot, MarketType.Perp(), oracle_price_data
+        )
+    )
+    assert [
+        (bid.order.order_id, bid.order.price, bid.order.base_asset_amount_filled)
+        for bid in bids
+    ] == [(3, 12, 0), (1, 10, BASE_PRECISION // 2), (2, 9, 0)]
+
+    canceled = [replace(order, status=OrderStatus.Canceled()) for order in orders]
+    dlob.update_user_orders(user, orders, canceled, slot)
+
+    bids = list(
+        dlob.get_resting_limit_bids(
+            market_index, slot, MarketType.Perp(), oracle_price_data
+        )
+    )
+    assert len(bids) == 0
+
+
+def test_canceled_orders_leave_open_orders():
+    dlob = DLOB()
+    market_index = 0
+    slot = 12
+    user = Keypair().pubkey()
+
+    insert_order_to_dlob(
+        dlob,
+        user,
+        OrderType.Limit(),
+        MarketType.Perp(),
+        1,
+        market_index,
+        10,
+        BASE_PRECISION,
+        PositionDirection.Long(),
+        0,
+        0,
+        1,
+        post_only=True,
+    )
+    resting = dlob.get_order(1, user)
+
+    for order_id in range(2, 7):
+        placed = replace(resting, order_id=order_id, price=9)
+        dlob.update_user_orders(user, [resting], [resting, placed], slot)
+        assert len(dlob.open_orders["perp"]) == 2
+
+        canceled = replace(placed, status=OrderStatus.Canceled())
+        dlob.update_user_orders(user, [resting, placed], [resting, canceled], slot)
+        assert len(dlob.open_orders["perp"]) == 1
+
+    assert set(dlob.open_orders["perp"]) == set(dlob.order_index)
+
+    dlob.delete(resting, user, slot)
+    assert len(dlob.open_orders["perp"]) == 0
+    assert len(dlob.order_index) == 0
+
+
+def test_update_order_tracks_fill_on_node():
+    dlob = DLOB()
+    market_index = 0
+    slot = 12
+    oracle_price_data = OraclePriceData(10, slot, 1, 1, 1, True)
+    user = Keypair().pubkey()
+
+    insert_order_to_dlob(
+        dlob,
+        user,
+        OrderType.Limit(),
+        MarketType.Perp(),
+        1,
+        market_index,
+        10,
+        BASE_PRECISION,
+        PositionDirection.Long(),
+        0,
+        0,
+        1,
+        post_only=True,
+    )
+
+    order = dlob.get_order(1, user)
+    dlob.update_order(order, user, slot, BASE_PRECISION // 4)
+
+    # the order itself is not copied or mutated
+    assert dlob.get_order(1, user) is order
+    assert order.base_asset_amount_filled == 0
+
+    l3 = dlob.get_l3(market_index, MarketType.Perp(), slot, oracle_price_data)
+    assert [bid.size for bid in l3.bids] == [BASE_PRECISION * 3 // 4]
+
+    dlob.update_order(order, user, slot, BASE_PRECISION)
+    assert dlob.get_order(1, user) is None
+
+
+def test_simulated_fills_do_not_outlive_account_updates():
+    market_index = 0
+    slot = 12
+    oracle_price_data = OraclePriceData(11, slot, 1, 1, 1, True)
+    fee_tier = SimpleNamespace(maker_rebate_numerator=1, maker_rebate_denominator=10)
+    state_account = SimpleNamespace(
+        exchange_status=0,
+        min_perp_auction_duration=10,
+        perp_fee_structure=SimpleNamespace(fee_tiers=[fee_tier]),
+    )
+    maker = Keypair().pubkey()
+    taker = Keypair().pubkey()
+
+    dlob = DLOB()
+    insert_order_to_dlob(
+        dlob,
+        maker,
+        OrderType.Limit(),
+        MarketType.Perp(),
+        1,
+        market_index,
+        10,
+        BASE_PRECISION,
+        PositionDirection.Short(),
+        0,
+        0,
+        1,
+        post_only=True,
+    )
+    insert_order_to_dlob(
+        dlob,
+        taker,
+        OrderType.Limit(),
+        MarketType.Perp(),
+        2,
+        market_index,
+        12,
+        BASE_PRECISION,
+        PositionDirection.Long(),
+        0,
+        0,
+        slot - 1,
+    )
+    ask = dlob.get_order(1, maker)
+
+    def find_nodes_to_fill():
+        return dlob.find_nodes_to_fill(
+            market_index,
+            slot,
+            0,
+            MarketType.Perp(),
+            oracle_price_data,
+            state_account,
+            mock_perp_markets[0],
+        )
+
+    def best_asks():
+        return [
+            node.get_price(oracle_price_data, slot)
+            for node in dlob.get_resting_limit_asks(
+                market_index, slot, MarketType.Perp(), oracle_price_data
+            )
+            if not node.is_base_filled()
+        ]
+
+    assert best_asks() == [10]
+    (node_to_fill,) = find_nodes_to_fill()
+    assert best_asks() == []
+    # the simulated fill lives on the nodes, not on the account's orders
+    assert node_to_fill.node.get_base_remaining() == 0
+    assert node_to_fill.maker[0].get_base_remaining() == 0
+    assert node_to_fill.maker[0].order is ask
+    assert ask.base_asset_amount_filled == 0
+
+    # the fill never lands, the maker's account comes back unchanged
+    dlob.update_user_orders(maker, [ask], [ask], slot)
+    assert best_asks() == [10]
+    assert (
+        dlob.get_best_ask(market_index, slot, MarketType.Perp(), oracle_price_data)
+        == 10
+    )
+    l2 = dlob.get_l2(market_index, MarketType.Perp(), slot, oracle_price_data, 10)
+    assert [level.price for level in l2.asks] == [10]
+
+    assert len(find_nodes_to_fill()) == 0
+    dlob.reset_simulated_fills()
+    assert len(find_nodes_to_fill()) == 1
+    dlob.reset_simulated_fills()
+    assert best_asks() == [10]
+
+
+def test_best_price_cache_follows_order_changes():
+    dlob = DLOB()
+    market_index = 0
+    slot = 12
+    oracle_price_data = OraclePriceData(10, slot, 1, 1, 1, True)
+    fee_tier = SimpleNamespace(maker_rebate_numerator=1, maker_rebate_denominator=10)
+    state_account = SimpleNamespace(
+        exchange_status=0,
+        min_perp_auction_duration=10,
+        perp_fee_structure=SimpleNamespace(fee_tiers=[fee_tier]),
+    )
+    maker = Keypair().pubkey()
+    taker = Keypair().pubkey()
+
+    def insert(user, order_id, price, direction, order_slot=1, **kwargs):
+        insert_order_to_dlob(
+            dlob,
+            user,
+            OrderType.Limit(),
+            MarketType.Perp(),
+            order_id,
+            market_index,
+            price,
+            BASE_PRECISION,
+            direction,
+            0,
+            0,
+            order_slot,
+            **kwargs,
+        )
+
+    def best_bid():
+        return dlob.get_best_bid(
+            market_index, slot, MarketType.Perp(), oracle_price_data
+        )
+
+    def best_ask():
+        return dlob.get_best_ask(
+            market_index, slot, MarketType.Perp(), oracle_price_data
+        )
+
+    insert(maker, 1, 8, PositionDirection.Long(), post_only=True)
+    insert(maker, 2, 11, PositionDirection.Short(), post_only=True)
+    insert(maker, 3, 13, PositionDirection.Short(), post_only=True)
+    assert (best_bid(), best_ask()) == (8, 11)
+
+    # insert_order
+    insert(maker, 4, 9, PositionDirection.Long(), post_only=True)
+    assert best_bid() == 9
+
+    # delete
+    dlob.delete(dlob.get_order(4, maker), maker, slot)
+    assert best_bid() == 8
+
+    # update_user_orders, repricing and then cancelling the best ask
+    ask = dlob.get_order(2, maker)
+    repriced = replace(ask, price=12)
+    dlob.update_user_orders(maker, [ask], [repriced], slot)
+    assert best_ask() == 12
+    canceled = replace(repriced, status=OrderStatus.Canceled())
+    dlob.update_user_orders(maker, [repriced], [canceled], slot)
+    assert best_ask() == 13
+    dlob.update_user_orders(maker, [canceled], [ask], slot)
+    assert best_ask() == 11
+
+    # a fill simulated by find_nodes_to_fill takes the best ask out of the book
+    # until reset_simulated_fills puts it back
+    insert(taker, 5, 12, PositionDirection.Long(), order_slot=slot - 1)
+    nodes_to_fill = dlob.find_nodes_to_fill(
+        market_index,
+        slot,
+        0,
+        MarketType.Perp(),
+        oracle_price_data,
+        state_account,
+        mock_perp_markets[0],
+    )
+    assert [node.maker[0].order.order_id for node in nodes_to_fill] == [2]
+    assert best_ask() == 13
+    dlob.reset_simulated_fills()
+    assert best_ask() == 11
+
+    # a new oracle price is a cache miss, not a stale hit
+    insert(maker, 6, 0, PositionDirection.Long(), oracle_price_offset=-1)
+    assert best_bid() == 9
+    oracle_price_data = OraclePriceData(11, slot, 1, 1, 1, True)
+    assert best_bid() == 10
+
+
+def test_floating_limit_price_follows_oracle():
+    dlob = DLOB()
+    market_index = 0
+    slot = 12
+    user = Keypair().pubkey()
+
+    insert_order_to_dlob(
+        dlob,
+        user,
+        OrderType.Limit(),
+        MarketType.Perp(),
+        1,
+        market_index,
+        0,
+        BASE_PRECISION,
+        PositionDirection.Short(),
+        0,
+        0,
+        1,
+        oracle_price_offset=1,
+        post_only=True,
+    )
+
+    for oracle_price in [10, 20, 10]:
+        oracle_price_data = OraclePriceData(oracle_price, slot, 1, 1, 1, True)
+        best_ask = dlob.get_best_ask(
+            market_index, slot, MarketType.Perp(), oracle_price_data
+        )
+        assert best_ask == oracle_price + 1
+
+
+def test_resting_limit_asks_merge_floating_and_fixed_prices():
+    dlob = DLOB()
+    market_index = 0
+    slot = 12
+    oracle_price_data = OraclePriceData(10, slot, 1, 1, 1, True)
+
+    for order_id, price, oracle_price_offset in [(1, 15, 0), (2, 0, 2), (3, 11, 0)]:
+        insert_order_to_dlob(
+            dlob,
+            Keypair().pubkey(),
+            OrderType.Limit(),
+            MarketType.Perp(),
+            order_id,
+            market_index,
+            price,
+            BASE_PRECISION,
+            PositionDirection.Short(),
+            0,
+            0,
+            1,
+            oracle_price_offset=oracle_price_offset,
+            post_only=True,
+        )
+
+    asks = dlob.get_resting_limit_asks(
+        market_index, slot, MarketType.Perp(), oracle_price_data
+    )
+    assert [ask.get_price(oracle_price_data, slot) for ask in asks] == [11, 12, 15]
+
+
+def test_get_l2_batch_matches_get_l2():
+    dlob = DLOB()
+    slot = 12
+    oracle_map = {}
+    markets = []
+    for market_type in [MarketType.Perp(), MarketType.Spot()]:
+        for market_index in range(2):
+            market_type_str = "perp" if market_type == MarketType.Perp() else "spot"
+            oracle_map[(market_type_str, market_index)] = OraclePriceData(
+                20 + market_index, slot, 1, 1, 1, True
+            )
+            markets.append(MarketIdentifier(market_type, market_index))
+            for order_id in range(6):
+                insert_order_to_dlob(
+                    dlob,
+                    Keypair().pubkey(),
+                    OrderType.Limit(),
+                    market_type,
+                    order_id,
+                    market_index,
+                    10 + order_id * 3,
+                    BASE_PRECISION,
+                    (
+                        PositionDirection.Long()
+                        if order_id < 3
+                        else PositionDirection.Short()
+                    ),
+                    0,
+                    0,
+                    1,
+                    oracle_price_offset=1 if order_id == 5 else 0,
+                    post_only=True,
+                )
+
+    class FallbackLevels(L2OrderBookGenerator):
+        # overlaps the dlob prices, so merged levels carry both sources
+        def get_l2_asks(self):
+            for price in [16, 19, 22]:
+                yield L2Level(price, 5, {"vamm": 5})
+
+        def get_l2_bids(self):
+            for price in [13, 11, 9]:
+                yield L2Level(price, 5, {"vamm": 5})
+
+    fallback_l2_generators = {("perp", 0): [FallbackLevels()]}
+
+    def levels(book_side):
+        return [(level.price, level.size, level.sources) for level in book_side]
+
+    def l3_levels(book_side):
+        return [
+            (level.price, level.size, level.maker, level.order_id)
+            for level in book_side
+        ]
+
+    def key_of(market):
+        return (
+            "perp" if market.market_type == MarketType.Perp() else "spot",
+            market.market_index,
+        )
+
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        for batch_executor in [None, executor]:
+            l2_batch = dlob.get_l2_batch(
+                markets,
+                slot,
+                oracle_map,
+                2,
+                fallback_l2_generators,
+                executor=batch_executor,
+            )
+            l3_batch = dlob.get_l3_batch(
+                markets, slot, oracle_map, executor=batch_executor
+            )
+            assert len(l2_batch) == len(l3_batch) == len(markets)
+            for market in markets:
+                key = key_of(market)
+                l2 = dlob.get_l2(
+                    market.market_index,
+                    market.market_type,
+                    slot,
+                    oracle_map[key],
+                    2,
+                    fallback_l2_generators.get(key, []),
+                )
+                assert levels(l2_batch[key].bids) == levels(l2.bids)
+                assert levels(l2_batch[key].asks) == levels(l2.asks)
+                assert len(l2_batch[key].bids) == 2
+                assert l2_batch[key].slot == slot
+
+                l3 = dlob.get_l3(
+                    market.market_index, market.market_type, slot, oracle_map[key]
+                )
+                assert l3_levels(l3_batch[key].bids) == l3_levels(l3.bids)
+                assert l3_levels(l3_batch[key].asks) == l3_levels(l3.asks)
+
+    assert levels(l2_batch[("perp", 0)].bids) == [
+        (16, BASE_PRECISION, {"dlob": BASE_PRECISION}),
+        (13, BASE_PRECISION + 5, {"dlob": BASE_PRECISION, "vamm": 5}),
+    ]
+
+
+def legacy_vamm_l2_side(
+    amm, reserves, open_liquidity, num_orders, top_of_book_quote_amounts, is_bid
+):
+    # the ladder as built before get_vamm_l2_levels: a deep copy of the amm
+    # stepped through calculate_amm_reserves_after_swap one level at a time
+    num_base_orders = num_orders - len(top_of_book_quote_amounts)
+    quote_direction = SwapDirection.Remove() if is_bid else SwapDirection.Add()
+    base_direction = SwapDirection.Add() if is_bid else SwapDirection.Remove()
+    side_amm = copy.deepcopy(amm)
+    side_amm.base_asset_reserve, side_amm.quote_asset_reserve = reserves
+
+    levels = []
+    top_of_book_size = 0
+    size = open_liquidity // num_base_orders
+    while len(levels) < num_orders and size > 0:
+        if len(levels) < len(top_of_book_quote_amounts):
+            remaining_base_liquidity = open_liquidity - top_of_book_size
+            quote_swapped = top_of_book_quote_amounts[len(levels)]
+            quote_reserves, base_reserves = calculate_amm_reserves_after_swap(
+                side_amm, AssetType.QUOTE(), quote_swapped, quote_direction
+            )
+            base_swapped = abs(side_amm.base_asset_reserve - base_reserves)
+            if remaining_base_liquidity < base_swapped:
+                base_swapped = remaining_base_liquidity
+                quote_reserves, base_reserves = calculate_amm_reserves_after_swap(
+                    side_amm, AssetType.BASE(), base_swapped, base_direction
+                )
+                quote_swapped = calculate_quote_asset_amount_swapped(
+                    abs(side_amm.quote_asset_reserve - quote_reserves),
+                    side_amm.peg_multiplier,
+                    base_direction,
+                )
+            top_of_book_size += base_swapped
+            size = (open_liquidity - top_of_book_size) // num_base_orders
+        else:
+            base_swapped = size
+            quote_reserves, base_reserves = calculate_amm_reserves_after_swap(
+                side_amm, AssetType.BASE(), base_swapped, base_direction
+            )
+            quote_swapped = calculate_quote_asset_amount_swapped(
+                abs(side_amm.quote_asset_reserve - quote_reserves),
+                side_amm.peg_multiplier,
+                base_direction,
+            )
+
+        levels.append(((quote_swapped * BASE_PRECISION) // base_swapped, base_swapped))
+        side_amm.base_asset_reserve = base_reserves
+        side_amm.quote_asset_reserve = quote_reserves
+    return levels
+
+
+@mark.parametrize(
+    "reserve, max_reserve_offset, order_step_size",
+    [
+        (38_104_569 * BASE_PRECISION, 38_104_569 * BASE_PRECISION, 0),
+        (38_104_569 * BASE_PRECISION, 1_234_835, 0),
+        (1_000 * BASE_PRECISION, 500 * BASE_PRECISION, 0),
+        (1_000 * BASE_PRECISION, 500 * BASE_PRECISION, BASE_PRECISION),
+        # a step size over half the open asks closes the ask side
+        (1_000 * BASE_PRECISION, 500 * BASE_PRECISION, 200 * BASE_PRECISION),
+    ],
+)
+@mark.parametrize("top_of_book_quote_amounts", [[], DEFAULT_TOP_OF_BOOK_QUOTE_AMOUNTS])
+def test_vamm_l2_levels_match_deepcopy_ladder(
+    reserve, max_reserve_offset, order_step_size, top_of_book_quote_amounts, monkeypatch
+):
+    now = 1_688_881_915
+    num_orders = 20
+    market = copy.deepcopy(mock_perp_markets[0])
+    market.amm.base_asset_reserve = reserve
+    market.amm.quote_asset_reserve = reserve
+    market.amm.sqrt_k = reserve
+    market.amm.max_base_asset_reserve = reserve + max_reserve_offset
+    market.amm.min_base_asset_reserve = reserve - max_reserve_offset // 2
+    market.amm.peg_multiplier = 18_320_000
+    market.amm.order_step_size = order_step_size
+    market.amm.historical_oracle_data.last_oracle_price = 18_553_500
+    oracle_price_data = OraclePriceData(18_624_000, 0, 1, 1, 1, True)
+
+    amm = calculate_updated_amm(market.amm, oracle_price_data)
+    open_bids, open_asks = calculate_market_open_bid_ask(
+        amm.base_asset_reserve,
+        amm.min_base_asset_reserve,
+        amm.max_base_asset_reserve,
+        amm.order_step_size,
+    )
+    bid_reserves, ask_reserves = calculate_spread_reserves(
+        amm, oracle_price_data, now, False
+    )
+    expected_bids = legacy_vamm_l2_side(
+        amm, bid_reserves, open_bids, num_orders, top_of_book_quote_amounts, True
+    )
+    expected_asks = legacy_vamm_l2_side(
+        amm,
+        ask_reserves,
+        abs(open_asks),
+        num_orders,
+        top_of_book_quote_amounts,
+        False,
+    )
+    assert expected_bids
+    assert bool(expected_asks) == (order_step_size <= abs(open_asks) // 2)
+
+    get_l2_bids, get_l2_asks = get_vamm_l2_generator(
+        market, oracle_price_data, num_orders, now, top_of_book_quote_amounts
+    )
+    # compared by repr, so int and float prices must match exactly
+    assert [(repr(level.price), repr(level.size)) for level in get_l2_bids()] == [
+        (repr(price), repr(size)) for price, size in expected_bids
+    ]
+    assert [(repr(level.price), repr(level.size)) for level in get_l2_asks()] == [
+        (repr(price), repr(size)) for price, size in expected_asks
+    ]
+
+    # a consumer that stops early leaves the rest of the ladder uncomputed
+    swaps = []
+
+    def counting_swap_output(*args):
+        swaps.append(args)
+        return calculate_swap_output(*args)
+
+    monkeypatch.setattr(orderbook_levels, "calculate_swap_output", counting_swap_output)
+    get_l2_bids, get_l2_asks = get_vamm_l2_generator(
+        market, oracle_price_data, num_orders, now, top_of_book_quote_amounts
+    )
+    assert next(get_l2_bids()).price == expected_bids[0][0]
+    # one swap per level, two when a top of book level is capped
+    assert 1 <= len(swaps) <= 2
+
+
+def test_dlob_snapshot_matches_dlob(tmp_path):
+    dlob = DLOB()
+    slot = 12
+    oracle_map = {}
+    markets = []
+    for market_type in [MarketType.Perp(), MarketType.Spot()]:
+        for market_index in range(2):
+            market_type_str = "perp" if market_type == MarketType.Perp() else "spot"
+            oracle_map[(market_type_str, market_index)] = OraclePriceData(
+                20 + market_index, slot, 1, 1, 1, True
+            )
+            markets.append(MarketIdentifier(market_type, market_index))
+            for order_id in range(8):
+                insert_order_to_dlob(
+                    dlob,
+                    Keypair().pubkey(),
+                    OrderType.Limit(),
+                    market_type,
+                    order_id,
+                    market_index,
+                    10 + order_id // 2 * 3,
+                    BASE_PRECISION * (order_id + 1),
+                    (
+                        PositionDirection.Long()
+                        if order_id < 4
+                        else PositionDirection.Short()
+                    ),
+                    0,
+                    0,
+                    1,
+                    oracle_price_offset=1 if order_id == 7 else 0,
+                    post_only=True,
+                )
+
+    snapshot = DLOBSnapshot.from_dlob(dlob, markets, slot, oracle_map)
+
+    path = str(tmp_path / "dlob.snapshot")
+    snapshot.write(path)
+    mapped = DLOBSnapshot.open(path)
+
+    shm = snapshot.to_shared_memory()
+    shared = DLOBSnapshot.from_shared_memory(shm.name)
+
+    def l2_levels(book_side):
+        return [(level.price, level.size) for level in book_side]
+
+    def l3_levels(book_side):
+        return [
+            (level.price, level.size, level.maker, level.order_id)
+            for level in book_side
+        ]
+
+    try:
+        for view in [snapshot, mapped, shared]:
+            assert view.slot == slot
+            for market in markets:
+                key = (
+                    "perp" if market.market_type == MarketType.Perp() else "spot",
+                    market.market_index,
+                )
+                index, market_type = market.market_index, market.market_type
+
+                l2 = dlob.get_l2(index, market_type, slot, oracle_map[key], 10)
+                view_l2 = view.get_l2(index, market_type, 10)
+                assert l2_levels(view_l2.asks) == l2_levels(l2.asks)
+                assert l2_levels(view_l2.bids) == l2_levels(l2.bids)
+
+                l3 = dlob.get_l3(index, market_type, slot, oracle_map[key])
+                view_l3 = view.get_l3(index, market_type)
+                assert l3_levels(view_l3.asks) == l3_levels(l3.asks)
+                assert l3_levels(view_l3.bids) == l3_levels(l3.bids)
+
+                assert view.get_best_bid(index, market_type) == dlob.get_best_bid(
+                    index, slot, market_type, oracle_map[key]
+                )
+                assert view.get_best_ask(index, market_type) == dlob.get_best_ask(
+                    index, slot, market_type, oracle_map[key]
+                )
+
+        assert snapshot.get_best_bid(5, MarketType.Perp()) is None
+    finally:
+        mapped.close()
+        shared.close()
+        shm.close()
+        shm.unlink()
+
+
+def test_l2_deltas_track_book_changes():
+    dlob = DLOB()
+    slot = 12
+    oracle_price_data = OraclePriceData(10, slot, 1, 1, 1, True)
+    maker = Keypair().pubkey()
+
+    subscriber = DLOBSubscriber()
+    subscriber.dlob = dlob
+    subscriber.slot_source = SimpleNamespace(get_slot=lambda: slot)
+    subscriber.drift_client = SimpleNamespace(
+        get_oracle_price_data_for_perp_market=lambda market_index: oracle_price_data
+    )
+    markets = [MarketId(0, MarketType.Perp())]
+
+    def insert_ask(order_id, price):
+        insert_order_to_dlob(
+            dlob,
+            maker,
+            OrderType.Limit(),
+            MarketType.Perp(),
+            order_id,
+            0,
+            price,
+            BASE_PRECISION,
+            PositionDirection.Short(),
+            0,
+            0,
+            1,
+            post_only=True,
+        )
+
+    def summary(deltas):
+        return [
+            (delta.side, delta.action, delta.price, delta.size)
+            for delta in deltas[("perp", 0)].deltas
+        ]
+
+    previous_books = {}
+    insert_ask(1, 101)
+    insert_ask(2, 104)
+    deltas = subscriber.get_l2_deltas_sync(previous_books, markets, grouping=5)
+    # asks round up to the grouping
+    assert summary(deltas) == [("ask", "add", 105, 2 * BASE_PRECISION)]
+
+    assert subscriber.get_l2_deltas_sync(previous_books, markets, grouping=5) == {}
+
+    insert_ask(3, 107)
+    dlob.delete(dlob.get_order(1, maker), maker, slot)
+    dlob.delete(dlob.get_order(2, maker), maker, slot)
+    deltas = subscriber.get_l2_deltas_sync(previous_books, markets, grouping=5)
+    assert summary(deltas) == [
+        ("ask", "add", 110, BASE_PRECISION),
+        ("ask", "remove", 105, 0),
+    ]
+
+
+@mark.asyncio
+async def test_l2_delta_subscription_survives_errors(caplog):
+    dlob = DLOB()
+    slot = 12
+    oracle_price_data = OraclePriceData(10, slot, 1, 1, 1, True)
+    maker = Keypair().pubkey()
+    insert_order_to_dlob(
+        dlob,
+        maker,
+        OrderType.Limit(),
+        MarketType.Perp(),
+        1,
+        0,
+        101,
+        BASE_PRECISION,
+        PositionDirection.Short(),
+        0,
+        0,
+        1,
+        post_only=True,
+    )
+
+    failures = [ValueError("oracle unavailable")]
+
+    def get_oracle_price_data_for_perp_market(market_index):
+        if failures:
+            raise failures.pop()
+        return oracle_price_data
+
+    subscriber = DLOBSubscriber()
+    subscriber.dlob = dlob
+    subscriber.slot_source = SimpleNamespace(get_slot=lambda: slot)
+    subscriber.drift_client = SimpleNamespace(
+        get_oracle_price_data_for_perp_market=get_oracle_price_data_for_perp_market
+    )
+
+    stream = subscriber.subscribe_l2_deltas(
+        [MarketId(0, MarketType.Perp())], interval_s=0
+    )
+    deltas = await asyncio.wait_for(stream.__anext__(), 5)
+    assert [
+        (delta.side, delta.action, delta.price) for delta in deltas[("perp", 0)].deltas
+    ] == [("ask", "add", 101)]
+    assert "oracle unavailable" in caplog.text
+
+    # cancelling the consumer ends the subscription
+    task = asyncio.ensure_future(stream.__anext__())
+    await asyncio.sleep(0)
+    task.cancel()
+    with raises(asyncio.CancelledError):
+        await task
+    await stream.aclose()
+
+
+@mark.asyncio
+async def test_get_l2_orderbooks_from_server():
+    async def l2(request):
+        market_index = int(request.query["marketIndex"])
+        return web.json_response(
+            {
+                "asks": [{"price": 11 + market_index, "size": 1, "sources": {}}],
+                "bids": [{"price": 9, "size": 2, "sources": {"dlob": 2}}],
+                "slot": 12,
+            }
+        )
+
+    app = web.Application()
+    app.router.add_get("/l2", l2)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    subscriber = DLOBSubscriber(url=f"http://127.0.0.1:{port}/")
+    try:
+        markets = [MarketId(index, MarketType.Perp()) for index in range(3)]
+        books = await subscriber.get_l2_orderbooks(markets)
+    finally:
+        await DLOBSubscriber.close_session()
+        await runner.cleanup()
+
+    assert sorted(books) == [("perp", 0), ("perp", 1), ("perp", 2)]
+    assert [books[("perp", i)].asks[0].price for i in range(3)] == [11, 12, 13]
+    assert books[("perp", 0)].bids[0].sources == {"dlob": 2}
+
+    # released levels are reused by the next decode
+    level = books[("perp", 0)].bids[0]
+    subscriber.release_l2_orderbook(books[("perp", 0)])
+    book = subscriber.decode_l2_orderbook(
+        b'{"asks": [], "bids": [{"price": 5, "size": 1, "sources": {}}]}'
+    )
+    assert book.bids[0] is level
+    assert book.bids[0].price == 5 and book.slot is None
+
+
+def test_dlob_nodes_and_levels_are_slotted():
+    dlob = DLOB()
+    market_index = 0
+    slot = 12
+    oracle_price_data = OraclePriceData(11, slot, 1, 1, 1, True)
+
+    for order_id, direction, price in [
+        (1, PositionDirection.Long(), 10),
+        (2, PositionDirection.Short(), 12),
+    ]:
+        insert_order_to_dlob(
+            dlob,
+            Keypair().pubkey(),
+            OrderType.Limit(),
+            MarketType.Perp(),
+            order_id,
+            market_index,
+            price,
+            BASE_PRECISION,
+            direction,
+            price,
+            price,
+            1,
+            post_only=True,
+            auction_duration=0,
+        )
+
+    nodes = list(
+        dlob.get_resting_limit_bids(
+            market_index, slot, MarketType.Perp(), oracle_price_data
+        )
+    )
+    l2 = dlob.get_l2(market_index, MarketType.Perp(), slot, oracle_price_data, 10)
+    l3 = dlob.get_l3(market_index, MarketType.Perp(), slot, oracle_price_data)
+
+    for obj in [nodes[0], l2, l2.asks[0], l2.bids[0], l3, l3.asks[0], l3.bids[0]]:
+        assert not hasattr(obj, "__dict__"), type(obj).__name__
+
+
+def test_order_index_follows_orders_between_lists():
+    dlob = DLOB()
+    market_index = 0
+    user = Keypair().pubkey()
+
+    insert_order_to_dlob(
+        dlob,
+        user,
+        OrderType.Limit(),
+        MarketType.Perp(),
+        1,
+        market_index,
+        10,
+        BASE_PRECISION,
+        PositionDirection.Long(),
+        9,
+        10,
+        1,
+        auction_duration=10,
+    )
+    insert_trigger_order_to_dlob(
+        dlob,
+        user,
+        OrderType.TriggerMarket(),
+        MarketType.Perp(),
+        2,
+        market_index,
+        0,
+        BASE_PRECISION,
+        PositionDirection.Short(),
+        5,
+        OrderTriggerCondition.Below(),
+        0,
+        0,
+        1,
+    )
+
+    node_lists = dlob.order_lists["perp"][market_index]
+    taking_order = dlob.get_order(1, user)
+    assert dlob.get_list_holding_order(1, user) is node_lists.taking_limit["bid"]
+    assert dlob.get_list_holding_order(2, user) is node_lists.trigger["below"]
+
+    # auction ends, the order moves to the resting list
+    dlob.update_resting_limit_orders(20)
+    assert dlob.get_list_holding_order(1, user) is node_lists.resting_limit["bid"]
+    assert dlob.get_order(1, user) is taking_order
+
+    dlob.delete(taking_order, user, 20)
+    assert dlob.get_order(1, user) is None
+    assert node_lists.resting_limit["bid"].length == 0
+
+    dlob.delete(dlob.get_order(2, user), user, 20)
+    assert dlob.get_order(2, user) is None
+    assert node_lists.trigger["below"].length == 0
+
+
+def test_update_resting_limit_orders_at_auction_end_slot():
+    dlob = DLOB()
+    market_index = 0
+    user = Keypair().pubkey()
+
+    for order_id, auction_duration in [(1, 10), (2, 5), (3, 5)]:
+        insert_order_to_dlob(
+            dlob,
+            user,
+            OrderType.Limit(),
+            MarketType.Perp(),
+            order_id,
+            market_index,
+            10,
+            BASE_PRECISION,
+            PositionDirection.Long(),
+            9,
+            10,
+            1,
+            auction_duration=auction_duration,
+        )
+
+    node_lists = dlob.order_lists["perp"][market_index]
+    assert node_lists.taking_limit["bid"].length == 3
+
+    # cancelled while still in auction, its queued auction end is skipped
+    dlob.delete(dlob.get_order(3, user), user, 2)
+
+    dlob.update_resting_limit_orders(6)
+    assert node_lists.taking_limit["bid"].length == 2
+
+    dlob.update_resting_limit_orders(7)
+    assert dlob.get_list_holding_order(2, user) is node_lists.resting_limit["bid"]
+    assert dlob.get_list_holding_order(1, user) is node_lists.taking_limit["bid"]
+
+    dlob.update_resting_limit_orders(12)
+    assert node_lists.taking_limit["bid"].length == 0
+    assert node_lists.resting_limit["bid"].length == 2
+    assert len(dlob.taking_limit_auction_ends) == 0
+
+
+def test_find_nodes_to_trigger_batch():
+    dlob = DLOB()
+    user = Keypair().pubkey()
+    state_account = SimpleNamespace(exchange_status=ExchangeStatus.Active())
+    rng = random.Random(7)
+
+    trigger_prices = {}
+    for order_id in range(1, 201):
+        market_index = order_id % 2
+        trigger_price = rng.randint(1, 50)
+        condition = rng.choice(
+            [OrderTriggerCondition.Above(), OrderTriggerCondition.Below()]
+        )
+        insert_trigger_order_to_dlob(
+            dlob,
+            user,
+            OrderType.TriggerMarket(),
+            MarketType.Perp(),
+            order_id,
+            market_index,
+            0,
+            BASE_PRECISION,
+            PositionDirection.Long(),
+            trigger_price,
+            condition,
+            0,
+            0,
+            1,
+        )
+        trigger_prices[order_id] = (market_index, trigger_price, condition)
+
+    oracle_prices = {("perp", 0): 20, ("perp", 1): 35, ("perp", 2): 10}
+    batch = dlob.find_nodes_to_trigger_batch(oracle_prices, state_account)
+    assert set(batch) == {("perp", 0), ("perp", 1)}
+
+    for (_, market_index), oracle_price in oracle_prices.items():
+        expected = {
+            order_id
+            for order_id, (index, trigger_price, condition) in trigger_prices.items()
+            if index == market_index
+            and (
+                oracle_price > trigger_price
+                if is_variant(condition, "Above")
+                else oracle_price < trigger_price
+            )
+        }
+        single = dlob.find_nodes_to_trigger(
+            market_index, oracle_price, MarketType.Perp(), state_account
+        )
+        assert {node.node.order.order_id for node in single} == expected
+        assert {
+            node.node.order.order_id for node in batch.get(("perp", market_index), [])
+        } == expected
+
+
 # DLOB PERP MARKET TESTS
 def test_dlob_proper_bids_perp():
     dlob = DLOB()
@@ -1,7 +1,16 @@
+from dataclasses import replace
+
 from pytest import mark
 
 from driftpy.math.auction import derive_oracle_auction_params
-from driftpy.types import PositionDirection
+from driftpy.math.orders import is_limit_order, is_market_order, must_be_triggered
+from driftpy.types import (
+    MarketStatus,
+    OrderType,
+    PositionDirection,
+    is_one_of_variant,
+)
+from tests.math.helpers import mock_order
 from driftpy.constants.numeric_constants import PRICE_PRECISION
 
 
@@ -60,3 +69,18 @@ async def test_drive_oracle_auction_params():
     assert oracle_order_params[0] == 0
     assert oracle_order_params[1] == 0
     assert oracle_order_params[2] == -1
+
+
+def test_order_type_classification():
+    market = mock_order
+    limit = replace(mock_order, order_type=OrderType.Limit())
+    trigger_limit = replace(mock_order, order_type=OrderType.TriggerLimit())
+
+    assert is_market_order(market) and not is_limit_order(market)
+    assert is_limit_order(limit) and not must_be_triggered(limit)
+    assert is_limit_order(trigger_limit) and must_be_triggered(trigger_limit)
+
+    # variants are matched by name, not by substring
+    assert not is_one_of_variant(OrderType.TriggerLimit(), ["Limit"])
+    assert not is_one_of_variant(MarketStatus.AmmPaused(), ["Paused"])
+    assert is_one_of_variant(MarketStatus.AmmPaused(), ["Paused", "AmmPaused"])